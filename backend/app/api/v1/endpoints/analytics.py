@@ -1,17 +1,36 @@
 # analytics endpoint
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.services.analytics_service import AnalyticsService
-from app.models.user import User
-from datetime import datetime
-from typing import Optional
+from app.services.correlation_service import CorrelationService, MAX_SYMBOLS
+from app.services.pivot_service import PivotService
+from app.services.rolling_service import RollingService
+from app.services.sketch_service import SketchService
+from app.services.monte_carlo_service import MonteCarloService, MAX_HORIZON, MAX_PATHS
+from app.services.trade_columns import trade_columns
+from app.models.user import User, UserOnboarding
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from jose import JWTError, jwt
 from app.core.config import settings
 
 router = APIRouter()
 
+class PivotRequest(BaseModel):
+    group_by: List[str] = Field(default_factory=list, description="e.g. ['symbol', 'weekday', 'direction']")
+    measures: Optional[List[str]] = None
+    filters: Dict[str, List[Any]] = Field(default_factory=dict, description="dimension -> allowed values")
+    start_date: Optional[str] = Field(None, description="YYYY-MM-DD or ISO 8601 datetime, as for the other analytics")
+    end_date: Optional[str] = Field(None, description="Last day (inclusive, YYYY-MM-DD) or exclusive datetime")
+    sort_by: Optional[str] = None
+    descending: bool = True
+    limit: int = Field(1000, ge=1, le=10000)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 def get_current_user_id(
@@ -37,57 +56,211 @@ def get_current_user_id(
         raise credentials_exception
     return user.id
 
+def parse_date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """[start, end) of trade entry dates from optional start / end strings"""
+    bounds = []
+    for value in (start_date, end_date):
+        try:
+            bound = datetime.fromisoformat(value) if value else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD or ISO 8601 datetimes")
+        if bound is not None and bound.tzinfo is not None:
+            # Entry dates are stored as naive UTC
+            bound = bound.astimezone(timezone.utc).replace(tzinfo=None)
+        bounds.append(bound)
+    start_dt, end_dt = bounds
+    # A bare date as end_date includes that whole day
+    if end_dt is not None and len(end_date) == 10:
+        end_dt += timedelta(days=1)
+    if start_dt is not None and end_dt is not None and end_dt <= start_dt:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    return start_dt, end_dt
+
+def entry_date_range(
+    start_date: Optional[str] = Query(None, description="Only trades entered on or after this day (YYYY-MM-DD) or time"),
+    end_date: Optional[str] = Query(None, description="Only trades entered up to this day (inclusive, YYYY-MM-DD) or before this time")
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """[start, end) of trade entry dates from the optional start_date / end_date parameters"""
+    return parse_date_range(start_date, end_date)
+
 @router.get("/performance")
 def get_performance_metrics(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get performance analytics"""
-    return AnalyticsService.get_performance_metrics(db, user_id)
+    return AnalyticsService.get_performance_metrics(db, user_id, *date_range)
 
 @router.get("/daily-pnl")
 def get_daily_pnl(
-    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"),
-    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format"),
+    resolution: str = Query("day", description="day, week, month, quarter or year"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
-    """Get daily P&L aggregation"""
-    start_dt = datetime.fromisoformat(start_date) if start_date else None
-    end_dt = datetime.fromisoformat(end_date) if end_date else None
-    return AnalyticsService.get_daily_pnl(db, user_id, start_dt, end_dt)
+    """Get P&L aggregated per day, week, month, quarter or year"""
+    try:
+        return AnalyticsService.get_daily_pnl(db, user_id, *date_range, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/cumulative-pnl")
 def get_cumulative_pnl(
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample (LTTB) to at most this many points"),
+    format: str = Query("json", description="json, or ndjson to stream every trade"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get cumulative P&L time series"""
-    return AnalyticsService.get_cumulative_pnl(db, user_id)
+    if format == "ndjson":
+        start_dt, end_dt = date_range
+        lines = AnalyticsService.stream_cumulative_pnl(db, user_id, start_date=start_dt, end_date=end_dt)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    return AnalyticsService.get_cumulative_pnl(db, user_id, max_points, *date_range)
+
+@router.get("/what-if")
+def get_what_if_pnl(
+    stop_loss_percent: Optional[float] = Query(None, gt=0, lt=100, description="Stop distance from entry, in percent"),
+    take_profit_percent: Optional[float] = Query(None, gt=0, description="Target distance from entry, in percent"),
+    interval: str = Query("1h", description="Candle interval used for the replay"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Replay closed trades with alternative exits and compare to the actual cumulative P&L"""
+    if stop_loss_percent is None and take_profit_percent is None:
+        raise HTTPException(status_code=400, detail="Provide stop_loss_percent and/or take_profit_percent")
+    try:
+        return AnalyticsService.get_what_if_pnl(db, user_id, stop_loss_percent, take_profit_percent, interval,
+                                                *date_range)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/excursions")
+def get_excursions(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get MAE/MFE per closed trade and exit efficiency"""
+    return AnalyticsService.get_excursions(db, user_id, *date_range)
 
 @router.get("/streaks")
 def get_streaks(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get current winning/losing streaks"""
-    return AnalyticsService.calculate_streaks(db, user_id)
+    return AnalyticsService.calculate_streaks(db, user_id, *date_range)
 
 @router.get("/drawdown")
 def get_drawdown(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get drawdown metrics"""
-    return AnalyticsService.calculate_drawdown(db, user_id)
+    return AnalyticsService.calculate_drawdown(db, user_id, *date_range)
+
+@router.get("/risk")
+def get_risk_metrics(
+    initial_capital: Optional[float] = Query(None, gt=0, description="Account size for percentage returns; defaults to the onboarding balance"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get drawdown, return-based and per-trade risk metrics with a composite score"""
+    if initial_capital is None:
+        onboarding = db.query(UserOnboarding).filter(UserOnboarding.user_id == user_id).first()
+        initial_capital = onboarding.initial_balance if onboarding and onboarding.initial_balance else None
+    return AnalyticsService.get_risk_metrics(db, user_id, initial_capital, *date_range)
+
+@router.get("/rolling")
+def get_rolling_metrics(
+    window: int = Query(50, ge=1, le=100000, description="Window size, in trades or days"),
+    unit: str = Query("trades", description="trades or days"),
+    metric: Optional[List[str]] = Query(None, description="pnl, trades, win_rate, profit_factor, expectancy; default all"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get rolling-window series per closed trade"""
+    columns = trade_columns.columns(db, user_id).between(*date_range)
+    try:
+        result = RollingService.rolling(columns, window, unit, metric)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Plain lists of numbers: skip the per-element response encoding
+    return JSONResponse(result)
+
+@router.get("/monte-carlo")
+def get_monte_carlo(
+    paths: int = Query(10000, ge=1, le=MAX_PATHS, description="Number of simulated equity paths"),
+    horizon: Optional[int] = Query(None, ge=1, le=MAX_HORIZON, description="Trades per path; defaults to the number of closed trades"),
+    initial_capital: Optional[float] = Query(None, gt=0, description="Starting equity; defaults to the onboarding balance"),
+    ruin_percent: float = Query(50.0, gt=0, le=100, description="Drawdown from the starting equity that counts as ruin"),
+    seed: Optional[int] = Query(None, ge=0, description="RNG seed; the same seed reproduces the same result"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Bootstrap closed-trade P&L into simulated equity paths: risk of ruin, drawdowns and percentile bands"""
+    if initial_capital is None:
+        onboarding = db.query(UserOnboarding).filter(UserOnboarding.user_id == user_id).first()
+        initial_capital = onboarding.initial_balance if onboarding and onboarding.initial_balance else None
+    if initial_capital is None:
+        raise HTTPException(status_code=400, detail="Provide initial_capital or set an initial balance")
+    columns = trade_columns.columns(db, user_id).between(*date_range)
+    try:
+        return MonteCarloService.simulate(columns.pnl, initial_capital, paths, horizon, ruin_percent, seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/day-stats")
 def get_day_statistics(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get day-level statistics"""
-    return AnalyticsService.get_day_statistics(db, user_id)
+    return AnalyticsService.get_day_statistics(db, user_id, *date_range)
+
+MAX_CALENDAR_DAYS = 366 * 5
+
+@router.get("/calendar")
+def get_calendar_range(
+    start_date: str = Query(..., description="First day, YYYY-MM-DD"),
+    end_date: str = Query(..., description="Last day (inclusive), YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get per-day calendar data for any date range as parallel arrays"""
+    try:
+        start_dt = datetime.fromisoformat(start_date[:10])
+        end_dt = datetime.fromisoformat(end_date[:10]) + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if end_dt <= start_dt:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_dt - start_dt).days > MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_CALENDAR_DAYS} days")
+    return AnalyticsService.get_calendar_range(db, user_id, start_dt, end_dt)
+
+@router.get("/calendar/{year}")
+def get_calendar_year(
+    year: int,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get per-day calendar data for a whole year as parallel arrays"""
+    if year < 1970 or year > 9998:
+        raise HTTPException(status_code=400, detail="Year out of range")
+    return AnalyticsService.get_calendar_range(db, user_id, datetime(year, 1, 1), datetime(year + 1, 1, 1))
 
 @router.get("/calendar/{year}/{month}")
 def get_calendar_data(
@@ -101,18 +274,124 @@ def get_calendar_data(
         return {"error": "Month must be between 1 and 12"}
     return AnalyticsService.get_calendar_data(db, user_id, year, month)
 
+@router.get("/compare")
+def compare_periods(
+    period: str = Query("month", description="week, month or quarter"),
+    n: int = Query(12, ge=1, le=120, description="Number of periods, ending with the current one"),
+    date: Optional[str] = Query(None, description="Any day in the latest period, YYYY-MM-DD; defaults to today"),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Per-period aggregates with deltas vs the previous period, from one grouped query"""
+    if period not in ("week", "month", "quarter"):
+        raise HTTPException(status_code=400, detail="period must be week, month or quarter")
+    try:
+        at = datetime.fromisoformat(date) if date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+    return AnalyticsService.compare_periods(db, user_id, period, n, at)
+
+@router.get("/time-performance")
+def get_time_performance(
+    tz: str = Query("UTC", description="IANA timezone for hours and weekdays, e.g. Europe/Berlin"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get performance by entry hour, weekday and weekday x hour"""
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone {tz}")
+    return AnalyticsService.get_time_performance(db, user_id, tz, *date_range)
+
+@router.get("/holding-time")
+def get_holding_time(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get performance by holding-time style and holding-time histogram"""
+    return AnalyticsService.get_holding_time(db, user_id, *date_range)
+
 @router.get("/distribution")
 def get_trade_distribution(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get trade distribution (Long vs Short)"""
-    return AnalyticsService.get_trade_distribution(db, user_id)
+    return AnalyticsService.get_trade_distribution(db, user_id, *date_range)
+
+@router.get("/distribution/histogram")
+def get_distribution_histogram(
+    background_tasks: BackgroundTasks,
+    metric: str = Query("pnl", description="pnl, pnl_percent or holding_hours"),
+    bins: int = Query(20, ge=1, le=200),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get percentiles and histogram bins of a per-trade metric from its stored quantile sketch"""
+    try:
+        # A missing or stale sketch is rebuilt after the response, outside this read
+        return SketchService.histogram(db, user_id, metric, bins, *date_range,
+                                       on_stale=lambda uid: background_tasks.add_task(SketchService.rebuild, uid))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/symbols")
+def get_symbol_performance(
+    sort_by: str = Query("pnl", description="pnl, trades, win_rate or avg_pnl"),
+    order: str = Query("desc", description="desc for the top, asc for the bottom"),
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Get per-symbol performance, sorted and paginated"""
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    try:
+        return AnalyticsService.get_symbol_performance(db, user_id, sort_by, order == "desc", limit, offset,
+                                                        *date_range)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/correlation")
+def get_correlation(
+    method: str = Query("pearson", description="pearson or spearman"),
+    top: int = Query(20, ge=2, le=MAX_SYMBOLS, description="Number of most-traded symbols to correlate"),
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Correlation matrix of daily P&L between the most traded symbols"""
+    try:
+        return CorrelationService.correlation(db, user_id, method, top, *date_range)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/asset-performance")
 def get_asset_performance(
+    date_range: Tuple[Optional[datetime], Optional[datetime]] = Depends(entry_date_range),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Get performance by asset type"""
-    return AnalyticsService.get_asset_performance(db, user_id)
+    return AnalyticsService.get_asset_performance(db, user_id, *date_range)
+
+@router.post("/pivot")
+def get_pivot(
+    req: PivotRequest,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Group closed trades by any combination of dimensions and aggregate the chosen measures"""
+    columns = trade_columns.columns(db, user_id).between(*parse_date_range(req.start_date, req.end_date))
+    try:
+        return PivotService.pivot(columns, req.group_by, req.measures, req.filters, req.sort_by,
+                                  req.descending, req.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1 +1,227 @@
-# backtesting endpoint
+"""Backtesting endpoint — rule-based strategies over locally stored candles."""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import inspect
+import json
+import threading
+import numpy as np
+
+from app.api.v1.endpoints.auth import get_current_user
+from app.core.database import get_db
+from app.models.user import User
+from app.models.trade import Trade
+from app.services.analytics_service import AnalyticsService
+from app.services.backtesting_service import BacktestingService, STRATEGIES
+from app.services.candle_store import candle_store, epoch_ms, INTERVAL_MS
+from app.services.sweep_service import SweepRunner, expand_grid, MAX_SWEEP_CONFIGS, MAX_SWEEP_WORKERS
+from app.services.backtest_job_service import BacktestJobService, RESULT_TABLES, read_table
+
+router = APIRouter()
+
+MAX_RETURNED_TRADES = 1000
+MAX_EQUITY_POINTS = 1000
+MAX_RESULT_PAGE = 5000
+
+# Sweeps currently streaming, by id, so they can be cancelled from another request
+_active_sweeps: Dict[str, tuple] = {}
+_active_sweeps_lock = threading.Lock()
+
+class BacktestRequest(BaseModel):
+    symbol: str
+    interval: str = "1h"
+    start_date: datetime
+    end_date: datetime
+    strategy: str = "sma_cross"
+    params: Dict[str, Any] = {}
+    quantity: float = Field(1.0, gt=0)
+    initial_capital: float = Field(10_000.0, gt=0)
+    fee_rate: float = Field(0.001, ge=0)
+    slippage: float = Field(0.0005, ge=0)
+
+class SweepRequest(BaseModel):
+    symbol: str
+    interval: str = "1h"
+    start_date: datetime
+    end_date: datetime
+    strategy: str = "sma_cross"
+    grid: Dict[str, List[Any]]
+    quantity: float = Field(1.0, gt=0)
+    initial_capital: float = Field(10_000.0, gt=0)
+    fee_rate: float = Field(0.001, ge=0)
+    slippage: float = Field(0.0005, ge=0)
+    max_workers: Optional[int] = Field(None, ge=1, le=MAX_SWEEP_WORKERS)
+
+def load_candles(symbol: str, interval: str, start_date: datetime, end_date: datetime) -> Dict[str, np.ndarray]:
+    if interval not in INTERVAL_MS:
+        raise HTTPException(400, f"Unsupported interval {interval}")
+    if end_date <= start_date:
+        raise HTTPException(400, "end_date must be after start_date")
+    try:
+        candles = candle_store.get_candles(symbol, interval, epoch_ms(start_date), epoch_ms(end_date))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Cannot load candles for {symbol}: {e}")
+    if len(candles["close"]) == 0:
+        raise HTTPException(400, f"No candles for {symbol} {interval} in that range")
+    return candles
+
+def strategy_signal(candles: Dict[str, np.ndarray], strategy: str, params: Dict[str, Any]) -> np.ndarray:
+    try:
+        return BacktestingService.signals(candles, strategy, params)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(400, f"Invalid strategy configuration: {e}")
+
+def validate_job_request(req: BaseModel) -> None:
+    """Reject what would only fail inside the worker, before anything is queued"""
+    if req.interval not in INTERVAL_MS:
+        raise HTTPException(400, f"Unsupported interval {req.interval}")
+    if req.end_date <= req.start_date:
+        raise HTTPException(400, "end_date must be after start_date")
+    if req.strategy not in STRATEGIES:
+        raise HTTPException(400, f"Unknown strategy {req.strategy}")
+    if isinstance(req, SweepRequest):
+        configs = len(expand_grid(req.grid))
+        if configs == 0 or configs > MAX_SWEEP_CONFIGS:
+            raise HTTPException(400, f"Grid expands to {configs} configurations (1-{MAX_SWEEP_CONFIGS} allowed)")
+
+def trade_to_dict(trade: Trade) -> Dict:
+    return {"symbol": trade.symbol, "direction": trade.direction.value, "entry_date": trade.entry_date,
+            "entry_price": round(trade.entry_price, 8), "exit_date": trade.exit_date,
+            "exit_price": round(trade.exit_price, 8), "quantity": trade.quantity,
+            "commission": round(trade.commission, 8), "pnl": round(trade.pnl, 2), "status": trade.status.value}
+
+@router.get("/strategies")
+def list_strategies(current_user: User = Depends(get_current_user)):
+    """Available strategies and their default parameters"""
+    return [{"name": name, "params": {p.name: p.default for p in list(inspect.signature(fn).parameters.values())[1:]}}
+            for name, fn in STRATEGIES.items()]
+
+@router.post("/run")
+def run_backtest(req: BacktestRequest, current_user: User = Depends(get_current_user)):
+    """Run one strategy and score its trades with the journal's own analytics"""
+    candles = load_candles(req.symbol, req.interval, req.start_date, req.end_date)
+    signal = strategy_signal(candles, req.strategy, req.params)
+    result = BacktestingService.run(candles, signal, req.quantity, req.initial_capital, req.fee_rate, req.slippage)
+    trades = BacktestingService.to_trades(result, candles, req.symbol.upper(), req.quantity, current_user.id)
+
+    equity = result["equity"]
+    sample = np.unique(np.linspace(0, len(equity) - 1, min(len(equity), MAX_EQUITY_POINTS)).astype(np.int64))
+    return {
+        "symbol": req.symbol.upper(),
+        "interval": req.interval,
+        "strategy": req.strategy,
+        "bars": len(equity),
+        "final_equity": round(float(equity[-1]), 2),
+        "summary": AnalyticsService.summarize_trades(trades),
+        "drawdown": AnalyticsService.drawdown_from_trades(trades),
+        "equity_curve": [{"time": t, "equity": round(v, 2)}
+                         for t, v in zip(candles["open_time"][sample].tolist(), equity[sample].tolist())],
+        "total_trades": len(trades),
+        "trades": [trade_to_dict(t) for t in trades[:MAX_RETURNED_TRADES]],
+    }
+
+@router.post("/sweep")
+def run_sweep(req: SweepRequest, current_user: User = Depends(get_current_user)):
+    """
+    Grid-search strategy parameters across a process pool. Streams NDJSON: a
+    "start" line with the sweep id, one "result" line per configuration as it
+    finishes, then a "done" line. DELETE /sweep/{sweep_id} stops it early.
+    """
+    candles = load_candles(req.symbol, req.interval, req.start_date, req.end_date)
+    run_kwargs = {"quantity": req.quantity, "initial_capital": req.initial_capital,
+                  "fee_rate": req.fee_rate, "slippage": req.slippage}
+    try:
+        runner = SweepRunner(candles, req.strategy, req.grid, run_kwargs, req.max_workers)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    def stream():
+        with _active_sweeps_lock:
+            _active_sweeps[runner.id] = (current_user.id, runner)
+        try:
+            yield json.dumps({"type": "start", "sweep_id": runner.id, "total": len(runner.configs),
+                              "bars": len(candles["close"]), "workers": runner.max_workers}) + "\n"
+            for result in runner.results():
+                yield json.dumps({"type": "result", **result}) + "\n"
+            yield json.dumps({"type": "done", "completed": runner.completed, "cancelled": runner.cancelled}) + "\n"
+        finally:
+            # Also reached when the client disconnects mid-stream, which tears the pool down
+            runner.cancel()
+            with _active_sweeps_lock:
+                _active_sweeps.pop(runner.id, None)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.delete("/sweep/{sweep_id}")
+def cancel_sweep(sweep_id: str, current_user: User = Depends(get_current_user)):
+    """Cancel a running sweep; configurations already running finish, queued ones are dropped"""
+    with _active_sweeps_lock:
+        entry = _active_sweeps.get(sweep_id)
+    if entry is None or entry[0] != current_user.id:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    entry[1].cancel()
+    return {"message": "Sweep cancelled", "sweep_id": sweep_id}
+
+@router.post("/jobs/run", status_code=202)
+def submit_backtest_job(req: BacktestRequest, db: Session = Depends(get_db),
+                        current_user: User = Depends(get_current_user)):
+    """Queue a backtest to run in a worker process; poll GET /jobs/{job_id} for progress"""
+    validate_job_request(req)
+    job = BacktestJobService.submit(db, current_user.id, "run", req.model_dump(mode="json"))
+    return BacktestJobService.to_dict(job)
+
+@router.post("/jobs/sweep", status_code=202)
+def submit_sweep_job(req: SweepRequest, db: Session = Depends(get_db),
+                     current_user: User = Depends(get_current_user)):
+    """Queue a parameter sweep to run in a worker process"""
+    validate_job_request(req)
+    job = BacktestJobService.submit(db, current_user.id, "sweep", req.model_dump(mode="json"))
+    return BacktestJobService.to_dict(job)
+
+@router.get("/jobs")
+def list_jobs(limit: int = Query(50, ge=1, le=200), db: Session = Depends(get_db),
+              current_user: User = Depends(get_current_user)):
+    """Most recent backtest jobs first"""
+    return [BacktestJobService.to_dict(job) for job in BacktestJobService.list_jobs(db, current_user.id, limit)]
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Status, progress and, once completed, the summary of a job"""
+    job = BacktestJobService.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return BacktestJobService.to_dict(job)
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Cancel a queued or running job"""
+    job = BacktestJobService.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in ("QUEUED", "RUNNING"):
+        raise HTTPException(400, f"Job is already {job.status.lower()}")
+    return BacktestJobService.to_dict(BacktestJobService.cancel_job(db, job))
+
+@router.get("/jobs/{job_id}/results/{table}")
+def get_job_results(
+    job_id: int,
+    table: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=MAX_RESULT_PAGE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """A page of a completed job's results: trades or equity for runs, configs for sweeps"""
+    job = BacktestJobService.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "COMPLETED":
+        raise HTTPException(400, f"Job is {job.status.lower()}, results are not available")
+    if table not in RESULT_TABLES[job.kind]:
+        raise HTTPException(status_code=404, detail=f"No {table} results for a {job.kind} job")
+    rows, total = read_table(job.id, table, offset, limit)
+    next_offset = offset + len(rows)
+    return {"rows": rows, "total": total, "offset": offset, "next_offset": next_offset if next_offset < total else None}
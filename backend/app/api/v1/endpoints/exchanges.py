@@ -9,6 +9,7 @@ from app.models.exchange import ExchangeConnection
 from app.models.trade import Trade
 from app.core.security_utils import encrypt_string, decrypt_string
 from app.services.binance_service import BinanceService
+from app.services.report_service import ReportService
 
 router = APIRouter()
 
@@ -126,6 +127,7 @@ def sync_trades(
             )
             db.add(trade)
             count += 1
+        ReportService.invalidate(db, current_user.id, [t['entry_date'] for t in fetched_trades])
         db.commit()
     except Exception as e:
         sync_errors.append(f"Trade fetch skipped: {str(e)}")
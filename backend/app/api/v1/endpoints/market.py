@@ -0,0 +1,42 @@
+"""Market data endpoint — candles served from the local candle store."""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+import time
+
+from app.api.v1.endpoints.auth import get_current_user
+from app.models.user import User
+from app.services.candle_store import candle_store, INTERVAL_MS, SYMBOL_PATTERN
+
+router = APIRouter()
+
+@router.get("/klines")
+def get_klines(
+    symbol: str,
+    interval: str = "1m",
+    startTime: Optional[int] = Query(None, description="Open time of the first candle, ms since epoch"),
+    endTime: Optional[int] = Query(None, description="Open time of the last candle, ms since epoch"),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """Binance-style klines: [open_time, open, high, low, close, volume] per closed candle"""
+    if interval not in INTERVAL_MS:
+        raise HTTPException(400, f"Unsupported interval {interval}")
+    if not SYMBOL_PATTERN.match(symbol.upper()):
+        raise HTTPException(400, f"Invalid symbol {symbol}")
+    step = INTERVAL_MS[interval]
+    end = endTime if endTime is not None else int(time.time() * 1000)
+    if startTime is not None:
+        # Never fetch more than one page of candles for one request
+        start, end = startTime, min(end, startTime + limit * step)
+    else:
+        start = end - limit * step
+
+    try:
+        candles = candle_store.get_candles(symbol, interval, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Cannot load klines for {symbol}: {e}")
+
+    # Page forward from startTime when given, otherwise return the most recent candles
+    sl = slice(0, limit) if startTime is not None else slice(-limit, None)
+    columns = [candles[name][sl].tolist() for name in ("open_time", "open", "high", "low", "close", "volume")]
+    return [list(row) for row in zip(*columns)]
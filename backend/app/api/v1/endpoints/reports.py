@@ -1 +1,41 @@
 # reports endpoint
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from app.api.v1.endpoints.auth import get_current_user
+from app.core.database import get_db
+from app.models.user import User
+from app.services.report_service import ReportService, PERIOD_TYPES
+
+router = APIRouter()
+
+def check_period_type(period_type: str) -> None:
+    if period_type not in PERIOD_TYPES:
+        raise HTTPException(400, f"period_type must be one of {', '.join(PERIOD_TYPES)}")
+
+@router.get("/{period_type}")
+def get_report(
+    period_type: str,
+    date: Optional[str] = Query(None, description="Any day in the period, YYYY-MM-DD; defaults to today"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Weekly, monthly or yearly report; past periods are served precomputed"""
+    check_period_type(period_type)
+    try:
+        at = datetime.fromisoformat(date) if date else datetime.utcnow()
+    except ValueError:
+        raise HTTPException(400, "date must be YYYY-MM-DD")
+    return ReportService.get_report(db, current_user.id, period_type, at)
+
+@router.get("/{period_type}/periods")
+def list_reports(
+    period_type: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stored reports of one period type, newest first"""
+    check_period_type(period_type)
+    return ReportService.list_reports(db, current_user.id, period_type)
@@ -3,12 +3,14 @@ Simulated Exchange Endpoint
 Supports:  Spot (BUY/SELL)  +  Futures (LONG/SHORT with leverage)
 Every executed order is automatically logged to the Trading Journal.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
-import requests as req_lib
-from datetime import datetime
+from sqlalchemy import insert, update, and_, or_
+from typing import Dict, Iterable, List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta
+import base64
+from collections import defaultdict
 
 from app.api.v1.endpoints.auth import get_current_user
 from app.core.database import get_db
@@ -16,21 +18,36 @@ from app.models.user import User
 from app.models.wallet import Wallet
 from app.models.trade import Trade, TradeDirection, TradeStatus
 from app.models.sim_position import SimPosition
+from app.services.price_service import fetch_ticker_prices
+from app.services.wallet_ledger_service import WalletLedgerService
+from app.services.report_service import ReportService
+from app.services.sketch_service import SketchService, sketch_values, trade_metrics
+from app.websocket import stream_positions
 
 router = APIRouter()
 
+STARTING_BALANCE = 100_000.0
+MAX_BATCH_ORDERS = 200
+
 def get_live_price(symbol: str) -> float:
+    return get_live_prices([symbol])[symbol]
+
+def get_live_prices(symbols: Iterable[str], partial: bool = False) -> Dict[str, float]:
+    """Live prices for symbols; with partial, symbols without a price are left out instead of failing"""
+    symbols = sorted(set(symbols))
     try:
-        resp = req_lib.get(f"https://api.binance.com/api/v3/ticker/price?symbol={symbol}", timeout=5)
-        resp.raise_for_status()
-        return float(resp.json()["price"])
+        prices = fetch_ticker_prices(symbols)
     except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Cannot fetch live price for {symbol}: {e}")
+        raise HTTPException(status_code=502, detail=f"Cannot fetch live price for {', '.join(symbols)}: {e}")
+    missing = [s for s in symbols if s not in prices]
+    if missing and not partial:
+        raise HTTPException(status_code=502, detail=f"Cannot fetch live price for {', '.join(missing)}")
+    return prices
 
 def get_or_create_wallet(db: Session, user_id: int, asset: str) -> Wallet:
     wallet = db.query(Wallet).filter(Wallet.user_id == user_id, Wallet.asset == asset).first()
     if not wallet:
-        wallet = Wallet(user_id=user_id, asset=asset, balance=0.0, locked_balance=0.0)
+        wallet = Wallet(user_id=user_id, asset=asset, balance=0.0, locked_balance=0.0, entries_since_snapshot=0)
         db.add(wallet)
         db.flush()
     return wallet
@@ -64,6 +81,19 @@ class FuturesOrderRequest(BaseModel):
     take_profit: Optional[float] = None
     stop_loss: Optional[float] = None
 
+class BatchOrder(BaseModel):
+    type: str = Field(..., pattern="^(spot|futures)$")
+    symbol: str
+    side: str
+    quantity: float
+    leverage: int = 10
+    take_profit: Optional[float] = None
+    stop_loss: Optional[float] = None
+
+class BatchOrderRequest(BaseModel):
+    orders: List[BatchOrder] = Field(..., min_length=1, max_length=MAX_BATCH_ORDERS)
+    atomic: bool = True
+
 class ClosePositionRequest(BaseModel):
     position_id: int
 
@@ -82,17 +112,24 @@ class PositionResponse(BaseModel):
     stop_loss: Optional[float]
     status: str
     journal_trade_id: Optional[int]
+    exit_price: Optional[float] = None
+    realized_pnl: Optional[float] = None
+    closed_at: Optional[datetime] = None
     created_at: datetime
     class Config:
         orm_mode = True
 
+class PositionHistoryPage(BaseModel):
+    items: List[PositionResponse]
+    next_cursor: Optional[str]
+
 # Wallet
 @router.get("/wallet", response_model=List[WalletResponse])
 def get_wallets(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     wallets = db.query(Wallet).filter(Wallet.user_id == current_user.id).all()
     if not wallets:
-        default = Wallet(user_id=current_user.id, asset="USDT", balance=100_000.0, locked_balance=0.0)
-        db.add(default)
+        default = get_or_create_wallet(db, current_user.id, "USDT")
+        WalletLedgerService.record(db, default, delta_balance=STARTING_BALANCE, reason="deposit")
         db.commit()
         db.refresh(default)
         wallets = [default]
@@ -100,109 +137,286 @@ def get_wallets(db: Session = Depends(get_db), current_user: User = Depends(get_
 
 @router.post("/wallet/reset")
 def reset_wallet(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db.query(SimPosition).filter(SimPosition.user_id == current_user.id, SimPosition.status == "OPEN").update({"status": "CLOSED"})
-    db.query(Wallet).filter(Wallet.user_id == current_user.id).delete()
-    db.add(Wallet(user_id=current_user.id, asset="USDT", balance=100_000.0, locked_balance=0.0))
+    db.query(SimPosition).filter(SimPosition.user_id == current_user.id, SimPosition.status == "OPEN").update(
+        {"status": "CLOSED", "closed_at": datetime.utcnow()})
+    # Zero every wallet through the ledger instead of deleting rows, so balance history survives the reset
+    for wallet in db.query(Wallet).filter(Wallet.user_id == current_user.id).all():
+        WalletLedgerService.set_balance(db, wallet, 0.0, 0.0, reason="reset")
+    usdt_wallet = get_or_create_wallet(db, current_user.id, "USDT")
+    WalletLedgerService.record(db, usdt_wallet, delta_balance=STARTING_BALANCE, reason="reset")
     db.commit()
     return {"message": "Wallet reset to $100,000 USDT"}
 
-# Spot
-@router.post("/order/spot")
-def place_spot_order(order: SpotOrderRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    if not order.symbol.endswith("USDT"):
-        raise HTTPException(400, "Only USDT pairs supported")
-    if order.quantity <= 0:
-        raise HTTPException(400, "Quantity must be > 0")
-
-    base_asset = order.symbol[:-4]
-    price = get_live_price(order.symbol)
-    total_cost = round(price * order.quantity, 4)
-    usdt_wallet = get_or_create_wallet(db, current_user.id, "USDT")
-    base_wallet = get_or_create_wallet(db, current_user.id, base_asset)
-
-    if order.side.upper() == "BUY":
-        if usdt_wallet.balance < total_cost:
-            raise HTTPException(400, f"Insufficient USDT (need {total_cost:.2f}, have {usdt_wallet.balance:.2f})")
-        usdt_wallet.balance -= total_cost
-        base_wallet.balance += order.quantity
-        journal = Trade(user_id=current_user.id, symbol=f"{base_asset}/USDT", asset_type="crypto",
-                        direction=TradeDirection.LONG, entry_date=datetime.utcnow(), entry_price=price,
-                        quantity=order.quantity, status=TradeStatus.OPEN, source="simulated_spot",
-                        notes=f"Sim spot BUY {order.quantity} {base_asset} @ ${price:,.2f}")
-        db.add(journal)
-        db.commit()
-        return {"message": f"Bought {order.quantity} {base_asset} @ ${price:,.2f}", "symbol": order.symbol,
-                "side": "BUY", "quantity": order.quantity, "price": price, "total": total_cost, "trade_id": journal.id}
+@router.get("/wallet/history")
+def get_wallet_history(
+    asset: str = "USDT",
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"),
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format"),
+    interval: str = Query("day", pattern="^(day|hour)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Balance over time, rebuilt from wallet snapshots and the ledger"""
+    try:
+        start_dt = datetime.fromisoformat(start_date) if start_date else None
+        end_dt = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(400, "Dates must be YYYY-MM-DD or ISO 8601 datetimes")
+    try:
+        return WalletLedgerService.balance_history(db, current_user.id, asset.upper(), start_dt, end_dt, interval)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+# Order execution
+class OrderBatch:
+    """
+    Executes orders for one user against wallets and open spot lots held in memory.
+    New journal trades and positions are collected as rows and written with one bulk
+    insert each in flush(); the caller commits.
+    """
+
+    def __init__(self, db: Session, user_id: int, prices: Dict[str, float]):
+        self.db = db
+        self.user_id = user_id
+        self.prices = prices
+        self.wallets = {w.asset: w for w in db.query(Wallet).filter(Wallet.user_id == user_id).all()}
+        self.open_lots: Dict[str, List[Dict]] = {}
+        self.new_trades: List[Dict] = []
+        self.new_positions: List[Dict] = []
+        self.trade_updates: List[Dict] = []
+        self.closed_entry_dates: List[datetime] = []   # entry dates of existing trades closed here, for reports
+        self.closed_values: List[Dict] = []            # sketched metrics of every trade closed here
+        self._id_refs: Dict[int, List[tuple]] = defaultdict(list)   # id(row) -> [(target, key)] to fill with row["id"]
+
+    def wallet(self, asset: str) -> Wallet:
+        if asset not in self.wallets:
+            wallet = Wallet(user_id=self.user_id, asset=asset, balance=0.0, locked_balance=0.0, entries_since_snapshot=0)
+            self.db.add(wallet)
+            self.wallets[asset] = wallet
+        return self.wallets[asset]
+
+    def lots(self, journal_symbol: str) -> List[Dict]:
+        """Open simulated spot buys for a symbol, oldest first, loaded once per batch"""
+        if journal_symbol not in self.open_lots:
+            rows = self.db.query(Trade.id, Trade.entry_price, Trade.quantity, Trade.entry_date).filter(
+                Trade.user_id == self.user_id, Trade.symbol == journal_symbol,
+                Trade.status == TradeStatus.OPEN, Trade.direction == TradeDirection.LONG,
+                Trade.source == "simulated_spot").order_by(Trade.entry_date).all()
+            self.open_lots[journal_symbol] = [{"id": r.id, "entry_price": r.entry_price, "quantity": r.quantity, "row": None,
+                                               "entry_date": r.entry_date} for r in rows]
+        return self.open_lots[journal_symbol]
+
+    def _ref(self, target, key: str, row: Dict) -> None:
+        self._id_refs[id(row)].append((target, key))
+
+    def spot(self, order: SpotOrderRequest) -> Dict:
+        base_asset = order.symbol[:-4]
+        journal_symbol = f"{base_asset}/USDT"
+        price = self.prices[order.symbol]
+        total_cost = round(price * order.quantity, 4)
+        usdt_wallet = self.wallet("USDT")
+        base_wallet = self.wallet(base_asset)
+        now = datetime.utcnow()
+
+        if order.side.upper() == "BUY":
+            if usdt_wallet.balance < total_cost:
+                raise HTTPException(400, f"Insufficient USDT (need {total_cost:.2f}, have {usdt_wallet.balance:.2f})")
+            row = dict(user_id=self.user_id, symbol=journal_symbol, asset_type="crypto",
+                       direction=TradeDirection.LONG, entry_date=now, entry_price=price,
+                       quantity=order.quantity, status=TradeStatus.OPEN, source="simulated_spot",
+                       notes=f"Sim spot BUY {order.quantity} {base_asset} @ ${price:,.2f}")
+            self.new_trades.append(row)
+            self.lots(journal_symbol).append({"id": None, "entry_price": price, "quantity": order.quantity, "row": row,
+                                              "entry_date": now})
+            for wallet, delta in ((usdt_wallet, -total_cost), (base_wallet, order.quantity)):
+                entry = WalletLedgerService.record(self.db, wallet, delta_balance=delta, reason="spot_buy", ref_type="trade")
+                self._ref(entry, "ref_id", row)
+            result = {"message": f"Bought {order.quantity} {base_asset} @ ${price:,.2f}", "symbol": order.symbol,
+                      "side": "BUY", "quantity": order.quantity, "price": price, "total": total_cost, "trade_id": None}
+            self._ref(result, "trade_id", row)
+            return result
 
-    elif order.side.upper() == "SELL":
         if base_wallet.balance < order.quantity:
             raise HTTPException(400, f"Insufficient {base_asset} (need {order.quantity}, have {base_wallet.balance:.4f})")
-        open_trades = db.query(Trade).filter(Trade.user_id == current_user.id, Trade.symbol == f"{base_asset}/USDT",
-            Trade.status == TradeStatus.OPEN, Trade.direction == TradeDirection.LONG,
-            Trade.source == "simulated_spot").order_by(Trade.entry_date).all()
-        avg_entry = (sum(t.entry_price * t.quantity for t in open_trades) / sum(t.quantity for t in open_trades)) if open_trades else price
+        lots = self.lots(journal_symbol)
+        avg_entry = (sum(l["entry_price"] * l["quantity"] for l in lots) / sum(l["quantity"] for l in lots)) if lots else price
         pnl = round((price - avg_entry) * order.quantity, 4)
-        base_wallet.balance -= order.quantity
-        usdt_wallet.balance += total_cost
+        ref_type = "trade" if lots else None
+        entries = [WalletLedgerService.record(self.db, wallet, delta_balance=delta, reason="spot_sell", ref_type=ref_type)
+                   for wallet, delta in ((base_wallet, -order.quantity), (usdt_wallet, total_cost))]
         remaining = order.quantity
-        for t in open_trades:
-            if remaining <= 0: break
-            close_qty = min(t.quantity, remaining)
-            t.exit_price = price; t.exit_date = datetime.utcnow()
-            t.status = TradeStatus.CLOSED; t.pnl = round((price - t.entry_price) * close_qty, 4)
+        while lots and remaining > 0:
+            lot = lots.pop(0)
+            if entries:
+                # The ledger rows point at the oldest lot the sale closes
+                for entry in entries:
+                    if lot["row"] is not None:
+                        self._ref(entry, "ref_id", lot["row"])
+                    else:
+                        entry.ref_id = lot["id"]
+                entries = []
+            close_qty = min(lot["quantity"], remaining)
+            closed = dict(exit_price=price, exit_date=now, status=TradeStatus.CLOSED,
+                          pnl=round((price - lot["entry_price"]) * close_qty, 4))
+            if lot["row"] is not None:
+                lot["row"].update(closed)
+            else:
+                self.trade_updates.append({"id": lot["id"], **closed})
+                self.closed_entry_dates.append(lot["entry_date"])
+            self.closed_values.append(trade_metrics(closed["pnl"], lot["entry_price"], lot["quantity"], lot["entry_date"], now))
             remaining -= close_qty
-        db.commit()
         return {"message": f"Sold {order.quantity} {base_asset} @ ${price:,.2f} | PnL: ${pnl:+.2f}",
                 "symbol": order.symbol, "side": "SELL", "quantity": order.quantity, "price": price, "total": total_cost, "pnl": pnl}
+
+    def futures(self, order: FuturesOrderRequest) -> Dict:
+        side = order.side.upper()
+        base_asset = order.symbol[:-4]
+        price = self.prices[order.symbol]
+        notional = price * order.quantity
+        margin = round(notional / order.leverage, 4)
+        liq_price = calc_liquidation_price(side, price, order.leverage)
+
+        usdt_wallet = self.wallet("USDT")
+        if usdt_wallet.balance < margin:
+            raise HTTPException(400, f"Insufficient USDT margin (need {margin:.2f}, have {usdt_wallet.balance:.2f})")
+
+        direction = TradeDirection.LONG if side == "LONG" else TradeDirection.SHORT
+        journal = dict(user_id=self.user_id, symbol=f"{base_asset}/USDT PERP", asset_type="crypto",
+                       direction=direction, entry_date=datetime.utcnow(), entry_price=price,
+                       quantity=order.quantity, status=TradeStatus.OPEN, source="simulated_futures",
+                       notes=f"Sim futures {side} {order.quantity} {base_asset} @ ${price:,.2f} | {order.leverage}x leverage")
+        position = dict(user_id=self.user_id, symbol=order.symbol, base_asset=base_asset,
+                        trade_type="futures", side=side, quantity=order.quantity, entry_price=price,
+                        leverage=order.leverage, margin_used=margin, liquidation_price=liq_price,
+                        take_profit=order.take_profit, stop_loss=order.stop_loss,
+                        status="OPEN", journal_trade_id=None)
+        self.new_trades.append(journal)
+        self.new_positions.append(position)
+        self._ref(position, "journal_trade_id", journal)
+        entry = WalletLedgerService.record(self.db, usdt_wallet, delta_balance=-margin, delta_locked=margin,
+                                           reason="margin_lock", ref_type="position")
+        self._ref(entry, "ref_id", position)
+
+        result = {"message": f"Opened {side} {order.quantity} {base_asset} @ ${price:,.2f} ({order.leverage}x)",
+                  "position_id": None, "journal_trade_id": None, "symbol": order.symbol, "side": side,
+                  "quantity": order.quantity, "entry_price": price, "leverage": order.leverage,
+                  "margin_used": margin, "notional_value": notional, "liquidation_price": liq_price}
+        self._ref(result, "position_id", position)
+        self._ref(result, "journal_trade_id", journal)
+        return result
+
+    def _resolve(self, row: Dict) -> None:
+        for target, key in self._id_refs.pop(id(row), []):
+            if isinstance(target, dict):
+                target[key] = row["id"]
+            else:
+                setattr(target, key, row["id"])
+
+    def _bulk_insert(self, model, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        ids = self.db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows).scalars().all()
+        for row, row_id in zip(rows, ids):
+            row["id"] = row_id
+            self._resolve(row)
+
+    def flush(self) -> None:
+        """Write journal trades, then positions (which reference them), then lot closures"""
+        # Sketches first, while the trades table still shows the version they were kept at
+        SketchService.apply(self.db, self.user_id, added=self.closed_values)
+        if self.trade_updates:
+            self.db.execute(update(Trade), self.trade_updates)
+            ReportService.invalidate(self.db, self.user_id, self.closed_entry_dates)
+        self._bulk_insert(Trade, self.new_trades)
+        self._bulk_insert(SimPosition, self.new_positions)
+        self.db.flush()
+
+def validate_order(order: BatchOrder) -> None:
+    if order.type == "spot":
+        if not order.symbol.endswith("USDT"):
+            raise HTTPException(400, "Only USDT pairs supported")
+        if order.quantity <= 0:
+            raise HTTPException(400, "Quantity must be > 0")
+        if order.side.upper() not in ("BUY", "SELL"):
+            raise HTTPException(400, "Side must be BUY or SELL")
     else:
-        raise HTTPException(400, "Side must be BUY or SELL")
+        if not order.symbol.endswith("USDT"):
+            raise HTTPException(400, "Only USDT-margined futures supported")
+        if order.quantity <= 0:
+            raise HTTPException(400, "Quantity must be > 0")
+        if order.leverage < 1 or order.leverage > 125:
+            raise HTTPException(400, "Leverage must be between 1 and 125")
+        if order.side.upper() not in ("LONG", "SHORT"):
+            raise HTTPException(400, "Side must be LONG or SHORT")
+
+# Spot
+@router.post("/order/spot")
+def place_spot_order(order: SpotOrderRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    validate_order(BatchOrder(type="spot", **order.dict()))
+    batch = OrderBatch(db, current_user.id, {order.symbol: get_live_price(order.symbol)})
+    result = batch.spot(order)
+    batch.flush()
+    db.commit()
+    return result
 
 # Futures
 @router.post("/order/futures")
 def place_futures_order(order: FuturesOrderRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    if not order.symbol.endswith("USDT"):
-        raise HTTPException(400, "Only USDT-margined futures supported")
-    if order.quantity <= 0:
-        raise HTTPException(400, "Quantity must be > 0")
-    if order.leverage < 1 or order.leverage > 125:
-        raise HTTPException(400, "Leverage must be between 1 and 125")
-    side = order.side.upper()
-    if side not in ("LONG", "SHORT"):
-        raise HTTPException(400, "Side must be LONG or SHORT")
-
-    base_asset = order.symbol[:-4]
-    price = get_live_price(order.symbol)
-    notional = price * order.quantity
-    margin = round(notional / order.leverage, 4)
-    liq_price = calc_liquidation_price(side, price, order.leverage)
+    validate_order(BatchOrder(type="futures", **order.dict()))
+    batch = OrderBatch(db, current_user.id, {order.symbol: get_live_price(order.symbol)})
+    result = batch.futures(order)
+    batch.flush()
+    db.commit()
+    return result
 
-    usdt_wallet = get_or_create_wallet(db, current_user.id, "USDT")
-    if usdt_wallet.balance < margin:
-        raise HTTPException(400, f"Insufficient USDT margin (need {margin:.2f}, have {usdt_wallet.balance:.2f})")
-
-    usdt_wallet.balance -= margin
-    usdt_wallet.locked_balance += margin
-    direction = TradeDirection.LONG if side == "LONG" else TradeDirection.SHORT
-
-    journal = Trade(user_id=current_user.id, symbol=f"{base_asset}/USDT PERP", asset_type="crypto",
-                    direction=direction, entry_date=datetime.utcnow(), entry_price=price,
-                    quantity=order.quantity, status=TradeStatus.OPEN, source="simulated_futures",
-                    stop_loss=order.stop_loss, take_profit=order.take_profit,
-                    notes=f"Sim futures {side} {order.quantity} {base_asset} @ ${price:,.2f} | {order.leverage}x leverage")
-    db.add(journal)
-    db.flush()
-
-    position = SimPosition(user_id=current_user.id, symbol=order.symbol, base_asset=base_asset,
-                           trade_type="futures", side=side, quantity=order.quantity, entry_price=price,
-                           leverage=order.leverage, margin_used=margin, liquidation_price=liq_price,
-                           take_profit=order.take_profit, stop_loss=order.stop_loss,
-                           status="OPEN", journal_trade_id=journal.id)
-    db.add(position)
+# Batch
+@router.post("/orders/batch")
+def place_batch_orders(req: BatchOrderRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Place many spot/futures orders with one price fetch per symbol and one commit.
+    atomic=true rejects the whole batch on the first failing order; atomic=false
+    fills what it can and reports the rest, including orders for symbols without
+    a live price.
+    """
+    valid = []
+    results: List[Optional[Dict]] = [None] * len(req.orders)
+    for i, order in enumerate(req.orders):
+        try:
+            validate_order(order)
+            valid.append(i)
+        except HTTPException as e:
+            if req.atomic:
+                raise HTTPException(400, {"index": i, "error": e.detail})
+            results[i] = {"index": i, "status": "rejected", "error": e.detail}
+
+    prices = get_live_prices({req.orders[i].symbol for i in valid}, partial=not req.atomic)
+    batch = OrderBatch(db, current_user.id, prices)
+    for i in valid:
+        order = req.orders[i]
+        if order.symbol not in prices:
+            results[i] = {"index": i, "status": "rejected", "error": f"Cannot fetch live price for {order.symbol}"}
+            continue
+        try:
+            if order.type == "spot":
+                fill = batch.spot(SpotOrderRequest(symbol=order.symbol, side=order.side, quantity=order.quantity))
+            else:
+                fill = batch.futures(FuturesOrderRequest(symbol=order.symbol, side=order.side, quantity=order.quantity,
+                                                         leverage=order.leverage, take_profit=order.take_profit,
+                                                         stop_loss=order.stop_loss))
+            # Keep the same dict: flush() fills its trade/position ids in place
+            fill.update(index=i, status="filled")
+            results[i] = fill
+        except HTTPException as e:
+            # Balance checks run before any wallet is touched, so a rejected order leaves no partial state
+            if req.atomic:
+                db.rollback()
+                raise HTTPException(400, {"index": i, "error": e.detail})
+            results[i] = {"index": i, "status": "rejected", "error": e.detail}
+
+    batch.flush()
     db.commit()
-    return {"message": f"Opened {side} {order.quantity} {base_asset} @ ${price:,.2f} ({order.leverage}x)",
-            "position_id": position.id, "journal_trade_id": journal.id, "symbol": order.symbol, "side": side,
-            "quantity": order.quantity, "entry_price": price, "leverage": order.leverage,
-            "margin_used": margin, "notional_value": notional, "liquidation_price": liq_price}
+    filled = sum(1 for r in results if r["status"] == "filled")
+    return {"atomic": req.atomic, "filled": filled, "rejected": len(results) - filled, "results": results}
 
 @router.post("/position/close")
 def close_position(req: ClosePositionRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -217,15 +431,21 @@ def close_position(req: ClosePositionRequest, db: Session = Depends(get_db), cur
     returned = round(position.margin_used + pnl, 4)
 
     usdt_wallet = get_or_create_wallet(db, current_user.id, "USDT")
-    usdt_wallet.balance += max(returned, 0)
-    usdt_wallet.locked_balance = max(usdt_wallet.locked_balance - position.margin_used, 0)
+    released = min(position.margin_used, usdt_wallet.locked_balance)
+    WalletLedgerService.record(db, usdt_wallet, delta_balance=max(returned, 0), delta_locked=-released,
+                               reason="margin_release", ref_type="position", ref_id=position.id)
     position.status = "CLOSED"
+    position.exit_price = exit_price
+    position.realized_pnl = pnl
+    position.closed_at = datetime.utcnow()
 
     if position.journal_trade_id:
         jt = db.query(Trade).filter(Trade.id == position.journal_trade_id).first()
         if jt:
             jt.exit_price = exit_price; jt.exit_date = datetime.utcnow()
             jt.status = TradeStatus.CLOSED; jt.pnl = pnl
+            SketchService.apply(db, current_user.id, added=[sketch_values(jt)])
+            ReportService.invalidate(db, current_user.id, [jt.entry_date])
 
     db.commit()
     return {"message": f"Closed {position.side} {position.quantity} {position.base_asset} @ ${exit_price:,.2f}",
@@ -237,7 +457,55 @@ def get_open_positions(db: Session = Depends(get_db), current_user: User = Depen
     return db.query(SimPosition).filter(SimPosition.user_id == current_user.id,
         SimPosition.status == "OPEN").order_by(SimPosition.created_at.desc()).all()
 
-@router.get("/positions/history", response_model=List[PositionResponse])
-def get_position_history(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(SimPosition).filter(SimPosition.user_id == current_user.id,
-        SimPosition.status == "CLOSED").order_by(SimPosition.created_at.desc()).limit(50).all()
+def encode_cursor(position: SimPosition) -> str:
+    return base64.urlsafe_b64encode(f"{position.created_at.isoformat()}|{position.id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, position_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(position_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+@router.get("/positions/history", response_model=PositionHistoryPage)
+def get_position_history(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    trade_type: Optional[str] = None,
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"),
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Closed positions, newest first, paged by (created_at, id) so every page costs the same"""
+    try:
+        start_dt = datetime.fromisoformat(start_date) if start_date else None
+        end_dt = datetime.fromisoformat(end_date) + timedelta(days=1) if end_date else None
+    except ValueError:
+        raise HTTPException(400, "Dates must be YYYY-MM-DD")
+    query = db.query(SimPosition).filter(SimPosition.user_id == current_user.id, SimPosition.status == "CLOSED")
+    if symbol:
+        query = query.filter(SimPosition.symbol == symbol.upper())
+    if side:
+        query = query.filter(SimPosition.side == side.upper())
+    if trade_type:
+        query = query.filter(SimPosition.trade_type == trade_type.lower())
+    if start_dt:
+        query = query.filter(SimPosition.created_at >= start_dt)
+    if end_dt:
+        query = query.filter(SimPosition.created_at < end_dt)
+    if cursor:
+        created_at, position_id = decode_cursor(cursor)
+        query = query.filter(or_(SimPosition.created_at < created_at,
+                                 and_(SimPosition.created_at == created_at, SimPosition.id < position_id)))
+
+    rows = query.order_by(SimPosition.created_at.desc(), SimPosition.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
+@router.websocket("/ws/positions")
+async def positions_stream(websocket: WebSocket, token: str = Query(...)):
+    """Push live P&L, margin ratio and liquidation distance for open positions (JWT in ?token=)"""
+    await stream_positions(websocket, token)
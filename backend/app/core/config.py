@@ -13,6 +13,16 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080
     
+    # Local market data (OHLCV candle files)
+    CANDLE_STORE_DIR: str = "./data/candles"
+    
+    # Backtest jobs: worker processes and columnar result files
+    BACKTEST_WORKERS: int = 2
+    BACKTEST_RESULTS_DIR: str = "./data/backtests"
+    
+    # Monte Carlo simulations: worker processes
+    MONTE_CARLO_WORKERS: int = 2
+    
     # Google OAuth
     GOOGLE_CLIENT_ID: str = ""
     
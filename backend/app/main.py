@@ -1,9 +1,15 @@
 from fastapi import FastAPI
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.api.v1.endpoints import auth, analytics, trades, users, exchanges, sim_exchange, portfolio
-from app.core.database import engine, Base
-from app.models import Trade, User, UserOnboarding, ExchangeConnection, PasswordResetToken, Wallet, SimPosition
+from app.api.v1.endpoints import auth, analytics, trades, users, exchanges, sim_exchange, portfolio, market, backtesting, reports
+from app.core.database import engine, Base, SessionLocal
+from app.websocket import price_feed
+from app.services.backtest_job_service import BacktestJobService, job_runner
+from app.services import monte_carlo_service
+from app.services.report_service import report_precompute_loop
+from app.services.wallet_ledger_service import WalletLedgerService
+from app.models import Trade, User, UserOnboarding, ExchangeConnection, PasswordResetToken, Wallet, WalletLedgerEntry, WalletSnapshot, SimPosition, BacktestJob, Report, TradeSketch
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,7 +25,24 @@ async def lifespan(app: FastAPI):
                 conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS source VARCHAR DEFAULT 'manual'"))
                 conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS asset_type VARCHAR DEFAULT 'stock'"))
                 conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS commission FLOAT DEFAULT 0.0"))
+                conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS mae FLOAT"))
+                conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS mfe FLOAT"))
+                conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS excursion_computed_at TIMESTAMP"))
+                conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS excursion_attempted_at TIMESTAMP"))
+                conn.execute(text("ALTER TABLE trades ADD COLUMN IF NOT EXISTS excursion_attempts INTEGER DEFAULT 0"))
                 conn.execute(text("ALTER TABLE exchange_connections ADD COLUMN IF NOT EXISTS account_type VARCHAR DEFAULT 'spot'"))
+                conn.execute(text("ALTER TABLE wallets ADD COLUMN IF NOT EXISTS entries_since_snapshot INTEGER"))
+                conn.execute(text("ALTER TABLE trade_sketches ADD COLUMN IF NOT EXISTS data_version VARCHAR"))
+                conn.execute(text("ALTER TABLE sim_positions ADD COLUMN IF NOT EXISTS exit_price FLOAT"))
+                conn.execute(text("ALTER TABLE sim_positions ADD COLUMN IF NOT EXISTS realized_pnl FLOAT"))
+                conn.execute(text("ALTER TABLE sim_positions ADD COLUMN IF NOT EXISTS closed_at TIMESTAMP"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sim_positions_user_status_created ON sim_positions (user_id, status, created_at)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_trades_user_status_entry ON trades (user_id, status, entry_date)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_trades_user_symbol ON trades (user_id, symbol)"))
+                conn.execute(text(
+                    "UPDATE sim_positions SET realized_pnl = (SELECT pnl FROM trades WHERE trades.id = sim_positions.journal_trade_id) "
+                    "WHERE status = 'CLOSED' AND realized_pnl IS NULL AND journal_trade_id IS NOT NULL"
+                ))
                 conn.commit()
                 print("Schema migration completed successfully")
             except Exception as e:
@@ -38,9 +61,24 @@ async def lifespan(app: FastAPI):
         raise e
             
     print("Database tables created successfully")
+    
+    db = SessionLocal()
+    try:
+        interrupted = BacktestJobService.fail_interrupted(db)
+        if interrupted:
+            print(f"Marked {interrupted} interrupted backtest job(s) as failed")
+        opened = WalletLedgerService.backfill_opening_entries(db)
+        if opened:
+            print(f"Recorded opening ledger entries for {opened} pre-ledger wallet(s)")
+    finally:
+        db.close()
+    report_task = asyncio.create_task(report_precompute_loop())
     yield
-    # Shutdown: cleanup if needed
-    pass
+    # Shutdown: stop the report task, the shared live price feed and the backtest workers
+    report_task.cancel()
+    await price_feed.stop()
+    job_runner.shutdown()
+    monte_carlo_service.simulation_pool.shutdown()
 
 app = FastAPI(title="TradeZella API", version="1.0.0", lifespan=lifespan)
 
@@ -63,6 +101,9 @@ app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(exchanges.router, prefix="/api/v1/exchanges", tags=["exchanges"])
 app.include_router(sim_exchange.router, prefix="/api/v1/sim_exchange", tags=["simulated_exchange"])
 app.include_router(portfolio.router, prefix="/api/v1/portfolio", tags=["portfolio"])
+app.include_router(market.router, prefix="/api/v1/market", tags=["market"])
+app.include_router(backtesting.router, prefix="/api/v1/backtesting", tags=["backtesting"])
+app.include_router(reports.router, prefix="/api/v1/reports", tags=["reports"])
 
 
 @app.get("/")
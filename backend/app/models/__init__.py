@@ -3,5 +3,9 @@ from .trade import Trade
 from .exchange import ExchangeConnection
 from .password_reset import PasswordResetToken
 from .wallet import Wallet
+from .wallet_ledger import WalletLedgerEntry, WalletSnapshot
 from .sim_position import SimPosition
 
+from .backtest_job import BacktestJob
+from .report import Report
+from .trade_sketch import TradeSketch
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
+from datetime import datetime
+from app.core.database import Base
+
+class BacktestJob(Base):
+    """A backtest or sweep run outside the request path; columnar results live on disk."""
+    __tablename__ = "backtest_jobs"
+
+    id               = Column(Integer, primary_key=True, index=True)
+    user_id          = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind             = Column(String, nullable=False)              # "run" | "sweep"
+    status           = Column(String, default="QUEUED")            # "QUEUED" | "RUNNING" | "COMPLETED" | "FAILED" | "CANCELLED"
+    params           = Column(String, nullable=False)              # JSON string of the submitted request
+    progress         = Column(Float, default=0.0)                  # 0.0 - 1.0
+    message          = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+    summary          = Column(String, nullable=True)               # JSON string, set on completion
+    error            = Column(String, nullable=True)
+    created_at       = Column(DateTime, default=datetime.utcnow)
+    started_at       = Column(DateTime, nullable=True)
+    finished_at      = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_backtest_jobs_user_created", "user_id", "created_at"),
+    )
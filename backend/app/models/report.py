@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+class Report(Base):
+    """Precomputed weekly / monthly / yearly report for one closed period."""
+    __tablename__ = "reports"
+
+    id           = Column(Integer, primary_key=True, index=True)
+    user_id      = Column(Integer, ForeignKey("users.id"), nullable=False)
+    period_type  = Column(String, nullable=False)               # "week" | "month" | "year"
+    period_start = Column(DateTime, nullable=False)             # UTC midnight; weeks start on Monday
+    period_end   = Column(DateTime, nullable=False)             # exclusive
+    payload      = Column(String, nullable=False)               # JSON string
+    is_stale     = Column(Boolean, default=False)               # a trade inside the period changed
+    generated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "period_type", "period_start", name="uq_reports_user_period"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -21,7 +21,15 @@ class SimPosition(Base):
     stop_loss        = Column(Float, nullable=True)
     status           = Column(String, default="OPEN")          # "OPEN" | "CLOSED"
     journal_trade_id = Column(Integer, ForeignKey("trades.id"), nullable=True)
+    exit_price       = Column(Float, nullable=True)
+    realized_pnl     = Column(Float, nullable=True)            # stored at close, never recomputed
+    closed_at        = Column(DateTime, nullable=True)
     created_at       = Column(DateTime, default=datetime.utcnow)
     updated_at       = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Serves open-position lookups and keyset-paginated history per user
+    __table_args__ = (
+        Index("ix_sim_positions_user_status_created", "user_id", "status", "created_at"),
+    )
+
     user = relationship("User", back_populates="sim_positions")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -34,8 +34,22 @@ class Trade(Base):
     asset_type = Column(String, default="stock")
     commission = Column(Float, default=0.0)
     source = Column(String, default="manual") # 'manual', 'binance', etc.
+    # Max adverse / favorable excursion while open, in quote currency; filled lazily from candles
+    mae = Column(Float, nullable=True)
+    mfe = Column(Float, nullable=True)
+    excursion_computed_at = Column(DateTime, nullable=True)
+    # Last failed measurement (no candles) and how many in a row; retries back off from there
+    excursion_attempted_at = Column(DateTime, nullable=True)
+    excursion_attempts = Column(Integer, nullable=True, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship
     user = relationship("User", back_populates="trades")
+
+    __table_args__ = (
+        # Serves the per-user closed-trade date-range scans behind the analytics endpoints
+        Index("ix_trades_user_status_entry", "user_id", "status", "entry_date"),
+        # Per-symbol grouping of one user's trades
+        Index("ix_trades_user_symbol", "user_id", "symbol"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+class TradeSketch(Base):
+    """Mergeable quantile sketch (DDSketch) of one per-trade metric over a user's closed trades."""
+    __tablename__ = "trade_sketches"
+
+    id         = Column(Integer, primary_key=True, index=True)
+    user_id    = Column(Integer, ForeignKey("users.id"), nullable=False)
+    metric     = Column(String, nullable=False)                 # "pnl" | "pnl_percent" | "holding_hours"
+    count      = Column(Integer, default=0)
+    payload    = Column(String, nullable=False)                 # JSON: bucket keys and counts
+    data_version = Column(String, nullable=True)                # trades' data_version the sketch matches
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "metric", name="uq_trade_sketches_user_metric"),
+    )
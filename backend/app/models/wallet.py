@@ -11,6 +11,7 @@ class Wallet(Base):
     asset = Column(String, index=True, nullable=False) # e.g., 'USDT', 'BTC'
     balance = Column(Float, default=0.0)
     locked_balance = Column(Float, default=0.0) # For future limit orders
+    entries_since_snapshot = Column(Integer, nullable=True, default=0) # NULL = balance predates the ledger
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.core.database import Base
+
+class WalletLedgerEntry(Base):
+    """Append-only record of a single change to a sim wallet."""
+    __tablename__ = "wallet_ledger"
+
+    id            = Column(Integer, primary_key=True, index=True)
+    user_id       = Column(Integer, ForeignKey("users.id"), nullable=False)
+    asset         = Column(String, nullable=False)              # e.g. "USDT", "BTC"
+    delta_balance = Column(Float, default=0.0)                  # change to Wallet.balance
+    delta_locked  = Column(Float, default=0.0)                  # change to Wallet.locked_balance
+    reason        = Column(String, nullable=False)              # "deposit" | "spot_buy" | "spot_sell" | "margin_lock" | "margin_release" | "reset" | "opening_balance"
+    ref_type      = Column(String, nullable=True)               # "trade" | "position"
+    ref_id        = Column(Integer, nullable=True)
+    created_at    = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_wallet_ledger_user_asset_created", "user_id", "asset", "created_at"),
+    )
+
+class WalletSnapshot(Base):
+    """Wallet balance as of a ledger entry; balances are rebuilt from here forward."""
+    __tablename__ = "wallet_snapshots"
+
+    id             = Column(Integer, primary_key=True, index=True)
+    user_id        = Column(Integer, ForeignKey("users.id"), nullable=False)
+    asset          = Column(String, nullable=False)
+    balance        = Column(Float, nullable=False)
+    locked_balance = Column(Float, nullable=False)
+    last_entry_id  = Column(Integer, nullable=False)            # last ledger entry folded into this snapshot
+    created_at     = Column(DateTime, nullable=False)           # created_at of that entry
+
+    __table_args__ = (
+        Index("ix_wallet_snapshots_user_asset_created", "user_id", "asset", "created_at"),
+    )
@@ -1,22 +1,67 @@
 # analytics service
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, update
 from app.models.trade import Trade, TradeStatus
-from typing import Dict, List
+from typing import Dict, Iterator, List
 from datetime import datetime, timedelta
 from collections import defaultdict
+import json
+import numpy as np
+from app.services.trade_replay_service import TradeReplayService
+from app.services.downsample import lttb
+from app.services.periods import duration_seconds_sql, local_time_sql, period_key, period_start_sql, previous_periods, weekday_hour_sql
+from app.services.risk_service import RiskService
+from app.services.trade_columns import WEEKDAYS, trade_columns
+
+# Lower edges, in seconds, of the holding-time histogram bins (1m ... 90d); the last bin is open-ended
+HOLDING_TIME_EDGES = (0, 60, 300, 900, 1800, 3600, 7200, 14400, 28800,
+                      86400, 172800, 345600, 604800, 1209600, 2592000, 7776000)
+# Holding styles by upper bound in seconds; each bound is one of HOLDING_TIME_EDGES
+HOLDING_STYLES = (("scalp", 900), ("intraday", 86400), ("swing", 2592000), ("position", None))
+# A trade whose excursion could not be measured (no candles) is retried after
+# EXCURSION_RETRY_BASE, doubling with each failure up to EXCURSION_RETRY_MAX
+EXCURSION_RETRY_BASE = timedelta(hours=1)
+EXCURSION_RETRY_MAX = timedelta(days=7)
+
+
+def excursion_due(trade: Trade, now: datetime) -> bool:
+    """Whether a trade's MAE/MFE should be measured now"""
+    if trade.excursion_computed_at is not None:
+        return False
+    if trade.excursion_attempted_at is None:
+        return True
+    backoff = min(EXCURSION_RETRY_BASE * 2 ** max((trade.excursion_attempts or 1) - 1, 0), EXCURSION_RETRY_MAX)
+    return now >= trade.excursion_attempted_at + backoff
+
+
+def entry_range(start_date: datetime = None, end_date: datetime = None) -> List:
+    """Filter criteria restricting Trade.entry_date to [start_date, end_date); either bound may be None"""
+    criteria = []
+    if start_date is not None:
+        criteria.append(Trade.entry_date >= start_date)
+    if end_date is not None:
+        criteria.append(Trade.entry_date < end_date)
+    return criteria
 
 class AnalyticsService:
     
     @staticmethod
-    def get_performance_metrics(db: Session, user_id: int) -> Dict:
+    def get_performance_metrics(db: Session, user_id: int, start_date: datetime = None,
+                                end_date: datetime = None) -> Dict:
         """Calculate key performance metrics"""
         
         closed_trades = db.query(Trade).filter(
             Trade.user_id == user_id,
-            Trade.status == TradeStatus.CLOSED
+            Trade.status == TradeStatus.CLOSED,
+            *entry_range(start_date, end_date)
         ).all()
         
+        return AnalyticsService.summarize_trades(closed_trades)
+    
+    @staticmethod
+    def summarize_trades(closed_trades: List[Trade]) -> Dict:
+        """Performance metrics for an in-memory list of closed trades (journal or backtest)"""
+        
         if not closed_trades:
             return {
                 "total_trades": 0,
@@ -56,55 +101,58 @@ class AnalyticsService:
         }
     
     @staticmethod
-    def get_daily_pnl(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> List[Dict]:
-        """Get daily P&L aggregation"""
-        
-        query = db.query(Trade).filter(
+    def get_daily_pnl(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None,
+                      resolution: str = "day") -> List[Dict]:
+        """P&L aggregated per day, week, month, quarter or year of entry, one row per period from the database"""
+        
+        bucket = period_start_sql(db, Trade.entry_date, resolution)
+        rows = db.query(
+            bucket.label("period_start"),
+            func.count(Trade.id),
+            func.sum(Trade.pnl),
+            func.sum(case((Trade.pnl > 0, 1), else_=0))
+        ).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
-        )
-        
-        if start_date:
-            query = query.filter(Trade.entry_date >= start_date)
-        if end_date:
-            query = query.filter(Trade.entry_date <= end_date)
-        
-        trades = query.order_by(Trade.entry_date).all()
-        
-        # Group by date
-        daily_data = defaultdict(lambda: {"pnl": 0, "trades": 0, "wins": 0, "losses": 0})
-        for trade in trades:
-            date_key = trade.entry_date.date().isoformat()
-            daily_data[date_key]["pnl"] += trade.pnl
-            daily_data[date_key]["trades"] += 1
-            if trade.pnl > 0:
-                daily_data[date_key]["wins"] += 1
-            else:
-                daily_data[date_key]["losses"] += 1
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
+        ).group_by(bucket).order_by(bucket).all()
         
-        # Convert to list
         result = []
-        for date_str, data in sorted(daily_data.items()):
+        for period_start, count, total, wins in rows:
             result.append({
-                "date": date_str,
-                "pnl": round(data["pnl"], 2),
-                "trades": data["trades"],
-                "wins": data["wins"],
-                "losses": data["losses"],
-                "win_rate": round((data["wins"] / data["trades"]) * 100, 2) if data["trades"] > 0 else 0
+                "date": period_key(period_start).isoformat(),
+                "pnl": round(total, 2),
+                "trades": count,
+                "wins": wins,
+                # Every non-winning trade counts as a loss, as in the calendar
+                "losses": count - wins,
+                "win_rate": round((wins / count) * 100, 2) if count > 0 else 0
             })
         
         return result
     
     @staticmethod
-    def get_cumulative_pnl(db: Session, user_id: int) -> List[Dict]:
-        """Get cumulative P&L time series"""
+    def get_cumulative_pnl(db: Session, user_id: int, max_points: int = None, start_date: datetime = None,
+                           end_date: datetime = None) -> List[Dict]:
+        """Get cumulative P&L time series, LTTB-downsampled to at most max_points points if given"""
+        
+        if max_points:
+            columns = trade_columns.columns(db, user_id).between(start_date, end_date)
+            cumulative = np.cumsum(columns.pnl)
+            seconds = columns.entry_time.astype(np.int64)
+            index = lttb(seconds, cumulative, max_points)
+            dates = columns.entry_time[index].astype(str).tolist()
+            return [
+                {"date": date, "pnl": round(pnl, 2), "cumulative_pnl": round(total, 2)}
+                for date, pnl, total in zip(dates, columns.pnl[index].tolist(), cumulative[index].tolist())
+            ]
         
         trades = db.query(Trade).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
         ).order_by(Trade.entry_date).all()
         
         cumulative = 0
@@ -121,13 +169,149 @@ class AnalyticsService:
         return result
     
     @staticmethod
-    def calculate_streaks(db: Session, user_id: int) -> Dict:
+    def stream_cumulative_pnl(db: Session, user_id: int, chunk_size: int = 10000, start_date: datetime = None,
+                              end_date: datetime = None) -> Iterator[str]:
+        """Full-resolution cumulative P&L as NDJSON, one trade per line, produced chunk by chunk"""
+        
+        columns = trade_columns.columns(db, user_id).between(start_date, end_date)
+        cumulative = np.cumsum(columns.pnl)
+        
+        def lines() -> Iterator[str]:
+            for start in range(0, len(columns), chunk_size):
+                stop = start + chunk_size
+                dates = columns.entry_time[start:stop].astype(str).tolist()
+                yield "".join(
+                    json.dumps({"trade_id": trade_id, "date": date, "pnl": round(pnl, 2), "cumulative_pnl": round(total, 2)}) + "\n"
+                    for trade_id, date, pnl, total in zip(columns.ids[start:stop].tolist(), dates,
+                                                          columns.pnl[start:stop].tolist(), cumulative[start:stop].tolist())
+                )
+        
+        return lines()
+    
+    @staticmethod
+    def get_what_if_pnl(db: Session, user_id: int, stop_loss_percent: float = None,
+                        take_profit_percent: float = None, interval: str = "1h", start_date: datetime = None,
+                        end_date: datetime = None) -> Dict:
+        """Cumulative P&L had every closed trade used the given stop / take-profit, next to the actual curve"""
+        
+        trades = db.query(Trade).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
+        ).order_by(Trade.entry_date).all()
+        
+        replayed = TradeReplayService.what_if_exits(trades, stop_loss_percent, take_profit_percent, interval)
+        
+        cumulative = 0
+        what_if = []
+        for trade, row in zip(trades, replayed):
+            cumulative += row["what_if_pnl"]
+            what_if.append({
+                "trade_id": trade.id,
+                "date": trade.entry_date.isoformat(),
+                "pnl": round(row["what_if_pnl"], 2),
+                "cumulative_pnl": round(cumulative, 2),
+                "exit_reason": row["exit_reason"],
+                "exit_price": row["what_if_exit_price"]
+            })
+        
+        reasons = defaultdict(int)
+        for row in replayed:
+            reasons[row["exit_reason"]] += 1
+        actual_total = sum(t.pnl for t in trades)
+        
+        return {
+            "actual": AnalyticsService.get_cumulative_pnl(db, user_id, start_date=start_date, end_date=end_date),
+            "what_if": what_if,
+            "summary": {
+                "trades": len(trades),
+                "replayed": len(trades) - reasons["no_data"],
+                "stopped_out": reasons["stop_loss"],
+                "took_profit": reasons["take_profit"],
+                "unchanged": reasons["original"],
+                "no_data": reasons["no_data"],
+                "actual_pnl": round(actual_total, 2),
+                "what_if_pnl": round(cumulative, 2),
+                "difference": round(cumulative - actual_total, 2)
+            }
+        }
+    
+    @staticmethod
+    def get_excursions(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
+        """MAE/MFE per closed trade for scatter plots, plus how much of the favorable move was kept"""
+        
+        trades = db.query(Trade).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            Trade.exit_date.isnot(None),
+            Trade.exit_price.isnot(None),
+            *entry_range(start_date, end_date)
+        ).order_by(Trade.entry_date).all()
+        
+        # Only trades never measured (or edited since) go to the candles, and ones
+        # that had no candles last time only once their retry backoff has passed
+        values = {t.id: (t.mae, t.mfe) for t in trades}
+        now = datetime.utcnow()
+        pending = [t for t in trades if excursion_due(t, now)]
+        if pending:
+            computed = TradeReplayService.excursions(pending)
+            rows = []
+            # Derived data: keep updated_at as is so it does not read as a user edit
+            for i, trade in enumerate(pending):
+                if i in computed:
+                    mae, mfe = values[trade.id] = computed[i]
+                    rows.append({"id": trade.id, "mae": mae, "mfe": mfe, "excursion_computed_at": now,
+                                 "excursion_attempted_at": None, "excursion_attempts": 0, "updated_at": trade.updated_at})
+                else:
+                    # Stock, unlisted symbol, empty window or failed fetch
+                    rows.append({"id": trade.id, "excursion_attempted_at": now,
+                                 "excursion_attempts": (trade.excursion_attempts or 0) + 1, "updated_at": trade.updated_at})
+            db.execute(update(Trade), rows)
+            db.commit()
+        
+        points = []
+        efficiencies = []
+        for trade in trades:
+            mae, mfe = values[trade.id]
+            if mae is None:
+                continue
+            efficiency = round(trade.pnl / mfe, 4) if mfe > 0 else None
+            if efficiency is not None:
+                efficiencies.append(efficiency)
+            points.append({
+                "trade_id": trade.id,
+                "symbol": trade.symbol,
+                "direction": trade.direction.value,
+                "entry_date": trade.entry_date.isoformat(),
+                "pnl": round(trade.pnl, 2),
+                "mae": round(mae, 2),
+                "mfe": round(mfe, 2),
+                "efficiency": efficiency
+            })
+        
+        return {
+            "trades": points,
+            "summary": {
+                "trades_measured": len(points),
+                "trades_without_data": len(trades) - len(points),
+                "average_mae": round(sum(p["mae"] for p in points) / len(points), 2) if points else 0,
+                "average_mfe": round(sum(p["mfe"] for p in points) / len(points), 2) if points else 0,
+                # Share of the best open profit that was actually realized, averaged over trades
+                "average_efficiency": round(sum(efficiencies) / len(efficiencies), 4) if efficiencies else 0
+            }
+        }
+    
+    @staticmethod
+    def calculate_streaks(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
         """Calculate current winning/losing streaks"""
         
         trades = db.query(Trade).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
         ).order_by(Trade.entry_date.desc()).all()
         
         if not trades:
@@ -176,58 +360,41 @@ class AnalyticsService:
         }
     
     @staticmethod
-    def calculate_drawdown(db: Session, user_id: int) -> Dict:
+    def calculate_drawdown(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
         """Calculate max and average drawdown"""
         
         trades = db.query(Trade).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
-        ).order_by(Trade.entry_date).all()
-        
-        if not trades:
-            return {
-                "max_drawdown": 0,
-                "max_drawdown_percent": 0,
-                "average_drawdown": 0,
-                "current_drawdown": 0
-            }
-        
-        # Calculate cumulative P&L and track drawdowns
-        cumulative = 0
-        peak = 0
-        max_drawdown = 0
-        drawdowns = []
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
+        ).order_by(Trade.entry_date, Trade.id).all()
         
-        for trade in trades:
-            cumulative += trade.pnl
-            if cumulative > peak:
-                peak = cumulative
-            
-            drawdown = peak - cumulative
-            if drawdown > 0:
-                drawdowns.append(drawdown)
-                max_drawdown = max(max_drawdown, drawdown)
+        return AnalyticsService.drawdown_from_trades(trades)
+    
+    @staticmethod
+    def drawdown_from_trades(trades: List[Trade]) -> Dict:
+        """Drawdown metrics for closed trades already ordered by entry_date"""
         
-        current_drawdown = peak - cumulative
-        avg_drawdown = sum(drawdowns) / len(drawdowns) if drawdowns else 0
-        max_drawdown_percent = (max_drawdown / peak * 100) if peak > 0 else 0
+        return RiskService.drawdown(np.array([t.pnl for t in trades], dtype=np.float64))
+    
+    @staticmethod
+    def get_risk_metrics(db: Session, user_id: int, initial_capital: float = None, start_date: datetime = None,
+                         end_date: datetime = None) -> Dict:
+        """Equity-curve, return and per-trade risk metrics plus a composite score"""
         
-        return {
-            "max_drawdown": round(max_drawdown, 2),
-            "max_drawdown_percent": round(max_drawdown_percent, 2),
-            "average_drawdown": round(avg_drawdown, 2),
-            "current_drawdown": round(current_drawdown, 2)
-        }
+        columns = trade_columns.columns(db, user_id).between(start_date, end_date)
+        return RiskService.analyze(columns.entry_time, columns.pnl, initial_capital)
     
     @staticmethod
-    def get_day_statistics(db: Session, user_id: int) -> Dict:
+    def get_day_statistics(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
         """Get day-level statistics"""
         
         trades = db.query(Trade).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
         ).all()
         
         if not trades:
@@ -315,13 +482,284 @@ class AnalyticsService:
             "trading_days": len(daily_data),
             "days": days
         }
+    
+    @staticmethod
+    def get_calendar_range(db: Session, user_id: int, start_date: datetime, end_date: datetime) -> Dict:
+        """Per-day aggregates for [start_date, end_date) as parallel arrays; days without trades are omitted"""
+        
+        day = period_start_sql(db, Trade.entry_date, "day")
+        rows = db.query(
+            day.label("day"),
+            func.count(Trade.id),
+            func.sum(Trade.pnl),
+            func.sum(case((Trade.pnl > 0, 1), else_=0))
+        ).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            Trade.entry_date >= start_date,
+            Trade.entry_date < end_date
+        ).group_by(day).order_by(day).all()
+        
+        dates, pnl, trades, wins, losses = [], [], [], [], []
+        for row_day, count, total, won in rows:
+            dates.append(period_key(row_day).isoformat())
+            pnl.append(round(total, 2))
+            trades.append(count)
+            wins.append(won)
+            # Same convention as get_calendar_data: every non-winning trade is a loss
+            losses.append(count - won)
+        
+        return {
+            "start_date": start_date.date().isoformat(),
+            "end_date": (end_date - timedelta(days=1)).date().isoformat(),
+            "total_pnl": round(sum(pnl), 2),
+            "total_trades": sum(trades),
+            "trading_days": len(dates),
+            "dates": dates,
+            "pnl": pnl,
+            "trades": trades,
+            "wins": wins,
+            "losses": losses
+        }
+    
+    @staticmethod
+    def get_time_performance(db: Session, user_id: int, tz_name: str = "UTC", start_date: datetime = None,
+                             end_date: datetime = None) -> Dict:
+        """P&L, count and win rate by entry hour, weekday and weekday x hour, in the user's timezone"""
+        
+        closed = (
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
+        )
+        first, last = db.query(func.min(Trade.entry_date), func.max(Trade.entry_date)).filter(*closed).one()
+        
+        cells = {}
+        if first is not None:
+            local = local_time_sql(db, Trade.entry_date, tz_name, first, last)
+            weekday, hour = weekday_hour_sql(db, local)
+            rows = db.query(
+                weekday.label("weekday"),
+                hour.label("hour"),
+                func.count(Trade.id),
+                func.sum(Trade.pnl),
+                func.sum(case((Trade.pnl > 0, 1), else_=0))
+            ).filter(*closed).group_by(weekday, hour).all()
+            cells = {(int(r[0]), int(r[1])): (r[2], r[3], r[4]) for r in rows}
+        
+        def bucket(keys) -> Dict:
+            count = sum(cells[k][0] for k in keys if k in cells)
+            pnl = sum(cells[k][1] for k in keys if k in cells)
+            wins = sum(cells[k][2] for k in keys if k in cells)
+            return {
+                "trades": count,
+                "pnl": round(pnl, 2),
+                "wins": wins,
+                "win_rate": round((wins / count) * 100, 2) if count > 0 else 0,
+                "avg_pnl": round(pnl / count, 2) if count > 0 else 0
+            }
+        
+        matrix = [[bucket([(d, h)]) for h in range(24)] for d in range(7)]
+        return {
+            "timezone": tz_name,
+            "by_hour": [{"hour": h, **bucket([(d, h) for d in range(7)])} for h in range(24)],
+            "by_weekday": [{"weekday": WEEKDAYS[d], **bucket([(d, h) for h in range(24)])} for d in range(7)],
+            "heatmap": {
+                "weekdays": list(WEEKDAYS),
+                "hours": list(range(24)),
+                "pnl": [[cell["pnl"] for cell in row] for row in matrix],
+                "trades": [[cell["trades"] for cell in row] for row in matrix],
+                "win_rate": [[cell["win_rate"] for cell in row] for row in matrix]
+            }
+        }
+    
+    @staticmethod
+    def get_holding_time(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
+        """P&L and win rate by holding-time style and by a histogram of holding durations"""
+        
+        duration = duration_seconds_sql(db, Trade.entry_date, Trade.exit_date)
+        # Index of the histogram bin: the number of upper edges the duration has reached
+        edges = HOLDING_TIME_EDGES[1:]
+        bin_index = case(*((duration < edge, i) for i, edge in enumerate(edges)), else_=len(edges))
+        rows = db.query(
+            bin_index.label("bin"),
+            func.count(Trade.id),
+            func.sum(Trade.pnl),
+            func.sum(case((Trade.pnl > 0, 1), else_=0)),
+            func.sum(duration)
+        ).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            Trade.exit_date.isnot(None),
+            Trade.exit_date >= Trade.entry_date,
+            *entry_range(start_date, end_date)
+        ).group_by(bin_index).all()
+        bins = {int(r[0]): (r[1], r[2], r[3], r[4]) for r in rows}
+        
+        def bucket(indices) -> Dict:
+            count = sum(bins[i][0] for i in indices if i in bins)
+            pnl = sum(bins[i][1] for i in indices if i in bins)
+            wins = sum(bins[i][2] for i in indices if i in bins)
+            seconds = sum(bins[i][3] for i in indices if i in bins)
+            return {
+                "trades": count,
+                "pnl": round(pnl, 2),
+                "wins": wins,
+                "win_rate": round((wins / count) * 100, 2) if count > 0 else 0,
+                "avg_pnl": round(pnl / count, 2) if count > 0 else 0,
+                "avg_hours": round(seconds / count / 3600, 2) if count > 0 else 0
+            }
+        
+        styles = []
+        lower = 0
+        for name, upper in HOLDING_STYLES:
+            indices = [i for i, start in enumerate(HOLDING_TIME_EDGES)
+                       if start >= lower and (upper is None or start < upper)]
+            styles.append({"style": name, "min_seconds": lower, "max_seconds": upper, **bucket(indices)})
+            lower = upper
+        
+        histogram = [bucket([i]) for i in range(len(HOLDING_TIME_EDGES))]
+        return {
+            "trades": sum(b["trades"] for b in histogram),
+            "by_style": styles,
+            "histogram": {
+                "bin_edges_seconds": list(HOLDING_TIME_EDGES),
+                "trades": [b["trades"] for b in histogram],
+                "pnl": [b["pnl"] for b in histogram],
+                "win_rate": [b["win_rate"] for b in histogram]
+            }
+        }
+    
+    @staticmethod
+    def compare_periods(db: Session, user_id: int, period_type: str, n: int, at: datetime = None) -> Dict:
+        """Aggregates for the n periods ending with the one containing `at`, each with deltas vs the period before"""
+        
+        # One extra, older period so the oldest returned period has something to compare with
+        bounds = previous_periods(period_type, at or datetime.utcnow(), n + 1)
+        bucket = period_start_sql(db, Trade.entry_date, period_type)
+        
+        rows = db.query(
+            bucket.label("period_start"),
+            func.count(Trade.id),
+            func.sum(Trade.pnl),
+            func.sum(case((Trade.pnl > 0, 1), else_=0)),
+            func.sum(case((Trade.pnl < 0, 1), else_=0)),
+            func.sum(case((Trade.pnl > 0, Trade.pnl), else_=0))
+        ).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            Trade.entry_date >= bounds[0][0],
+            Trade.entry_date < bounds[-1][1]
+        ).group_by(bucket).all()
+        
+        totals = {period_key(r[0]): r[1:] for r in rows}
+        
+        periods = []
+        previous = None
+        for start, end in bounds:
+            count, pnl, wins, losses, gross_profit = totals.get(start.date(), (0, 0, 0, 0, 0))
+            pnl, gross_profit = pnl or 0, gross_profit or 0
+            gross_loss = gross_profit - pnl
+            current = {
+                "period_start": start.date().isoformat(),
+                "period_end": (end - timedelta(days=1)).date().isoformat(),
+                "trades": count,
+                "pnl": round(pnl, 2),
+                "wins": wins or 0,
+                "losses": losses or 0,
+                "win_rate": round((wins / count) * 100, 2) if count > 0 else 0,
+                "avg_pnl": round(pnl / count, 2) if count > 0 else 0,
+                "profit_factor": round(gross_profit / gross_loss, 2) if gross_loss > 0 else 0
+            }
+            if previous is not None:
+                current["change"] = {
+                    "trades": current["trades"] - previous["trades"],
+                    "pnl": round(current["pnl"] - previous["pnl"], 2),
+                    "pnl_percent": round((current["pnl"] - previous["pnl"]) / abs(previous["pnl"]) * 100, 2)
+                    if previous["pnl"] else None,
+                    "win_rate": round(current["win_rate"] - previous["win_rate"], 2),
+                    "avg_pnl": round(current["avg_pnl"] - previous["avg_pnl"], 2)
+                }
+                periods.append(current)
+            previous = current
+        
+        return {
+            "period": period_type,
+            "periods": periods
+        }
+    
+    @staticmethod
+    def get_symbol_performance(db: Session, user_id: int, sort_by: str = "pnl", descending: bool = True,
+                               limit: int = 20, offset: int = 0, start_date: datetime = None,
+                               end_date: datetime = None) -> Dict:
+        """One page of per-symbol aggregates, grouped, sorted and paged in SQL"""
+        
+        trades = func.count(Trade.id)
+        pnl = func.sum(Trade.pnl)
+        wins = func.sum(case((Trade.pnl > 0, 1), else_=0))
+        sort_columns = {
+            "pnl": pnl,
+            "trades": trades,
+            "win_rate": wins * 1.0 / trades,
+            "avg_pnl": pnl / trades
+        }
+        if sort_by not in sort_columns:
+            raise ValueError(f"sort_by must be one of {', '.join(sort_columns)}")
+        sort_column = sort_columns[sort_by]
+        
+        closed = (
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
+        )
+        total_symbols = db.query(func.count(func.distinct(Trade.symbol))).filter(*closed).scalar()
+        rows = db.query(
+            Trade.symbol,
+            trades,
+            pnl,
+            wins,
+            func.sum(case((Trade.pnl < 0, 1), else_=0)),
+            func.sum(case((Trade.pnl > 0, Trade.pnl), else_=0))
+        ).filter(*closed).group_by(Trade.symbol).order_by(
+            sort_column.desc() if descending else sort_column.asc(), Trade.symbol
+        ).offset(offset).limit(limit).all()
+        
+        symbols = []
+        for symbol, count, total, won, lost, gross_profit in rows:
+            gross_loss = gross_profit - total
+            symbols.append({
+                "symbol": symbol,
+                "trades": count,
+                "pnl": round(total, 2),
+                "wins": won,
+                "losses": lost,
+                "win_rate": round((won / count) * 100, 2) if count > 0 else 0,
+                "avg_pnl": round(total / count, 2) if count > 0 else 0,
+                "profit_factor": round(gross_profit / gross_loss, 2) if gross_loss > 0 else 0
+            })
+        
+        return {
+            "total_symbols": total_symbols,
+            "sort_by": sort_by,
+            "order": "desc" if descending else "asc",
+            "offset": offset,
+            "limit": limit,
+            "symbols": symbols
+        }
+    
     @staticmethod
-    def get_trade_distribution(db: Session, user_id: int) -> Dict:
+    def get_trade_distribution(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
         """Get trade distribution (Long vs Short)"""
         trades = db.query(Trade).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
         ).all()
         
         dist = {
@@ -353,12 +791,13 @@ class AnalyticsService:
         }
 
     @staticmethod
-    def get_asset_performance(db: Session, user_id: int) -> Dict:
+    def get_asset_performance(db: Session, user_id: int, start_date: datetime = None, end_date: datetime = None) -> Dict:
         """Get performance by asset type"""
         trades = db.query(Trade).filter(
             Trade.user_id == user_id,
             Trade.status == TradeStatus.CLOSED,
-            Trade.pnl.isnot(None)
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
         ).all()
         
         assets = defaultdict(lambda: {"count": 0, "pnl": 0, "wins": 0})
@@ -0,0 +1,300 @@
+# backtest job service
+"""
+Backtest jobs
+Runs and sweeps submitted through the API execute in a separate pool of worker
+processes. The job row is the only channel between the two sides: the worker
+writes status and progress, the API writes cancel_requested. Results are saved
+as one .npy file per column under BACKTEST_RESULTS_DIR/<job id>/<table>/ and
+read back memory-mapped, so paging through a long equity curve or trade list
+only touches the requested slice.
+"""
+import json
+import math
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.backtest_job import BacktestJob
+from app.services.analytics_service import AnalyticsService
+from app.services.backtesting_service import BacktestingService
+from app.services.candle_store import candle_store, epoch_ms
+from app.services.process_pool import LazyProcessPool
+from app.services.sweep_service import SweepRunner
+
+ACTIVE_STATUSES = ("QUEUED", "RUNNING")
+PROGRESS_WRITE_SECONDS = 0.5
+
+RESULT_TABLES = {
+    "run": ("trades", "equity"),
+    "sweep": ("configs",),
+}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def results_dir(job_id: int) -> Path:
+    return Path(settings.BACKTEST_RESULTS_DIR) / str(job_id)
+
+
+def save_table(job_id: int, table: str, columns: Dict[str, np.ndarray]) -> None:
+    path = results_dir(job_id) / table
+    path.mkdir(parents=True, exist_ok=True)
+    for name, values in columns.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(values))
+
+
+def read_table(job_id: int, table: str, offset: int, limit: int) -> Tuple[List[Dict], int]:
+    """One page of a stored result table as row dicts, plus the table's total row count"""
+    path = results_dir(job_id) / table
+    columns = {f.stem: np.load(f, mmap_mode="r") for f in sorted(path.glob("*.npy"))} if path.is_dir() else {}
+    if not columns:
+        return [], 0
+    total = len(next(iter(columns.values())))
+    page = {name: column[offset:offset + limit].tolist() for name, column in columns.items()}
+    rows = [{name: None if isinstance(v, float) and math.isnan(v) else v for name, v in zip(page, values)}
+            for values in zip(*page.values())]
+    return rows, total
+
+
+class JobProgress:
+    """Throttled progress writes from the worker; each write also picks up a cancel request"""
+
+    def __init__(self, db: Session, job: BacktestJob):
+        self.db = db
+        self.job = job
+        self._last_write = 0.0
+
+    def update(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_WRITE_SECONDS:
+            return
+        self._last_write = now
+        self.job.progress = round(min(max(fraction, 0.0), 1.0), 4)
+        if message is not None:
+            self.job.message = message
+        self.db.commit()
+        self.db.refresh(self.job)
+        if self.job.cancel_requested:
+            raise JobCancelled()
+
+
+def _load_candles(params: Dict) -> Dict[str, np.ndarray]:
+    start = epoch_ms(datetime.fromisoformat(params["start_date"]))
+    end = epoch_ms(datetime.fromisoformat(params["end_date"]))
+    candles = candle_store.get_candles(params["symbol"], params["interval"], start, end)
+    if len(candles["close"]) == 0:
+        raise ValueError(f"No candles for {params['symbol']} {params['interval']} in that range")
+    return candles
+
+
+def _run_kwargs(params: Dict) -> Dict[str, float]:
+    return {"quantity": params["quantity"], "initial_capital": params["initial_capital"],
+            "fee_rate": params["fee_rate"], "slippage": params["slippage"]}
+
+
+def _execute_run(job: BacktestJob, params: Dict, progress: JobProgress) -> Dict:
+    progress.update(0.0, "Loading candles", force=True)
+    candles = _load_candles(params)
+    progress.update(0.4, f"Running {params['strategy']} over {len(candles['close'])} bars", force=True)
+    signal = BacktestingService.signals(candles, params["strategy"], params["params"])
+    result = BacktestingService.run(candles, signal, **_run_kwargs(params))
+    progress.update(0.8, "Saving results", force=True)
+
+    trades = BacktestingService.to_trades(result, candles, params["symbol"].upper(), params["quantity"], job.user_id)
+    times = candles["open_time"]
+    save_table(job.id, "trades", {
+        "entry_time": times[result["entry_index"]],
+        "exit_time": times[result["exit_index"]],
+        "direction": result["direction"],
+        "entry_price": result["entry_price"],
+        "exit_price": result["exit_price"],
+        "commission": result["commission"],
+        "pnl": result["pnl"],
+    })
+    save_table(job.id, "equity", {"time": times, "equity": result["equity"]})
+    return {
+        "bars": len(times),
+        "final_equity": round(float(result["equity"][-1]), 2),
+        "total_trades": len(trades),
+        "summary": AnalyticsService.summarize_trades(trades),
+        "drawdown": AnalyticsService.drawdown_from_trades(trades),
+    }
+
+
+def _execute_sweep(job: BacktestJob, params: Dict, progress: JobProgress) -> Dict:
+    progress.update(0.0, "Loading candles", force=True)
+    candles = _load_candles(params)
+    # Already in a job worker: evaluate here rather than start a pool inside the pool
+    runner = SweepRunner(candles, params["strategy"], params["grid"], _run_kwargs(params), in_process=True)
+    total = len(runner.configs)
+    results: List[Optional[Dict]] = [None] * total
+
+    stream = runner.results()
+    try:
+        for result in stream:
+            results[result["index"]] = result
+            progress.update(runner.completed / total, f"{runner.completed}/{total} configurations")
+    finally:
+        # Stops the sweep early on cancel
+        stream.close()
+
+    scored = [r for r in results if "error" not in r]
+    if not scored:
+        raise ValueError(f"Every configuration failed: {results[0]['error']}")
+
+    progress.update(1.0, "Saving results", force=True)
+    columns = {f"param_{name}": np.array([r["params"][name] for r in results]) for name in params["grid"]}
+    for name in scored[0]:
+        if name in ("index", "params"):
+            continue
+        values = [r.get(name) for r in results]
+        # Failed configurations have no metrics; they read back as null
+        columns[name] = np.array(values) if len(scored) == total else np.array(
+            [np.nan if v is None else v for v in values], dtype=np.float64)
+    columns["index"] = np.arange(total)
+    save_table(job.id, "configs", columns)
+
+    best = max(scored, key=lambda r: r["total_pnl"])
+    return {
+        "bars": len(candles["close"]),
+        "configurations": total,
+        "failed": total - len(scored),
+        "errors": sorted({r["error"] for r in results if "error" in r})[:10],
+        "best": best,
+    }
+
+
+EXECUTORS = {
+    "run": _execute_run,
+    "sweep": _execute_sweep,
+}
+
+
+def run_job(job_id: int) -> None:
+    """Worker-process entry point: claim a queued job, execute it and record the outcome"""
+    db = SessionLocal()
+    try:
+        claimed = db.execute(
+            update(BacktestJob)
+            .where(BacktestJob.id == job_id, BacktestJob.status == "QUEUED")
+            .values(status="RUNNING", started_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
+
+        job = db.get(BacktestJob, job_id)
+        try:
+            summary = EXECUTORS[job.kind](job, json.loads(job.params), JobProgress(db, job))
+        except JobCancelled:
+            db.rollback()
+            job.status = "CANCELLED"
+            job.message = "Cancelled"
+            shutil.rmtree(results_dir(job_id), ignore_errors=True)
+        except Exception as e:
+            db.rollback()
+            job.status = "FAILED"
+            job.error = str(e) or type(e).__name__
+            shutil.rmtree(results_dir(job_id), ignore_errors=True)
+        else:
+            job.status = "COMPLETED"
+            job.progress = 1.0
+            job.message = None
+            job.summary = json.dumps(summary)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobRunner:
+    """Runs backtest jobs in worker processes"""
+
+    def __init__(self, max_workers: int):
+        self.pool = LazyProcessPool(max_workers)
+
+    def submit(self, job_id: int) -> None:
+        future = self.pool.submit(run_job, job_id)
+        future.add_done_callback(lambda f: f.exception() and print(f"Backtest job {job_id} crashed: {f.exception()}"))
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
+
+
+job_runner = JobRunner(settings.BACKTEST_WORKERS)
+
+
+class BacktestJobService:
+
+    @staticmethod
+    def submit(db: Session, user_id: int, kind: str, params: Dict) -> BacktestJob:
+        job = BacktestJob(user_id=user_id, kind=kind, params=json.dumps(params), status="QUEUED",
+                          progress=0.0, message="Queued")
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        job_runner.submit(job.id)
+        return job
+
+    @staticmethod
+    def get_job(db: Session, job_id: int, user_id: int) -> Optional[BacktestJob]:
+        return db.query(BacktestJob).filter(BacktestJob.id == job_id, BacktestJob.user_id == user_id).first()
+
+    @staticmethod
+    def list_jobs(db: Session, user_id: int, limit: int = 50) -> List[BacktestJob]:
+        return db.query(BacktestJob).filter(BacktestJob.user_id == user_id).order_by(
+            BacktestJob.created_at.desc(), BacktestJob.id.desc()).limit(limit).all()
+
+    @staticmethod
+    def cancel_job(db: Session, job: BacktestJob) -> BacktestJob:
+        """Queued jobs are cancelled at once; running ones stop at their next progress write"""
+        cancelled_queued = db.execute(
+            update(BacktestJob)
+            .where(BacktestJob.id == job.id, BacktestJob.status == "QUEUED")
+            .values(status="CANCELLED", message="Cancelled", finished_at=datetime.utcnow())
+        ).rowcount
+        if not cancelled_queued:
+            db.execute(update(BacktestJob).where(BacktestJob.id == job.id, BacktestJob.status == "RUNNING")
+                       .values(cancel_requested=True))
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def fail_interrupted(db: Session) -> int:
+        """Jobs left queued or running by a previous server process can never finish"""
+        count = db.execute(
+            update(BacktestJob)
+            .where(BacktestJob.status.in_(ACTIVE_STATUSES))
+            .values(status="FAILED", error="Interrupted by server restart", finished_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        return count
+
+    @staticmethod
+    def to_dict(job: BacktestJob) -> Dict:
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "progress": job.progress,
+            "message": job.message,
+            "cancel_requested": bool(job.cancel_requested),
+            "params": json.loads(job.params),
+            "summary": json.loads(job.summary) if job.summary else None,
+            "error": job.error,
+            "result_tables": list(RESULT_TABLES[job.kind]) if job.status == "COMPLETED" else [],
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
@@ -0,0 +1,227 @@
+"""
+Local OHLCV candle store
+One append-only file of fixed-width records per (symbol, interval), read through
+numpy.memmap. A small sidecar records the disjoint time spans already fetched,
+so only the parts of a request outside them ever go to Binance; repeat reads
+are local, and a request far from the stored history does not pull in the gap.
+API and job worker processes share the files: each (symbol, interval) is
+guarded by an flock on a lock file, and every write goes to a temp file that
+is moved into place, so a reader never maps a half-written record.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import requests as req_lib
+
+from app.core.config import settings
+
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+KLINES_PAGE_SIZE = 1000
+# Exchange symbols as stored on disk; anything else never reaches a path
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9]{2,20}$")
+# Lock files are striped by (symbol, interval) so unknown symbols never leave files behind
+LOCK_STRIPES = 64
+
+CANDLE_DTYPE = np.dtype([
+    ("open_time", "<i8"),   # ms since epoch
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000,
+}
+
+KlineFetcher = Callable[[str, str, int, int], np.ndarray]
+Coverage = List[List[int]]   # sorted, disjoint [start, end] open_time spans
+
+
+def missing_spans(coverage: Coverage, start: int, end: int, step: int) -> Coverage:
+    """Parts of [start, end] not covered by any span, on the candle grid"""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            missing.append([cursor, covered_start - step])
+        cursor = covered_end + step
+    if cursor <= end:
+        missing.append([cursor, end])
+    return missing
+
+
+def merge_spans(spans: Coverage, step: int) -> Coverage:
+    """Sorted union of spans, joining any that overlap or touch on the candle grid"""
+    merged: Coverage = []
+    for span_start, span_end in sorted(spans):
+        if merged and span_start <= merged[-1][1] + step:
+            merged[-1][1] = max(merged[-1][1], span_end)
+        else:
+            merged.append([span_start, span_end])
+    return merged
+
+
+def epoch_ms(dt: datetime) -> int:
+    """Milliseconds since epoch; naive datetimes are taken as UTC, like the rest of the journal"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def fetch_binance_klines(symbol: str, interval: str, start_ms: int, end_ms: int) -> np.ndarray:
+    """Closed candles with open_time in [start_ms, end_ms], paged from the Binance REST API"""
+    rows = []
+    cursor = start_ms
+    while cursor <= end_ms:
+        resp = req_lib.get(BINANCE_KLINES_URL, params={"symbol": symbol, "interval": interval, "startTime": cursor,
+                                                       "endTime": end_ms, "limit": KLINES_PAGE_SIZE}, timeout=10)
+        resp.raise_for_status()
+        page = resp.json()
+        if not page:
+            break
+        rows.extend((k[0], float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])) for k in page)
+        if len(page) < KLINES_PAGE_SIZE:
+            break
+        cursor = page[-1][0] + INTERVAL_MS[interval]
+    return np.array(rows, dtype=CANDLE_DTYPE)
+
+
+class CandleStore:
+
+    def __init__(self, root: Optional[str] = None, fetcher: KlineFetcher = fetch_binance_klines):
+        self.root = Path(root or settings.CANDLE_STORE_DIR)
+        self.fetcher = fetcher
+        self._locks: Dict[tuple, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    @contextmanager
+    def _lock(self, symbol: str, interval: str) -> Iterator[None]:
+        """Exclusive hold on one (symbol, interval) across threads and processes"""
+        with self._locks_guard:
+            thread_lock = self._locks[(symbol, interval)]
+        stripe = zlib.crc32(f"{symbol}/{interval}".encode()) % LOCK_STRIPES
+        lock_path = self.root / ".locks" / f"{stripe:02d}.lock"
+        with thread_lock:
+            lock_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _paths(self, symbol: str, interval: str) -> tuple:
+        base = self.root / symbol / interval
+        return base.with_suffix(".bin"), base.with_suffix(".json")
+
+    @staticmethod
+    def _load(path: Path) -> np.ndarray:
+        if not path.exists() or path.stat().st_size == 0:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return np.memmap(path, dtype=CANDLE_DTYPE, mode="r")
+
+    @staticmethod
+    def _load_coverage(meta_path: Path) -> Coverage:
+        if not meta_path.exists():
+            return []
+        meta = json.loads(meta_path.read_text())
+        if "ranges" not in meta:
+            # Sidecars written before coverage could have holes hold a single span
+            return [[meta["start"], meta["end"]]]
+        return meta["ranges"]
+
+    @staticmethod
+    def _save_coverage(meta_path: Path, coverage: Coverage) -> None:
+        tmp = meta_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"ranges": coverage}))
+        os.replace(tmp, meta_path)
+
+    def _ensure(self, symbol: str, interval: str, start: int, end: int) -> None:
+        """Fetch the parts of [start, end] outside the covered spans and persist them"""
+        data_path, meta_path = self._paths(symbol, interval)
+        step = INTERVAL_MS[interval]
+        # The candle that is still forming is never stored
+        end = min((end // step) * step, (int(time.time() * 1000) // step - 1) * step)
+        if end < start:
+            return
+
+        coverage = self._load_coverage(meta_path)
+        missing = missing_spans(coverage, start, end, step)
+        if not missing:
+            return
+
+        fresh = np.concatenate([self.fetcher(symbol, interval, span_start, span_end) for span_start, span_end in missing])
+        # Only a successful fetch gets a directory
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        # Rewrite in open_time order; a candle stored before a crash that lost the
+        # sidecar update is fetched again, so keep one row per open_time
+        merged = np.concatenate([np.array(self._load(data_path)), fresh])
+        _, first = np.unique(merged["open_time"], return_index=True)
+        tmp = data_path.with_suffix(".bin.tmp")
+        merged[first].tofile(tmp)
+        os.replace(tmp, data_path)
+        self._save_coverage(meta_path, merge_spans(coverage + missing, step))
+
+    def get_candles(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+                    fill_gaps: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Candles with open_time in [start_ms, end_ms] as contiguous column arrays
+        (open_time, open, high, low, close, volume). With fill_gaps, bars missing
+        upstream are forward-filled from the previous close with zero volume.
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Unsupported interval {interval}")
+        symbol = symbol.upper()
+        if not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol {symbol!r}")
+        step = INTERVAL_MS[interval]
+        start = (start_ms // step) * step
+
+        with self._lock(symbol, interval):
+            self._ensure(symbol, interval, start, end_ms)
+            data = self._load(self._paths(symbol, interval)[0])
+
+        times = data["open_time"]
+        lo, hi = np.searchsorted(times, start, "left"), np.searchsorted(times, end_ms, "right")
+        window = data[lo:hi]
+        columns = {name: np.ascontiguousarray(window[name]) for name in CANDLE_DTYPE.names}
+        if fill_gaps and len(window) > 1:
+            columns = self._fill_gaps(columns, step)
+        return columns
+
+    @staticmethod
+    def _fill_gaps(columns: Dict[str, np.ndarray], step: int) -> Dict[str, np.ndarray]:
+        times = columns["open_time"]
+        grid = np.arange(times[0], times[-1] + step, step, dtype=np.int64)
+        if len(grid) == len(times):
+            return columns
+        # For each grid slot, the index of the last real candle at or before it
+        src = np.searchsorted(times, grid, "right") - 1
+        present = times[src] == grid
+        prev_close = columns["close"][src]
+        filled = {"open_time": grid, "volume": np.where(present, columns["volume"][src], 0.0)}
+        for name in ("open", "high", "low", "close"):
+            filled[name] = np.where(present, columns[name][src], prev_close)
+        return filled
+
+
+candle_store = CandleStore()
@@ -0,0 +1,144 @@
+# correlation service
+"""
+Correlation of daily P&L between a user's most active symbols.
+One grouped query returns P&L per (entry day, symbol) for the top-K symbols;
+those rows are scattered into a dense day x symbol matrix (a symbol that did not
+trade on a day contributes 0 that day) and correlated column against column.
+Spearman is Pearson on per-column average ranks. Results are cached per user
+and parameters, tagged with the trades' data version, so dashboards reloading
+the same matrix do not rebuild it until a trade changes.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.trade import Trade, TradeStatus
+from app.services.analytics_service import entry_range
+from app.services.periods import period_key, period_start_sql
+from app.services.trade_columns import data_version
+
+CORRELATION_METHODS = ("pearson", "spearman")
+MAX_SYMBOLS = 100
+MAX_CACHED_RESULTS = 256
+
+
+def _average_ranks(values: np.ndarray) -> np.ndarray:
+    """1-based ranks of one column, ties sharing the mean of the ranks they span"""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    return ((ends - counts + 1 + ends) / 2)[inverse]
+
+
+def correlation_matrix(matrix: np.ndarray, method: str = "pearson") -> np.ndarray:
+    """K x K correlation of the columns of a days x K matrix; NaN where a column is constant"""
+    if method == "spearman":
+        matrix = np.column_stack([_average_ranks(column) for column in matrix.T]) if matrix.size else matrix
+    centered = matrix - matrix.mean(axis=0)
+    norms = np.sqrt((centered ** 2).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = (centered.T @ centered) / np.outer(norms, norms)
+    result[:, norms == 0] = np.nan
+    result[norms == 0, :] = np.nan
+    # Rounding can push |r| a hair past 1
+    return np.clip(result, -1.0, 1.0)
+
+
+class CorrelationCache:
+    """Small LRU of correlation results, each tagged with the data version it was built from"""
+
+    def __init__(self, max_results: int = MAX_CACHED_RESULTS):
+        self.max_results = max_results
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, version: Tuple) -> Optional[Dict]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def put(self, key: Tuple, version: Tuple, result: Dict) -> None:
+        with self._lock:
+            self._entries[key] = (version, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_results:
+                self._entries.popitem(last=False)
+
+
+correlation_cache = CorrelationCache()
+
+
+class CorrelationService:
+
+    @staticmethod
+    def daily_matrix(db: Session, user_id: int, top: int, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None) -> Dict:
+        """Days x symbols P&L matrix for the `top` symbols with the most closed trades"""
+        closed = (
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            *entry_range(start_date, end_date)
+        )
+        trades = func.count(Trade.id)
+        symbols = [symbol for symbol, _ in db.query(Trade.symbol, trades).filter(*closed).group_by(
+            Trade.symbol).order_by(trades.desc(), Trade.symbol).limit(top).all()]
+        if not symbols:
+            return {"symbols": [], "days": np.zeros(0), "active_days": np.zeros(0, dtype=np.int64),
+                    "matrix": np.zeros((0, 0))}
+
+        day = period_start_sql(db, Trade.entry_date, "day")
+        rows = db.query(day.label("day"), Trade.symbol, func.sum(Trade.pnl)).filter(
+            *closed, Trade.symbol.in_(symbols)).group_by(day, Trade.symbol).all()
+
+        days, day_index = np.unique([period_key(r[0]).toordinal() for r in rows], return_inverse=True)
+        lookup = {symbol: i for i, symbol in enumerate(symbols)}
+        symbol_index = np.array([lookup[r[1]] for r in rows], dtype=np.int64)
+        matrix = np.zeros((len(days), len(symbols)))
+        matrix[day_index, symbol_index] = [r[2] for r in rows]
+        return {"symbols": symbols, "days": days, "active_days": np.bincount(symbol_index, minlength=len(symbols)),
+                "matrix": matrix}
+
+    @staticmethod
+    def correlation(db: Session, user_id: int, method: str = "pearson", top: int = 20,
+                    start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Dict:
+        """
+        Correlation matrix of daily P&L between the `top` most traded symbols, over
+        the days on which any of them traded. Pairs involving a symbol whose daily
+        P&L never varies are null.
+        """
+        if method not in CORRELATION_METHODS:
+            raise ValueError(f"method must be one of {', '.join(CORRELATION_METHODS)}")
+        if not 2 <= top <= MAX_SYMBOLS:
+            raise ValueError(f"top must be between 2 and {MAX_SYMBOLS}")
+
+        key = (user_id, method, top, start_date, end_date)
+        version = data_version(db, user_id)
+        cached = correlation_cache.get(key, version)
+        if cached is not None:
+            return cached
+
+        data = CorrelationService.daily_matrix(db, user_id, top, start_date, end_date)
+        matrix = data["matrix"]
+        if len(data["days"]) > 1:
+            values = correlation_matrix(matrix, method)
+        else:
+            values = np.full((len(data["symbols"]), len(data["symbols"])), np.nan)
+
+        result = {
+            "method": method,
+            "symbols": data["symbols"],
+            "days": int(len(data["days"])),
+            "active_days": data["active_days"].tolist(),
+            "pnl": matrix.sum(axis=0).round(2).tolist(),
+            "matrix": [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in values]
+        }
+        correlation_cache.put(key, version, result)
+        return result
@@ -0,0 +1,50 @@
+# downsample
+"""
+Largest-Triangle-Three-Buckets downsampling for chart series.
+The first and last points are kept; the rest of the series is cut into equal
+buckets and from each bucket the point forming the largest triangle with the
+previously kept point and the next bucket's average is kept. That favours the
+points where the line turns, so peaks and troughs survive the reduction.
+"""
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices (ascending) of at most max_points points of the (x, y) series chosen
+    by LTTB. The global maximum of y is always among them, and so is the
+    minimum unless both fall in the same bucket.
+    """
+    n = len(y)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])[:max_points]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket b covers [edges[b], edges[b + 1]) of the interior points 1..n-2
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for b in range(max_points - 2):
+        start, end = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            following = slice(edges[b + 1], edges[b + 2])
+            next_x, next_y = x[following].mean(), y[following].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[b + 1] = previous
+
+    # Make sure the extremes are kept: each replaces the pick of its own bucket
+    for extreme in (int(y.argmin()), int(y.argmax())):
+        if 0 < extreme < n - 1:
+            bucket = int(np.searchsorted(edges, extreme, side="right")) - 1
+            selected[bucket + 1] = extreme
+    return np.unique(selected)
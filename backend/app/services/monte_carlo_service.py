@@ -0,0 +1,125 @@
+# monte carlo service
+"""
+Monte Carlo equity projections by bootstrap resampling of closed-trade P&L.
+Paths are simulated in fixed-size chunks; each chunk draws a whole
+(paths x horizon) matrix of resampled trades at once and reduces it to final
+equity, max drawdown, ruin and equity at a few checkpoints, so only those
+small arrays travel back from the pool workers. Every chunk gets its own child
+of one SeedSequence, which makes a run reproducible for a given seed whatever
+the number of workers or the order chunks finish in.
+"""
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.process_pool import LazyProcessPool
+
+MAX_PATHS = 200_000
+MAX_HORIZON = 5_000
+# Paths per task; fixed so a seed always produces the same chunks
+CHUNK_PATHS = 2_000
+BAND_POINTS = 50
+PERCENTILES = (5, 25, 50, 75, 95)
+DRAWDOWN_BINS = 20
+
+
+def _simulate_chunk(pnl: np.ndarray, seed: np.random.SeedSequence, paths: int, horizon: int,
+                    initial_capital: float, ruin_level: float, checkpoints: np.ndarray) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    equity = pnl[rng.integers(0, len(pnl), size=(paths, horizon))]
+    np.cumsum(equity, axis=1, out=equity)
+    equity += initial_capital
+    lowest = equity.min(axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, initial_capital, out=peak)
+    drawdown = peak - equity
+    worst = drawdown.argmax(axis=1)
+    rows = np.arange(paths)
+    return {
+        "final": equity[:, -1].copy(),
+        "max_drawdown": drawdown[rows, worst],
+        "max_drawdown_percent": drawdown[rows, worst] / peak[rows, worst] * 100,
+        "ruined": lowest <= ruin_level,
+        "checkpoints": equity[:, checkpoints - 1],
+    }
+
+
+simulation_pool = LazyProcessPool(settings.MONTE_CARLO_WORKERS)
+
+
+def _run_chunks(pnl: np.ndarray, seeds: List[np.random.SeedSequence], sizes: List[int],
+                args: tuple) -> List[Dict[str, np.ndarray]]:
+    try:
+        futures = [simulation_pool.submit(_simulate_chunk, pnl, s, n, *args) for s, n in zip(seeds, sizes)]
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        # A worker died mid-run; the resubmit lands on a fresh pool and the seeds make the retry identical
+        futures = [simulation_pool.submit(_simulate_chunk, pnl, s, n, *args) for s, n in zip(seeds, sizes)]
+        return [f.result() for f in futures]
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, float]:
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+class MonteCarloService:
+
+    @staticmethod
+    def simulate(pnl: np.ndarray, initial_capital: float, paths: int = 10_000, horizon: Optional[int] = None,
+                 ruin_percent: float = 50.0, seed: Optional[int] = None) -> Dict:
+        """
+        Resample `pnl` with replacement into `paths` sequences of `horizon`
+        trades (default: as many as were taken) starting at initial_capital.
+        A path is ruined once its equity falls to initial_capital x
+        (1 - ruin_percent / 100) at any point.
+        """
+        if len(pnl) == 0:
+            raise ValueError("No closed trades to resample")
+        if initial_capital <= 0:
+            raise ValueError("initial_capital must be positive")
+        horizon = horizon or min(len(pnl), MAX_HORIZON)
+        if not 1 <= paths <= MAX_PATHS or not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"paths must be 1-{MAX_PATHS} and horizon 1-{MAX_HORIZON}")
+
+        seed = int(np.random.SeedSequence().entropy % 2**32) if seed is None else seed
+        ruin_level = initial_capital * (1 - ruin_percent / 100)
+        checkpoints = np.unique(np.linspace(1, horizon, min(BAND_POINTS, horizon)).round().astype(np.int64))
+        sizes = [min(CHUNK_PATHS, paths - start) for start in range(0, paths, CHUNK_PATHS)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        pnl = np.ascontiguousarray(pnl, dtype=np.float64)
+        args = (horizon, initial_capital, ruin_level, checkpoints)
+        if len(sizes) == 1:
+            # A single chunk is not worth a round trip to the pool
+            chunks = [_simulate_chunk(pnl, seeds[0], sizes[0], *args)]
+        else:
+            chunks = _run_chunks(pnl, seeds, sizes, args)
+
+        merged = {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+        final, drawdown_percent = merged["final"], merged["max_drawdown_percent"]
+        counts, edges = np.histogram(drawdown_percent, bins=DRAWDOWN_BINS, range=(0, 100))
+        bands = np.percentile(merged["checkpoints"], PERCENTILES, axis=0)
+
+        return {
+            "paths": paths,
+            "horizon": horizon,
+            "seed": seed,
+            "sample_trades": int(len(pnl)),
+            "initial_capital": initial_capital,
+            "ruin_percent": ruin_percent,
+            "ruin_level": round(ruin_level, 2),
+            "risk_of_ruin": round(float(merged["ruined"].mean()) * 100, 2),
+            "probability_of_profit": round(float((final > initial_capital).mean()) * 100, 2),
+            "final_equity": {"mean": round(float(final.mean()), 2), **_percentiles(final)},
+            "max_drawdown": {"mean": round(float(merged["max_drawdown"].mean()), 2),
+                             **_percentiles(merged["max_drawdown"])},
+            "max_drawdown_percent": {"mean": round(float(drawdown_percent.mean()), 2),
+                                     **_percentiles(drawdown_percent)},
+            "drawdown_histogram": {"bin_edges": edges.tolist(), "counts": counts.tolist()},
+            "bands": {
+                "steps": [0] + checkpoints.tolist(),
+                **{f"p{p}": [initial_capital] + band.round(2).tolist() for p, band in zip(PERCENTILES, bands)}
+            }
+        }
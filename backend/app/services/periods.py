@@ -0,0 +1,136 @@
+# periods
+"""
+Calendar periods shared by reports and analytics.
+period_bounds gives a period's [start, end) in Python; period_start_sql is the
+same truncation done by the database (date_trunc on Postgres, date modifiers on
+SQLite), so rows can be grouped by period in one aggregate query and matched
+back to period_bounds keys.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Integer, case, cast, func
+from sqlalchemy.orm import Session
+
+PERIOD_TRUNCATIONS = ("day", "week", "month", "quarter", "year")
+
+
+def period_bounds(period_type: str, at: datetime) -> Tuple[datetime, datetime]:
+    """[start, end) of the day, week (Monday-based), month, quarter or year containing `at`"""
+    day = datetime(at.year, at.month, at.day)
+    if period_type == "day":
+        return day, day + timedelta(days=1)
+    if period_type == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period_type == "month":
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    if period_type == "quarter":
+        start = day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+        return start, (start + timedelta(days=95)).replace(day=1)
+    if period_type == "year":
+        start = day.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    raise ValueError(f"Unknown period type {period_type}")
+
+
+def previous_periods(period_type: str, at: datetime, n: int) -> List[Tuple[datetime, datetime]]:
+    """[start, end) of the n periods ending with the one containing `at`, oldest first"""
+    bounds = [period_bounds(period_type, at)]
+    while len(bounds) < n:
+        bounds.append(period_bounds(period_type, bounds[-1][0] - timedelta(days=1)))
+    return bounds[::-1]
+
+
+def period_start_sql(db: Session, column: Any, period_type: str) -> Any:
+    """SQL expression for the start of the period containing `column`; read it back with period_key"""
+    if period_type not in PERIOD_TRUNCATIONS:
+        raise ValueError(f"Unknown period type {period_type}")
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(period_type, column)
+
+    # SQLite: date() with modifiers returns 'YYYY-MM-DD'
+    if period_type == "day":
+        return func.date(column)
+    if period_type == "week":
+        # Forward to Sunday (no-op on Sundays), then back to that week's Monday
+        return func.date(column, "weekday 0", "-6 days")
+    if period_type == "month":
+        return func.date(column, "start of month")
+    if period_type == "quarter":
+        month = cast(func.strftime("%m", column), Integer)
+        return func.date(column, "start of month", func.printf("-%d months", (month - 1) % 3))
+    return func.date(column, "start of year")
+
+
+def period_key(value: Any) -> date:
+    """Normalize a period_start_sql result (datetime on Postgres, string on SQLite) to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _utc_offset_minutes(zone: ZoneInfo, at: datetime) -> int:
+    return int(at.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset().total_seconds() // 60)
+
+
+def utc_offset_segments(tz_name: str, start: datetime, end: datetime) -> List[Tuple[Optional[datetime], int]]:
+    """
+    The zone's UTC offset over [start, end] as (segment start in UTC, offset in
+    minutes) pairs; the first segment starts at None. Transitions are found by
+    stepping a day at a time and bisecting to the minute.
+    """
+    zone = ZoneInfo(tz_name)
+    segments: List[Tuple[Optional[datetime], int]] = [(None, _utc_offset_minutes(zone, start))]
+    day = start
+    while day < end:
+        following = min(day + timedelta(days=1), end)
+        if _utc_offset_minutes(zone, following) != segments[-1][1]:
+            low, high = day, following
+            while high - low > timedelta(minutes=1):
+                middle = low + (high - low) / 2
+                if _utc_offset_minutes(zone, middle) == segments[-1][1]:
+                    low = middle
+                else:
+                    high = middle
+            segments.append((high.replace(second=0, microsecond=0), _utc_offset_minutes(zone, high)))
+        day = following
+    return segments
+
+
+def local_time_sql(db: Session, column: Any, tz_name: str, start: datetime, end: datetime) -> Any:
+    """
+    SQL expression converting a naive-UTC datetime column to wall-clock time in
+    `tz_name`. Postgres converts with its own zone database; SQLite has none, so
+    the zone's offsets over [start, end] (the span of the rows queried) are
+    applied as a CASE over the DST segments.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return func.timezone(tz_name, func.timezone("UTC", column))
+
+    segments = utc_offset_segments(tz_name, start, end)
+    shifted = [func.datetime(column, f"{offset:+d} minutes") for _, offset in segments]
+    if len(segments) == 1:
+        return shifted[0]
+    return case(*((column < segments[i + 1][0], shifted[i]) for i in range(len(segments) - 1)),
+                else_=shifted[-1])
+
+
+def duration_seconds_sql(db: Session, start: Any, end: Any) -> Any:
+    """SQL expression for the whole seconds from `start` to `end` (datetime columns)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.floor(func.extract("epoch", end - start)), Integer)
+    # Unix seconds are exact integers, unlike a julianday difference
+    return cast(func.strftime("%s", end), Integer) - cast(func.strftime("%s", start), Integer)
+
+
+def weekday_hour_sql(db: Session, column: Any) -> Tuple[Any, Any]:
+    """(weekday with Monday = 0, hour) SQL expressions for a datetime expression"""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.extract("isodow", column), Integer) - 1, cast(func.extract("hour", column), Integer)
+    return ((cast(func.strftime("%w", column), Integer) + 6) % 7,
+            cast(func.strftime("%H", column), Integer))
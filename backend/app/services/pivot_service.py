@@ -0,0 +1,131 @@
+# pivot service
+"""
+Ad-hoc group-by over the columnar trade cache.
+Each group-by dimension is an integer code array; the codes are combined into
+one row-major group key and every measure is derived from a
+handful of np.bincount passes over that key, so cost is linear in the number
+of trades and independent of how many groups come out.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.trade_columns import TradeColumns
+
+DIMENSIONS = ("symbol", "direction", "asset_type", "source", "year", "month", "date", "weekday", "hour")
+MEASURES = ("trades", "pnl", "wins", "losses", "win_rate", "avg_pnl", "avg_win", "avg_loss",
+            "gross_profit", "gross_loss", "profit_factor")
+MAX_GROUP_BY = 4
+# Above this many possible key combinations, group through np.unique instead of dense bincount
+DENSE_KEY_LIMIT = 4_000_000
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    out = np.zeros(len(numerator))
+    np.divide(numerator * scale, denominator, out=out, where=denominator != 0)
+    return out
+
+
+class PivotService:
+
+    @staticmethod
+    def filter_mask(columns: TradeColumns, filters: Dict[str, List[Any]]) -> np.ndarray:
+        mask = np.ones(len(columns), dtype=bool)
+        for name, allowed in filters.items():
+            if name not in DIMENSIONS:
+                raise ValueError(f"Unknown filter dimension {name}")
+            codes, labels = columns.dimension(name)
+            wanted = {str(v) for v in allowed}
+            allowed_codes = [code for code, label in enumerate(labels) if str(label) in wanted]
+            mask &= np.isin(codes, allowed_codes)
+        return mask
+
+    @staticmethod
+    def pivot(columns: TradeColumns, group_by: List[str], measures: Optional[List[str]] = None,
+              filters: Optional[Dict[str, List[Any]]] = None, sort_by: Optional[str] = None,
+              descending: bool = True, limit: Optional[int] = None) -> Dict:
+        """Aggregate `columns` (already narrowed to a date range with TradeColumns.between) per group"""
+        measures = list(measures or MEASURES)
+        unknown = [d for d in group_by if d not in DIMENSIONS] + [m for m in measures if m not in MEASURES]
+        if unknown:
+            raise ValueError(f"Unknown dimension or measure: {', '.join(unknown)}")
+        if len(group_by) > MAX_GROUP_BY:
+            raise ValueError(f"At most {MAX_GROUP_BY} group-by dimensions")
+        if sort_by is not None and sort_by not in MEASURES and sort_by not in group_by:
+            raise ValueError(f"Cannot sort by {sort_by}")
+
+        mask = PivotService.filter_mask(columns, filters) if filters else None
+
+        def select(values: np.ndarray) -> np.ndarray:
+            return values if mask is None else values[mask]
+
+        dims = [columns.dimension(name) for name in group_by]
+        shape = tuple(max(len(labels), 1) for _, labels in dims)
+
+        # Combine the per-dimension codes into one row-major group key
+        key = np.zeros(len(columns) if mask is None else int(mask.sum()), dtype=np.int64)
+        for (codes, _), size in zip(dims, shape):
+            key *= size
+            key += select(codes)
+        n_keys = int(np.prod(shape, dtype=np.int64))
+        if n_keys > DENSE_KEY_LIMIT:
+            group_keys, key = np.unique(key, return_inverse=True)
+            n_keys = len(group_keys)
+        else:
+            group_keys = None
+
+        trades = np.bincount(key, minlength=n_keys)
+        present = np.flatnonzero(trades)
+        trades = trades[present].astype(np.float64)
+        total = np.bincount(key, weights=select(columns.pnl), minlength=n_keys)[present]
+        wins = np.bincount(key, weights=select(columns.is_win), minlength=n_keys)[present]
+        losses = np.bincount(key, weights=select(columns.is_loss), minlength=n_keys)[present]
+        gross_profit = np.bincount(key, weights=select(columns.profit), minlength=n_keys)[present]
+        gross_loss = gross_profit - total
+
+        values = {
+            "trades": trades,
+            "pnl": total,
+            "wins": wins,
+            "losses": losses,
+            "win_rate": _ratio(wins, trades, 100),
+            "avg_pnl": _ratio(total, trades),
+            "avg_win": _ratio(gross_profit, wins),
+            "avg_loss": _ratio(gross_loss, losses),
+            "gross_profit": gross_profit,
+            "gross_loss": gross_loss,
+            "profit_factor": _ratio(gross_profit, gross_loss),
+        }
+
+        full_keys = present if group_keys is None else group_keys[present]
+        group_codes = np.unravel_index(full_keys, shape) if group_by else ()
+
+        order = np.arange(len(present))
+        if sort_by in values:
+            order = np.argsort(values[sort_by], kind="stable")
+        elif sort_by in group_by:
+            order = np.argsort(group_codes[group_by.index(sort_by)], kind="stable")
+        if sort_by is not None and descending:
+            order = order[::-1]
+        if limit is not None:
+            order = order[:limit]
+
+        rows = []
+        label_lists = [labels for _, labels in dims]
+        columns_out = {name: values[name][order].round(2).tolist() for name in measures}
+        for name in ("trades", "wins", "losses"):
+            if name in columns_out:
+                columns_out[name] = [int(v) for v in columns_out[name]]
+        group_out = [[label_lists[d][c] for c in group_codes[d][order].tolist()] for d in range(len(group_by))]
+        for i in range(len(order)):
+            row = {name: group_out[d][i] for d, name in enumerate(group_by)}
+            row.update({name: columns_out[name][i] for name in measures})
+            rows.append(row)
+
+        return {
+            "group_by": group_by,
+            "measures": measures,
+            "total_groups": int(len(present)),
+            "trades_matched": len(key),
+            "rows": rows,
+        }
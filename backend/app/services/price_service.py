@@ -0,0 +1,38 @@
+# price service
+import json
+import requests as req_lib
+from typing import Callable, Dict, Iterable, List, Optional
+
+BINANCE_TICKER_URL = "https://api.binance.com/api/v3/ticker/price"
+
+# Optional replacement for the Binance ticker, e.g. a deterministic source for load tests
+_price_source: Optional[Callable[[List[str]], Dict[str, float]]] = None
+
+def set_price_source(source: Optional[Callable[[List[str]], Dict[str, float]]]) -> None:
+    """Route every live price lookup through `source`; pass None to go back to Binance"""
+    global _price_source
+    _price_source = source
+
+def fetch_ticker_prices(symbols: Iterable[str]) -> Dict[str, float]:
+    """
+    Last traded price for every symbol, fetched in a single Binance request.
+    Symbols Binance does not list are left out of the result.
+    """
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return {}
+    if _price_source is not None:
+        return _price_source(symbols)
+    if len(symbols) == 1:
+        resp = req_lib.get(BINANCE_TICKER_URL, params={"symbol": symbols[0]}, timeout=5)
+        if resp.status_code == 400:
+            return {}
+        resp.raise_for_status()
+        return {symbols[0]: float(resp.json()["price"])}
+    resp = req_lib.get(BINANCE_TICKER_URL, params={"symbols": json.dumps(symbols, separators=(",", ":"))}, timeout=5)
+    if resp.status_code == 400:
+        # One unknown symbol fails the whole list: read the full ticker and keep the ones asked for
+        resp = req_lib.get(BINANCE_TICKER_URL, timeout=5)
+    resp.raise_for_status()
+    wanted = set(symbols)
+    return {row["symbol"]: float(row["price"]) for row in resp.json() if row["symbol"] in wanted}
@@ -0,0 +1,54 @@
+# process pool
+"""
+Worker process pools shared by backtest jobs, sweeps and simulations.
+Pools always use the spawn start method: the API process is multi-threaded, and
+forking it could copy a lock held by another thread into the child. A
+LazyProcessPool starts its executor on first use; once a worker dies the
+executor is broken for good, so the next submit that hits BrokenProcessPool
+replaces it with a fresh one.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+
+def spawn_executor(max_workers: int, initializer: Optional[Callable] = None, initargs: tuple = ()) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initializer, initargs=initargs)
+
+
+class LazyProcessPool:
+    """A spawn executor created on first submit and replaced when it turns out to be broken"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = spawn_executor(self.max_workers)
+            return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        pool = self._current()
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard(pool)
+            return self._current().submit(fn, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,245 @@
+# report service
+"""
+Weekly, monthly and yearly trading reports.
+Reports for finished periods are generated once, stored as a JSON row and
+served from there; a trade change marks only the reports whose period contains
+that trade's entry_date as stale. The current, still-open period is always
+computed live and never stored.
+"""
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.report import Report
+from app.models.trade import Trade, TradeStatus
+from app.services.analytics_service import AnalyticsService
+from app.services.periods import period_bounds, period_key, period_start_sql
+
+PERIOD_TYPES = ("week", "month", "year")
+TOP_SYMBOLS = 3
+# Upper bound on reports generated per background pass, so one pass stays short
+PRECOMPUTE_BATCH = 500
+PRECOMPUTE_INTERVAL_SECONDS = 3600
+
+
+def _bucket_stats(trades: List[Trade]) -> Dict:
+    wins = sum(1 for t in trades if t.pnl > 0)
+    return {
+        "trades": len(trades),
+        "pnl": round(sum(t.pnl for t in trades), 2),
+        "win_rate": round(wins / len(trades) * 100, 2) if trades else 0
+    }
+
+
+class ReportService:
+
+    @staticmethod
+    def build_payload(trades: List[Trade], period_type: str, start: datetime, end: datetime) -> Dict:
+        """Report body for closed trades entered in [start, end), ordered by entry_date"""
+        by_symbol = defaultdict(list)
+        by_hour = defaultdict(list)
+        by_day = defaultdict(list)
+        for trade in trades:
+            by_symbol[trade.symbol].append(trade)
+            by_hour[trade.entry_date.hour].append(trade)
+            by_day[trade.entry_date.date().isoformat()].append(trade)
+
+        symbols = sorted(({"symbol": s, **_bucket_stats(ts)} for s, ts in by_symbol.items()),
+                         key=lambda row: row["pnl"], reverse=True)
+        return {
+            "period_type": period_type,
+            "period_start": start.date().isoformat(),
+            "period_end": (end - timedelta(days=1)).date().isoformat(),
+            "performance": AnalyticsService.summarize_trades(trades),
+            "drawdown": AnalyticsService.drawdown_from_trades(trades),
+            "best_symbols": [s for s in symbols[:TOP_SYMBOLS] if s["pnl"] > 0],
+            "worst_symbols": [s for s in reversed(symbols[-TOP_SYMBOLS:]) if s["pnl"] < 0],
+            # Entry hour, UTC
+            "time_of_day": [{"hour": hour, **_bucket_stats(by_hour[hour])} for hour in sorted(by_hour)],
+            "daily": [{"date": day, **_bucket_stats(by_day[day])} for day in sorted(by_day)]
+        }
+
+    @staticmethod
+    def period_trades(db: Session, user_id: int, start: datetime, end: datetime) -> List[Trade]:
+        """Closed trades entered in [start, end), ordered by entry_date"""
+        return db.query(Trade).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            Trade.entry_date >= start,
+            Trade.entry_date < end
+        ).order_by(Trade.entry_date).all()
+
+    @staticmethod
+    def fingerprint(db: Session, user_id: int, start: datetime, end: datetime) -> Tuple:
+        """(count, max updated_at, sum of ids) of the period's trades; moves with any insert, edit or delete"""
+        count, last_update, id_sum = db.query(
+            func.count(Trade.id), func.max(Trade.updated_at), func.sum(Trade.id)
+        ).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None),
+            Trade.entry_date >= start,
+            Trade.entry_date < end
+        ).one()
+        return count, last_update, id_sum
+
+    @staticmethod
+    def trades_fingerprint(trades: List[Trade]) -> Tuple:
+        """fingerprint() computed from trades already loaded"""
+        updates = [t.updated_at for t in trades if t.updated_at is not None]
+        return len(trades), max(updates, default=None), sum(t.id for t in trades) if trades else None
+
+    @staticmethod
+    def generate(db: Session, user_id: int, period_type: str, start: datetime, end: datetime) -> Dict:
+        trades = ReportService.period_trades(db, user_id, start, end)
+        return ReportService.build_payload(trades, period_type, start, end)
+
+    @staticmethod
+    def regenerate(db: Session, user_id: int, period_type: str, start: datetime, end: datetime,
+                   existing: Optional[Report] = None) -> Dict:
+        """Generate a finished period's report and store it"""
+        trades = ReportService.period_trades(db, user_id, start, end)
+        payload = ReportService.build_payload(trades, period_type, start, end)
+        ReportService.store(db, user_id, period_type, start, end, payload, existing,
+                            ReportService.trades_fingerprint(trades))
+        return payload
+
+    @staticmethod
+    def store(db: Session, user_id: int, period_type: str, start: datetime, end: datetime, payload: Dict,
+              existing: Optional[Report] = None, read_fingerprint: Optional[Tuple] = None) -> None:
+        """
+        Store a generated report as fresh. With the fingerprint of the trades it
+        was built from, the period is re-checked after writing: if a trade changed
+        since they were read (and its invalidate may already have run), the row
+        is stored stale so the next read regenerates it.
+        """
+        report = existing
+        if report is None:
+            report = Report(user_id=user_id, period_type=period_type, period_start=start, period_end=end)
+            db.add(report)
+        report.payload = json.dumps(payload)
+        report.is_stale = False
+        report.generated_at = datetime.utcnow()
+        try:
+            if read_fingerprint is not None:
+                db.flush()
+                if ReportService.fingerprint(db, user_id, start, end) != read_fingerprint:
+                    report.is_stale = True
+            db.commit()
+        except IntegrityError:
+            # Generated concurrently by the background task; either copy is current
+            db.rollback()
+
+    @staticmethod
+    def get_report(db: Session, user_id: int, period_type: str, at: datetime) -> Dict:
+        """Report for the period containing `at`: one row read when a fresh stored copy exists"""
+        start, end = period_bounds(period_type, at)
+        if end > datetime.utcnow():
+            return {**ReportService.generate(db, user_id, period_type, start, end), "is_live": True}
+
+        row = db.query(Report).filter(
+            Report.user_id == user_id,
+            Report.period_type == period_type,
+            Report.period_start == start
+        ).first()
+        if row is not None and not row.is_stale:
+            return {**json.loads(row.payload), "is_live": False}
+
+        payload = ReportService.regenerate(db, user_id, period_type, start, end, row)
+        return {**payload, "is_live": False}
+
+    @staticmethod
+    def list_reports(db: Session, user_id: int, period_type: str) -> List[Dict]:
+        rows = db.query(Report.period_start, Report.period_end, Report.is_stale, Report.generated_at).filter(
+            Report.user_id == user_id,
+            Report.period_type == period_type
+        ).order_by(Report.period_start.desc()).all()
+        return [{"period_start": r.period_start.date().isoformat(),
+                 "period_end": (r.period_end - timedelta(days=1)).date().isoformat(),
+                 "is_stale": r.is_stale, "generated_at": r.generated_at} for r in rows]
+
+    @staticmethod
+    def invalidate(db: Session, user_id: int, dates: Iterable[Optional[datetime]]) -> None:
+        """
+        Mark stale every stored report whose period contains one of `dates`
+        (entry dates of trades that were added, changed or removed). Joins the
+        caller's transaction; the caller commits.
+        """
+        starts = defaultdict(set)
+        for date in dates:
+            if date is None:
+                continue
+            for period_type in PERIOD_TYPES:
+                starts[period_type].add(period_bounds(period_type, date)[0])
+        if not starts:
+            return
+        db.execute(
+            update(Report)
+            .where(Report.user_id == user_id,
+                   Report.is_stale.is_(False),
+                   or_(*(and_(Report.period_type == period_type, Report.period_start.in_(sorted(values)))
+                         for period_type, values in starts.items())))
+            .values(is_stale=True)
+        )
+
+    @staticmethod
+    def precompute(db: Session, limit: int = PRECOMPUTE_BATCH) -> int:
+        """Generate missing or stale reports for finished periods that contain trades, newest first"""
+        now = datetime.utcnow()
+        wanted = []
+        for period_type in PERIOD_TYPES:
+            bucket = period_start_sql(db, Trade.entry_date, period_type)
+            # Finished periods with no fresh stored report; only distinct (user, period) keys come back
+            fresh = exists().where(
+                Report.user_id == Trade.user_id,
+                Report.period_type == period_type,
+                period_start_sql(db, Report.period_start, "day") == bucket,
+                Report.is_stale.is_(False)
+            )
+            rows = db.query(Trade.user_id, bucket.label("period_start")).filter(
+                Trade.status == TradeStatus.CLOSED,
+                Trade.pnl.isnot(None),
+                Trade.entry_date < period_bounds(period_type, now)[0],
+                ~fresh
+            ).group_by(Trade.user_id, bucket).order_by(bucket.desc()).limit(limit).all()
+            wanted.extend((datetime.combine(period_key(start), time()), period_type, user_id)
+                          for user_id, start in rows)
+
+        wanted = sorted(wanted, key=lambda key: key[0], reverse=True)[:limit]
+        for start, period_type, user_id in wanted:
+            existing = db.query(Report).filter(
+                Report.user_id == user_id,
+                Report.period_type == period_type,
+                Report.period_start == start
+            ).first()
+            end = period_bounds(period_type, start)[1]
+            ReportService.regenerate(db, user_id, period_type, start, end, existing)
+        return len(wanted)
+
+
+def _precompute_pass() -> int:
+    db = SessionLocal()
+    try:
+        return ReportService.precompute(db)
+    finally:
+        db.close()
+
+
+async def report_precompute_loop() -> None:
+    """Background task: keep finished periods' reports generated ahead of the first request"""
+    while True:
+        try:
+            generated = await asyncio.to_thread(_precompute_pass)
+            if generated:
+                print(f"Precomputed {generated} report(s)")
+        except Exception as e:
+            print(f"Report precompute error: {e}")
+        await asyncio.sleep(PRECOMPUTE_INTERVAL_SECONDS)
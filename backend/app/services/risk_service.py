@@ -0,0 +1,179 @@
+# risk service
+"""
+Risk metrics over a P&L series of closed trades ordered by entry_date.
+Everything is derived from a few array passes: the equity curve is a cumsum,
+the running peak a np.maximum.accumulate, drawdown periods come from the edges
+of the underwater mask and daily figures from one bincount over entry days.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+DAYS_PER_YEAR = 365
+# Van Tharp's SQN caps the sample size so large samples do not inflate the score
+SQN_MAX_TRADES = 100
+# Composite score: each component is scaled to [0, 1] against the value that earns full marks
+SCORE_TARGETS = {
+    "win_rate": 60.0,
+    "profit_factor": 2.5,
+    "payoff_ratio": 2.0,
+    "recovery_factor": 3.0,
+    "day_win_rate": 60.0,
+    "sqn": 3.0,
+}
+SCORE_WEIGHTS = {
+    "win_rate": 0.15,
+    "profit_factor": 0.25,
+    "payoff_ratio": 0.15,
+    "recovery_factor": 0.15,
+    "day_win_rate": 0.15,
+    "sqn": 0.15,
+}
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator else 0.0
+
+
+class RiskService:
+
+    @staticmethod
+    def drawdown(pnl: np.ndarray) -> Dict:
+        """
+        Max, average and current drawdown of the cumulative P&L, with the peak
+        starting at 0. max_drawdown_percent is relative to the final peak, as the
+        journal has always reported it.
+        """
+        if len(pnl) == 0:
+            return {
+                "max_drawdown": 0,
+                "max_drawdown_percent": 0,
+                "average_drawdown": 0,
+                "current_drawdown": 0
+            }
+        equity = np.cumsum(pnl)
+        peak = np.maximum(np.maximum.accumulate(equity), 0)
+        drawdown = peak - equity
+        underwater = drawdown[drawdown > 0]
+        max_drawdown = float(drawdown.max())
+        # Sequential sum, so the average matches a running Python total bit for bit
+        average = float(np.add.accumulate(underwater)[-1]) / len(underwater) if len(underwater) else 0
+        final_peak = float(peak[-1])
+        return {
+            "max_drawdown": round(max_drawdown, 2),
+            "max_drawdown_percent": round(max_drawdown / final_peak * 100, 2) if final_peak > 0 else 0,
+            "average_drawdown": round(average, 2),
+            "current_drawdown": round(final_peak - float(equity[-1]), 2)
+        }
+
+    @staticmethod
+    def drawdown_periods(entry_time: np.ndarray, pnl: np.ndarray) -> Dict:
+        """Count and length of underwater stretches, in trades and in days from the peak to the recovery"""
+        equity = np.cumsum(pnl)
+        underwater = (np.maximum(np.maximum.accumulate(equity), 0) - equity) > 0
+        edges = np.diff(np.concatenate([[0], underwater.astype(np.int8), [0]]))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        if len(starts) == 0:
+            return {"drawdown_periods": 0, "max_drawdown_duration_trades": 0, "max_drawdown_duration_days": 0,
+                    "current_drawdown_duration_trades": 0, "current_drawdown_duration_days": 0}
+
+        seconds = entry_time.astype("datetime64[s]").astype(np.int64)
+        # A stretch runs from the trade that set the peak to the trade that recovered it;
+        # one still open at the last trade is measured up to that trade
+        began = seconds[np.maximum(starts - 1, 0)]
+        recovered = seconds[np.minimum(ends, len(seconds) - 1)]
+        trades = ends - starts
+        days = (recovered - began) / 86400
+        ongoing = bool(underwater[-1])
+        return {
+            "drawdown_periods": int(len(starts)),
+            "max_drawdown_duration_trades": int(trades.max()),
+            "max_drawdown_duration_days": round(float(days.max()), 2),
+            "current_drawdown_duration_trades": int(trades[-1]) if ongoing else 0,
+            "current_drawdown_duration_days": round(float(days[-1]), 2) if ongoing else 0
+        }
+
+    @staticmethod
+    def daily_returns(entry_time: np.ndarray, pnl: np.ndarray, initial_capital: Optional[float] = None) -> Dict:
+        """
+        Sharpe, Sortino, volatility and Ulcer index on calendar-day figures from
+        the first to the last trade, days without trades counting as flat. With
+        an initial capital these are percentage returns on the running balance;
+        without one the daily P&L itself is used (ratios are unchanged on a fixed
+        base, and the Ulcer index is then in currency).
+        """
+        days = entry_time.astype("datetime64[D]").astype(np.int64)
+        daily = np.bincount(days - days[0], weights=pnl)
+        closes = np.cumsum(daily)
+        if initial_capital:
+            opening = initial_capital + np.concatenate([[0.0], closes[:-1]])
+            returns = np.divide(daily, opening, out=np.zeros(len(daily)), where=opening > 0)
+            balance = initial_capital + closes
+            peak = np.maximum.accumulate(np.maximum(balance, initial_capital))
+            underwater = np.divide(peak - balance, peak, out=np.zeros(len(daily)), where=peak > 0) * 100
+        else:
+            returns = daily
+            underwater = np.maximum(np.maximum.accumulate(closes), 0) - closes
+
+        annualize = np.sqrt(DAYS_PER_YEAR)
+        mean = float(returns.mean())
+        deviation = float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+        downside = float(np.sqrt(np.mean(np.minimum(returns, 0) ** 2)))
+        traded = daily[np.unique(days - days[0])]
+        return {
+            "days": int(len(daily)),
+            "trading_days": int(len(traded)),
+            "day_win_rate": round(float((traded > 0).mean()) * 100, 2),
+            "best_day": round(float(daily.max()), 2),
+            "worst_day": round(float(daily.min()), 2),
+            "volatility": round(deviation * float(annualize), 4),
+            "sharpe_ratio": round(_ratio(mean, deviation) * float(annualize), 4),
+            "sortino_ratio": round(_ratio(mean, downside) * float(annualize), 4),
+            "ulcer_index": round(float(np.sqrt(np.mean(underwater ** 2))), 4)
+        }
+
+    @staticmethod
+    def trade_stats(pnl: np.ndarray, max_drawdown: float) -> Dict:
+        wins, losses = pnl[pnl > 0], pnl[pnl < 0]
+        gross_profit, gross_loss = float(wins.sum()), float(-losses.sum())
+        average_win = _ratio(gross_profit, len(wins))
+        average_loss = _ratio(gross_loss, len(losses))
+        deviation = float(pnl.std(ddof=1)) if len(pnl) > 1 else 0.0
+        expectancy = float(pnl.mean())
+        return {
+            "expectancy": round(expectancy, 2),
+            "standard_deviation": round(deviation, 2),
+            "sqn": round(float(np.sqrt(min(len(pnl), SQN_MAX_TRADES))) * _ratio(expectancy, deviation), 4),
+            "win_rate": round(len(wins) / len(pnl) * 100, 2),
+            "payoff_ratio": round(_ratio(average_win, average_loss), 4),
+            "profit_factor": round(_ratio(gross_profit, gross_loss), 4),
+            "recovery_factor": round(_ratio(float(pnl.sum()), max_drawdown), 4)
+        }
+
+    @staticmethod
+    def score(stats: Dict) -> Dict:
+        """0-100 composite of the SCORE_TARGETS measures, weighted by SCORE_WEIGHTS"""
+        components = {name: round(min(max(_ratio(stats[name], target), 0.0), 1.0) * 100, 2)
+                      for name, target in SCORE_TARGETS.items()}
+        value = sum(components[name] * weight for name, weight in SCORE_WEIGHTS.items())
+        return {"value": round(value, 1), "components": components}
+
+    @staticmethod
+    def analyze(entry_time: np.ndarray, pnl: np.ndarray, initial_capital: Optional[float] = None) -> Dict:
+        """All risk metrics for closed trades ordered by entry_date"""
+        if len(pnl) == 0:
+            return {"trades": 0, "initial_capital": initial_capital, "return_basis": None,
+                    "drawdown": RiskService.drawdown(pnl), "returns": None, "trade_stats": None, "score": None}
+
+        drawdown = {**RiskService.drawdown(pnl), **RiskService.drawdown_periods(entry_time, pnl)}
+        returns = RiskService.daily_returns(entry_time, pnl, initial_capital)
+        stats = RiskService.trade_stats(pnl, drawdown["max_drawdown"])
+        return {
+            "trades": int(len(pnl)),
+            "initial_capital": initial_capital,
+            "return_basis": "capital" if initial_capital else "pnl",
+            "drawdown": drawdown,
+            "returns": returns,
+            "trade_stats": stats,
+            "score": RiskService.score({**stats, "day_win_rate": returns["day_win_rate"]})
+        }
@@ -0,0 +1,91 @@
+# rolling service
+"""
+Rolling-window metrics over closed trades ordered by entry_date.
+Each window is [left, i] for trade i, and every windowed sum is the difference
+of two prefix sums, c[i + 1] - c[left], so one cumsum per accumulator serves all
+windows at once regardless of the window size. Windows are either the last N
+trades or the trades entered in the trailing N days.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.trade_columns import TradeColumns
+
+ROLLING_METRICS = ("pnl", "trades", "win_rate", "profit_factor", "expectancy")
+ROLLING_UNITS = ("trades", "days")
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    out = np.empty(len(values) + 1, dtype=np.float64)
+    out[0] = 0.0
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+class RollingService:
+
+    @staticmethod
+    def window_starts(columns: TradeColumns, window: int, unit: str) -> np.ndarray:
+        """Index of the first trade in each trade's window"""
+        index = np.arange(len(columns))
+        if unit == "trades":
+            return np.maximum(index + 1 - window, 0)
+        seconds = columns.entry_time.astype(np.int64)
+        # Trailing (t - window days, t]
+        return np.searchsorted(seconds, seconds - window * 86400, side="right")
+
+    @staticmethod
+    def rolling(columns: TradeColumns, window: int, unit: str = "trades",
+                metrics: Optional[List[str]] = None) -> Dict:
+        """
+        Rolling series per trade. Trade-count windows start once the first full
+        window is available; day windows start at the first trade.
+        """
+        metrics = list(metrics or ROLLING_METRICS)
+        unknown = [m for m in metrics if m not in ROLLING_METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metric: {', '.join(unknown)}")
+        if unit not in ROLLING_UNITS:
+            raise ValueError(f"unit must be one of {', '.join(ROLLING_UNITS)}")
+        if window < 1:
+            raise ValueError("window must be at least 1")
+
+        left = RollingService.window_starts(columns, window, unit)
+        right = np.arange(1, len(columns) + 1)
+        first = window - 1 if unit == "trades" else 0
+        left, right = left[first:], right[first:]
+
+        def window_sum(values: np.ndarray) -> np.ndarray:
+            prefix = _prefix(values)
+            return prefix[right] - prefix[left]
+
+        count = (right - left).astype(np.float64)
+        pnl = window_sum(columns.pnl)
+        series = {}
+        if "pnl" in metrics:
+            series["pnl"] = pnl
+        if "trades" in metrics:
+            series["trades"] = count
+        if "win_rate" in metrics:
+            series["win_rate"] = window_sum(columns.is_win) / count * 100
+        if "expectancy" in metrics:
+            series["expectancy"] = pnl / count
+        if "profit_factor" in metrics:
+            gross_profit = window_sum(columns.profit)
+            # Loss counts difference exactly, unlike the gross loss itself
+            has_loss = window_sum(columns.is_loss) > 0
+            # No losses in the window: 0, as profit_factor is reported everywhere else
+            series["profit_factor"] = np.divide(gross_profit, gross_profit - pnl, out=np.zeros(len(pnl)),
+                                                where=has_loss)
+
+        times = columns.entry_time[first:].astype("datetime64[ms]").astype(np.int64)
+        return {
+            "window": window,
+            "unit": unit,
+            "points": int(len(times)),
+            "times": times.tolist(),
+            "trade_ids": columns.ids[first:].tolist(),
+            "series": {name: (values.astype(np.int64) if name == "trades" else values.round(4)).tolist()
+                       for name, values in series.items()}
+        }
@@ -0,0 +1,285 @@
+# sketch service
+"""
+Per-user quantile sketches of closed-trade P&L, P&L percent and holding time.
+Each metric is a DDSketch: values fall into logarithmic buckets whose width is
+a fixed fraction of their magnitude, so any quantile read back is within
+RELATIVE_ACCURACY of the true value, and the number of buckets depends on the
+value range, not on the number of trades. Buckets are plain counts, so a trade
+can be removed as exactly as it was added: closing, editing and deleting trades
+update the stored sketches in place instead of triggering a rescan.
+Stored sketches carry the data version of the trades they describe. A write
+that goes around apply() leaves that version behind, and the next read serves
+a sketch computed on the fly while a background task rebuilds the stored one.
+"""
+import json
+import math
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.trade import Trade, TradeStatus
+from app.models.trade_sketch import TradeSketch
+from app.services.analytics_service import entry_range
+from app.services.trade_columns import data_version
+
+SKETCH_METRICS = ("pnl", "pnl_percent", "holding_hours")
+RELATIVE_ACCURACY = 0.01
+# Magnitudes below this are counted as zero
+MIN_MAGNITUDE = 1e-9
+PERCENTILES = (5, 25, 50, 75, 95)
+# Histogram bins span this quantile range; values outside it land in the edge bins
+HISTOGRAM_RANGE = (0.01, 0.99)
+# Session.info key: sketch rows per user that apply() kept in step, to tag at commit
+PENDING_VERSIONS = "sketch_versions"
+
+
+class DDSketch:
+    """Quantile sketch with relative-error guarantees over positive, negative and zero values"""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.total = 0.0
+
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Add `value` weight times; a negative weight removes it again (never below zero)"""
+        if abs(value) < MIN_MAGNITUDE:
+            applied = max(weight, -self.zero)
+            self.zero += applied
+        else:
+            buckets = self.positive if value > 0 else self.negative
+            key = self._key(abs(value))
+            applied = max(weight, -buckets.get(key, 0))
+            buckets[key] = buckets.get(key, 0) + applied
+            if buckets[key] == 0:
+                del buckets[key]
+        self.total += value * applied
+
+    def merge(self, other: "DDSketch") -> None:
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.zero += other.zero
+        self.total += other.total
+
+    def buckets(self) -> tuple:
+        """(representative values, counts) in ascending value order"""
+        negative = sorted(self.negative.items(), reverse=True)
+        positive = sorted(self.positive.items())
+        values = [-self._value(k) for k, _ in negative] + ([0.0] if self.zero else []) + [self._value(k) for k, _ in positive]
+        counts = [c for _, c in negative] + ([self.zero] if self.zero else []) + [c for _, c in positive]
+        return np.array(values, dtype=np.float64), np.array(counts, dtype=np.int64)
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        values, counts = self.buckets()
+        if not len(counts):
+            return [None for _ in qs]
+        cumulative = np.cumsum(counts)
+        ranks = np.asarray(list(qs), dtype=np.float64) * (cumulative[-1] - 1)
+        return values[np.searchsorted(cumulative, ranks, side="right")].tolist()
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "relative_accuracy": self.relative_accuracy,
+            "zero": self.zero,
+            "total": self.total,
+            "positive": [list(self.positive), list(self.positive.values())],
+            "negative": [list(self.negative), list(self.negative.values())],
+        })
+
+    @classmethod
+    def from_json(cls, payload: str) -> "DDSketch":
+        data = json.loads(payload)
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero = data["zero"]
+        sketch.total = data["total"]
+        sketch.positive = dict(zip(*data["positive"]))
+        sketch.negative = dict(zip(*data["negative"]))
+        return sketch
+
+
+def trade_metrics(pnl: float, entry_price: float, quantity: float, entry_date: Optional[datetime],
+                  exit_date: Optional[datetime]) -> Dict[str, float]:
+    """The sketched values of one closed trade; P&L percent is on cost basis, as in calculate_pnl"""
+    values = {"pnl": pnl}
+    cost_basis = (entry_price or 0) * (quantity or 0)
+    if cost_basis > 0:
+        values["pnl_percent"] = pnl / cost_basis * 100
+    if entry_date is not None and exit_date is not None and exit_date >= entry_date:
+        values["holding_hours"] = (exit_date - entry_date).total_seconds() / 3600
+    return values
+
+
+def sketch_values(trade: Trade) -> Optional[Dict[str, float]]:
+    """trade_metrics for a closed trade with a P&L, None for anything the sketches do not count"""
+    if trade.status != TradeStatus.CLOSED or trade.pnl is None:
+        return None
+    return trade_metrics(trade.pnl, trade.entry_price, trade.quantity, trade.entry_date, trade.exit_date)
+
+
+def sketch_version(db: Session, user_id: int) -> str:
+    """data_version of the user's trades in the form stored on TradeSketch rows"""
+    return "|".join(str(part) for part in data_version(db, user_id))
+
+
+@event.listens_for(Session, "before_commit")
+def _stamp_versions(db: Session) -> None:
+    """Tag sketches updated by apply() with the trades' version as of this commit"""
+    pending = db.info.pop(PENDING_VERSIONS, None)
+    if not pending:
+        return
+    db.flush()
+    for user_id, rows in pending.items():
+        version = sketch_version(db, user_id)
+        for row in rows:
+            row.data_version = version
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_versions(db: Session) -> None:
+    db.info.pop(PENDING_VERSIONS, None)
+
+
+class SketchService:
+
+    @staticmethod
+    def apply(db: Session, user_id: int, added: Iterable[Optional[Dict[str, float]]] = (),
+              removed: Iterable[Optional[Dict[str, float]]] = ()) -> None:
+        """
+        Fold closed trades into (or out of) the user's stored sketches; the commit
+        then moves them to the trades' new data version. Call it before the trade
+        changes are flushed: sketches that did not match the version seen then are
+        left stale for the next read to rebuild. Joins the caller's transaction; the
+        caller commits. Users without stored sketches are skipped: their first read
+        builds the sketches from the trades table.
+        """
+        added = [v for v in added if v]
+        removed = [v for v in removed if v]
+        with db.no_autoflush:
+            rows = db.query(TradeSketch).filter(TradeSketch.user_id == user_id).with_for_update().all()
+            if not rows:
+                return
+            current = sketch_version(db, user_id)
+            if any(row.data_version != current for row in rows):
+                return
+        for row in rows:
+            sketch = DDSketch.from_json(row.payload)
+            for values, weight in [(v, -1) for v in removed] + [(v, 1) for v in added]:
+                if row.metric in values:
+                    sketch.add(values[row.metric], weight)
+            row.payload = sketch.to_json()
+            row.count = sketch.count
+        db.info.setdefault(PENDING_VERSIONS, {})[user_id] = rows
+
+    @staticmethod
+    def sketch_trades(db: Session, user_id: int, start_date: Optional[datetime] = None,
+                      end_date: Optional[datetime] = None) -> Dict[str, DDSketch]:
+        """Sketch the user's closed trades entered in [start_date, end_date) in one pass, without storing"""
+        sketches = {metric: DDSketch() for metric in SKETCH_METRICS}
+        for pnl, entry_price, quantity, entry_date, exit_date in db.query(
+                Trade.pnl, Trade.entry_price, Trade.quantity, Trade.entry_date, Trade.exit_date).filter(
+                Trade.user_id == user_id,
+                Trade.status == TradeStatus.CLOSED,
+                Trade.pnl.isnot(None),
+                *entry_range(start_date, end_date)).yield_per(10000):
+            for metric, value in trade_metrics(pnl, entry_price, quantity, entry_date, exit_date).items():
+                sketches[metric].add(value)
+        return sketches
+
+    @staticmethod
+    def build(db: Session, user_id: int) -> None:
+        """Sketch every closed trade of the user and store the result with the data version it was read at"""
+        # Read the version first: a trade changed in between makes the stored copy stale, never wrongly current
+        version = sketch_version(db, user_id)
+        sketches = SketchService.sketch_trades(db, user_id)
+
+        rows = {row.metric: row for row in db.query(TradeSketch).filter(TradeSketch.user_id == user_id).with_for_update()}
+        for metric, sketch in sketches.items():
+            row = rows.get(metric) or TradeSketch(user_id=user_id, metric=metric)
+            row.count, row.payload, row.data_version = sketch.count, sketch.to_json(), version
+            db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Built concurrently by another task; either copy is current
+            db.rollback()
+
+    @staticmethod
+    def rebuild(user_id: int) -> None:
+        """Background task: build and store the user's sketches in a session of its own"""
+        db = SessionLocal()
+        try:
+            SketchService.build(db, user_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_sketch(db: Session, user_id: int, metric: str) -> Tuple[DDSketch, bool]:
+        """The user's sketch of one metric, and whether the stored copy is missing or stale"""
+        row = db.query(TradeSketch).filter(TradeSketch.user_id == user_id, TradeSketch.metric == metric).first()
+        if row is None or row.data_version != sketch_version(db, user_id):
+            return SketchService.sketch_trades(db, user_id)[metric], True
+        return DDSketch.from_json(row.payload), False
+
+    @staticmethod
+    def histogram(db: Session, user_id: int, metric: str, bins: int = 20, start_date: Optional[datetime] = None,
+                  end_date: Optional[datetime] = None, on_stale: Optional[Callable[[int], None]] = None) -> Dict:
+        """
+        Count, mean, percentiles and a histogram of one metric, read from its
+        stored sketch; a date range is sketched on the fly from just those trades.
+        When the stored sketch is missing or stale it is sketched on the fly too,
+        and on_stale (e.g. scheduling rebuild) is called with the user id.
+        """
+        if metric not in SKETCH_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(SKETCH_METRICS)}")
+        if start_date is None and end_date is None:
+            sketch, stale = SketchService.get_sketch(db, user_id, metric)
+            if stale and on_stale is not None:
+                on_stale(user_id)
+        else:
+            sketch = SketchService.sketch_trades(db, user_id, start_date, end_date)[metric]
+        count = sketch.count
+        result = {
+            "metric": metric,
+            "count": count,
+            "relative_accuracy": sketch.relative_accuracy,
+            "mean": round(sketch.total / count, 4) if count else None,
+            "percentiles": dict(zip((f"p{p}" for p in PERCENTILES),
+                                    sketch.quantiles(p / 100 for p in PERCENTILES))),
+            "histogram": {"bin_edges": [], "counts": []}
+        }
+        if not count:
+            return result
+
+        low, high = sketch.quantiles(HISTOGRAM_RANGE)
+        if high <= low:
+            high = low + max(abs(low) * RELATIVE_ACCURACY, 1e-6)
+        edges = np.linspace(low, high, bins + 1)
+        values, counts = sketch.buckets()
+        index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+        result["percentiles"] = {name: round(v, 4) for name, v in result["percentiles"].items()}
+        result["histogram"] = {
+            "bin_edges": edges.round(4).tolist(),
+            "counts": np.bincount(index, weights=counts, minlength=bins).astype(np.int64).tolist()
+        }
+        return result
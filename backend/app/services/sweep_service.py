@@ -0,0 +1,198 @@
+# sweep service
+"""
+Parallel parameter sweeps for the backtesting engine.
+The OHLCV columns are copied once into a shared-memory block; pool workers map
+that block on start-up and run configurations against read-only views of it,
+so the price data is never pickled or copied per task. Results come back as
+each configuration finishes, and a sweep can be cancelled at any point.
+All sweeps in the API process draw their workers from one budget of
+MAX_SWEEP_WORKERS, so concurrent sweeps share the cores instead of each
+starting a full pool. Sweeps run as backtest jobs are already inside a worker
+process and evaluate their configurations in that process.
+"""
+import itertools
+import os
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.services.backtesting_service import BacktestingService, STRATEGIES
+from app.services.process_pool import spawn_executor
+
+SWEEP_COLUMNS = ("open", "high", "low", "close", "volume")
+MAX_SWEEP_CONFIGS = 10_000
+# One process per core at most, across all sweeps, whatever the callers ask for
+MAX_SWEEP_WORKERS = os.cpu_count() or 1
+# Configurations queued per worker; bounds memory and makes cancel take effect quickly
+IN_FLIGHT_PER_WORKER = 4
+
+# Worker-process state, set once by _attach
+_shm: Optional[shared_memory.SharedMemory] = None
+_candles: Dict[str, np.ndarray] = {}
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of the parameter grid, e.g. {"fast": [5, 10], "slow": [20, 50]} -> 4 configs"""
+    names = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def sweep_metrics(result: Dict[str, np.ndarray], initial_capital: float) -> Dict[str, float]:
+    """Compact per-configuration summary, computed straight from the engine's arrays"""
+    pnl, equity = result["pnl"], result["equity"]
+    wins, losses = pnl[pnl > 0], pnl[pnl <= 0]
+    gross_loss = float(-losses.sum())
+    peak = np.maximum.accumulate(np.concatenate([[initial_capital], equity]))[1:]
+    drawdown = peak - equity
+    worst = int(np.argmax(drawdown)) if len(drawdown) else 0
+    final_equity = float(equity[-1]) if len(equity) else initial_capital
+    return {
+        "total_trades": int(len(pnl)),
+        "winning_trades": int(len(wins)),
+        "win_rate": round(len(wins) / len(pnl) * 100, 2) if len(pnl) else 0,
+        "total_pnl": round(float(pnl.sum()), 2),
+        "profit_factor": round(float(wins.sum()) / gross_loss, 2) if gross_loss > 0 else 0,
+        "max_drawdown": round(float(drawdown[worst]), 2) if len(drawdown) else 0,
+        "max_drawdown_percent": round(float(drawdown[worst] / peak[worst] * 100), 2) if len(drawdown) else 0,
+        "final_equity": round(final_equity, 2),
+        "return_percent": round((final_equity - initial_capital) / initial_capital * 100, 2),
+    }
+
+
+def _attach(name: str, length: int) -> None:
+    """Pool initializer: map the shared candle block as read-only column views"""
+    global _shm, _candles
+    # Spawned workers share the parent's resource tracker, so the parent's unlink
+    # is the only cleanup and attaching here registers nothing new
+    _shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((len(SWEEP_COLUMNS), length), dtype=np.float64, buffer=_shm.buf)
+    block.flags.writeable = False
+    _candles = {column: block[i] for i, column in enumerate(SWEEP_COLUMNS)}
+
+
+def evaluate(candles: Dict[str, np.ndarray], index: int, strategy: str, params: Dict[str, Any],
+             run_kwargs: Dict[str, float]) -> Dict[str, Any]:
+    try:
+        signal = BacktestingService.signals(candles, strategy, params)
+        result = BacktestingService.run(candles, signal, **run_kwargs)
+    except (ValueError, TypeError) as e:
+        return {"index": index, "params": params, "error": str(e)}
+    return {"index": index, "params": params, **sweep_metrics(result, run_kwargs["initial_capital"])}
+
+
+def _evaluate(index: int, strategy: str, params: Dict[str, Any], run_kwargs: Dict[str, float]) -> Dict[str, Any]:
+    """Pool task: evaluate against the shared block mapped by _attach"""
+    return evaluate(_candles, index, strategy, params, run_kwargs)
+
+
+class WorkerBudget:
+    """Process slots shared by every sweep in this process"""
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self._cond = threading.Condition()
+
+    def claim(self, wanted: int) -> int:
+        """Wait for at least one free slot, then take up to `wanted` of them"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.free > 0)
+            taken = min(wanted, self.free)
+            self.free -= taken
+            return taken
+
+    def release(self, slots: int) -> None:
+        with self._cond:
+            self.free += slots
+            self._cond.notify_all()
+
+
+sweep_workers = WorkerBudget(MAX_SWEEP_WORKERS)
+
+
+class SweepRunner:
+    """
+    One grid search: owns the shared-memory block and the worker pool for its
+    lifetime. With in_process, configurations run one by one in the calling
+    process instead, for callers that are pool workers themselves.
+    """
+
+    def __init__(self, candles: Dict[str, np.ndarray], strategy: str, grid: Dict[str, List[Any]],
+                 run_kwargs: Dict[str, float], max_workers: Optional[int] = None, in_process: bool = False):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy}")
+        self.configs = expand_grid(grid)
+        if not self.configs:
+            raise ValueError("Parameter grid is empty")
+        if len(self.configs) > MAX_SWEEP_CONFIGS:
+            raise ValueError(f"Grid expands to {len(self.configs)} configurations (max {MAX_SWEEP_CONFIGS})")
+        self.id = uuid.uuid4().hex
+        self.candles = candles
+        self.strategy = strategy
+        self.run_kwargs = run_kwargs
+        self.max_workers = max(1, min(max_workers or MAX_SWEEP_WORKERS, MAX_SWEEP_WORKERS, len(self.configs)))
+        self.in_process = in_process
+        self.completed = 0
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _share_candles(self) -> shared_memory.SharedMemory:
+        length = len(self.candles["close"])
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(SWEEP_COLUMNS) * length * 8))
+        block = np.ndarray((len(SWEEP_COLUMNS), length), dtype=np.float64, buffer=shm.buf)
+        for i, column in enumerate(SWEEP_COLUMNS):
+            block[i] = self.candles[column]
+        return shm
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """Yield one summary per configuration in completion order; stops early once cancelled"""
+        if self.in_process:
+            yield from self._results_in_process()
+            return
+        workers = sweep_workers.claim(self.max_workers)
+        try:
+            yield from self._results_in_pool(workers)
+        finally:
+            sweep_workers.release(workers)
+
+    def _results_in_process(self) -> Iterator[Dict[str, Any]]:
+        for index, params in enumerate(self.configs):
+            if self.cancelled:
+                break
+            result = evaluate(self.candles, index, self.strategy, params, self.run_kwargs)
+            self.completed += 1
+            yield result
+
+    def _results_in_pool(self, workers: int) -> Iterator[Dict[str, Any]]:
+        length = len(self.candles["close"])
+        shm = self._share_candles()
+        pool = spawn_executor(workers, initializer=_attach, initargs=(shm.name, length))
+        pending: set = set()
+        queued = iter(enumerate(self.configs))
+        limit = workers * IN_FLIGHT_PER_WORKER
+        try:
+            while not self.cancelled:
+                for index, params in itertools.islice(queued, limit - len(pending)):
+                    pending.add(pool.submit(_evaluate, index, self.strategy, params, self.run_kwargs))
+                if not pending:
+                    break
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.completed += 1
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True, cancel_futures=True)
+            shm.close()
+            shm.unlink()
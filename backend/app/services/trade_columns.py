@@ -0,0 +1,147 @@
+# trade columns
+"""
+Per-user columnar cache of closed trades.
+A user's closed trades are loaded once into NumPy arrays (P&L, entry time and
+dictionary-encoded categoricals) and reused until the user's trade data changes.
+Changes are detected with a cheap fingerprint of the trades table: row count,
+max(updated_at) and max(id) together catch inserts, edits and deletes.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.trade import Trade, TradeStatus
+
+CATEGORICAL_COLUMNS = ("symbol", "direction", "asset_type", "source")
+MAX_CACHED_USERS = 64
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def _encode(values: List) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary-encode a column: int32 codes plus labels sorted alphabetically"""
+    labels = sorted({"unknown" if v is None else str(getattr(v, "value", v)) for v in values})
+    lookup = {label: code for code, label in enumerate(labels)}
+    codes = np.fromiter((lookup["unknown" if v is None else str(getattr(v, "value", v))] for v in values),
+                        dtype=np.int32, count=len(values))
+    return codes, labels
+
+
+class TradeColumns:
+    """Closed trades of one user as parallel arrays, ordered by entry_date"""
+
+    def __init__(self, ids: np.ndarray, entry_time: np.ndarray, pnl: np.ndarray,
+                 categoricals: Dict[str, Tuple[np.ndarray, List[str]]]):
+        self.ids = ids
+        self.entry_time = entry_time          # datetime64[s], naive UTC
+        self.pnl = pnl
+        self.categoricals = categoricals      # name -> (codes, labels)
+        # Precomputed bincount weights shared by every aggregation over these trades
+        self.is_win = (pnl > 0).astype(np.float64)
+        self.is_loss = (pnl < 0).astype(np.float64)
+        self.profit = np.where(pnl > 0, pnl, 0.0)
+        self._derived: Dict[str, Tuple[np.ndarray, List]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pnl)
+
+    @classmethod
+    def from_rows(cls, rows: List) -> "TradeColumns":
+        """Rows of (id, entry_date, pnl, symbol, direction, asset_type, source)"""
+        columns = list(zip(*rows)) if rows else [[] for _ in range(3 + len(CATEGORICAL_COLUMNS))]
+        return cls(
+            ids=np.array(columns[0], dtype=np.int64),
+            entry_time=np.array(columns[1], dtype="datetime64[s]"),
+            pnl=np.array(columns[2], dtype=np.float64),
+            categoricals={name: _encode(list(values)) for name, values in zip(CATEGORICAL_COLUMNS, columns[3:])},
+        )
+
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> "TradeColumns":
+        """The trades entered in [start, end), either bound optional; slices, as entry_time is sorted"""
+        if start is None and end is None:
+            return self
+        first = 0 if start is None else int(np.searchsorted(self.entry_time, np.datetime64(start, "s"), side="left"))
+        last = len(self) if end is None else int(np.searchsorted(self.entry_time, np.datetime64(end, "s"), side="left"))
+        window = slice(first, max(first, last))
+        return TradeColumns(self.ids[window], self.entry_time[window], self.pnl[window],
+                            {name: (codes[window], labels) for name, (codes, labels) in self.categoricals.items()})
+
+    def dimension(self, name: str) -> Tuple[np.ndarray, List]:
+        """(codes, labels) for a categorical column or a calendar dimension of entry_date"""
+        if name in self.categoricals:
+            return self.categoricals[name]
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = self._calendar_dimension(name)
+            return self._derived[name]
+
+    def _calendar_dimension(self, name: str) -> Tuple[np.ndarray, List]:
+        days = self.entry_time.astype("datetime64[D]")
+        if name == "weekday":
+            # 1970-01-01 was a Thursday; shift so Monday is 0
+            return ((days.astype(np.int64) + 3) % 7).astype(np.int32), list(WEEKDAYS)
+        if name == "hour":
+            return (self.entry_time - days).astype("timedelta64[h]").astype(np.int32), list(range(24))
+        unit = {"date": "D", "month": "M", "year": "Y"}.get(name)
+        if unit is None:
+            raise ValueError(f"Unknown dimension {name}")
+        periods = self.entry_time.astype(f"datetime64[{unit}]").astype(np.int64)
+        if len(periods) == 0:
+            return periods.astype(np.int32), []
+        first = int(periods.min())
+        codes = (periods - first).astype(np.int32)
+        span = np.arange(first, int(periods.max()) + 1).astype(f"datetime64[{unit}]")
+        labels = [int(str(p)) for p in span] if name == "year" else [str(p) for p in span]
+        return codes, labels
+
+
+def data_version(db: Session, user_id: int) -> Tuple:
+    """Fingerprint of a user's trades; any insert, update or delete changes it"""
+    count, last_update, last_id = db.query(
+        func.count(Trade.id), func.max(Trade.updated_at), func.max(Trade.id)
+    ).filter(Trade.user_id == user_id).one()
+    return count, last_update, last_id
+
+
+class TradeColumnCache:
+    """Small LRU of TradeColumns per user, each tagged with the data version it was built from"""
+
+    def __init__(self, max_users: int = MAX_CACHED_USERS):
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Tuple[Tuple, TradeColumns]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> Tuple[Tuple, TradeColumns]:
+        """(data version, columns) for the user, reloading only when the version moved"""
+        version = data_version(db, user_id)
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(user_id)
+                return cached
+
+        rows = db.query(Trade.id, Trade.entry_date, Trade.pnl, Trade.symbol, Trade.direction,
+                        Trade.asset_type, Trade.source).filter(
+            Trade.user_id == user_id,
+            Trade.status == TradeStatus.CLOSED,
+            Trade.pnl.isnot(None)
+        ).order_by(Trade.entry_date, Trade.id).all()
+        entry = (version, TradeColumns.from_rows(rows))
+
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def columns(self, db: Session, user_id: int) -> TradeColumns:
+        return self.get(db, user_id)[1]
+
+
+trade_columns = TradeColumnCache()
@@ -0,0 +1,173 @@
+# trade replay service
+"""
+Replays closed journal trades against historical candles.
+Trades are grouped per market symbol so each symbol's candles are loaded once
+for the whole span; every trade is then a [start, start + length) window into
+that one array, and per-trade questions (first stop hit, extreme prices) become
+segment reductions over the concatenated windows instead of a loop per trade.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.trade import Trade, TradeDirection
+from app.services.candle_store import CandleStore, candle_store, INTERVAL_MS
+
+NO_HIT = np.iinfo(np.int64).max
+# MAE/MFE are stored on the trade, so they are always measured on the same candles
+EXCURSION_INTERVAL = "15m"
+
+
+def market_symbol(journal_symbol: str) -> str:
+    """Exchange symbol for a journal symbol: "BTC/USDT PERP" and "BTC/USDT" -> "BTCUSDT" """
+    return journal_symbol.upper().replace("PERP", "").replace("/", "").replace("-", "").strip()
+
+
+def to_epoch_ms(dates: List) -> np.ndarray:
+    # Journal datetimes are naive UTC, which is how numpy interprets them
+    return np.array(dates, dtype="datetime64[ms]").astype(np.int64)
+
+
+def flatten_windows(starts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Concatenate [start, start + length) windows. Returns the gathered bar indices,
+    each window's offset into them (for ufunc.reduceat) and each bar's position
+    inside its own window. Callers pass only non-empty windows.
+    """
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    local = np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(offsets, lengths)
+    return np.repeat(starts, lengths) + local, offsets, local
+
+
+class TradeWindows:
+    """The candle windows covering a group of same-symbol trades"""
+
+    def __init__(self, symbol: str, trade_index: np.ndarray, candles: Dict[str, np.ndarray],
+                 starts: np.ndarray, lengths: np.ndarray):
+        self.symbol = symbol
+        self.trade_index = trade_index    # positions in the caller's trade list
+        self.candles = candles
+        self.starts = starts
+        self.lengths = lengths
+
+
+def load_trade_windows(trades: List[Trade], interval: str, store: CandleStore = candle_store) -> List[TradeWindows]:
+    """
+    Group trades by market symbol, load each symbol's candles once and locate
+    every trade's window: from the bar containing entry_date through the bar
+    containing exit_date. Trades without candles (e.g. stocks) or with an empty
+    window are left out.
+    """
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Unsupported interval {interval}")
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i, trade in enumerate(trades):
+        if trade.exit_date is not None and trade.exit_price is not None and trade.exit_date >= trade.entry_date:
+            groups[market_symbol(trade.symbol)].append(i)
+
+    windows = []
+    for symbol, index in groups.items():
+        entry_ms = to_epoch_ms([trades[i].entry_date for i in index])
+        exit_ms = to_epoch_ms([trades[i].exit_date for i in index])
+        try:
+            candles = store.get_candles(symbol, interval, int(entry_ms.min()), int(exit_ms.max()))
+        except Exception as e:
+            print(f"No candles for {symbol}: {e}")
+            continue
+        times = candles["open_time"]
+        if len(times) == 0:
+            continue
+        starts = np.maximum(np.searchsorted(times, entry_ms, "right") - 1, 0)
+        lengths = np.maximum(np.searchsorted(times, exit_ms, "right") - starts, 0)
+        keep = lengths > 0
+        if keep.any():
+            windows.append(TradeWindows(symbol, np.asarray(index)[keep], candles, starts[keep], lengths[keep]))
+    return windows
+
+
+def _trade_arrays(trades: List[Trade], index: np.ndarray) -> Tuple[np.ndarray, ...]:
+    rows = [trades[i] for i in index.tolist()]
+    direction = np.array([1.0 if t.direction == TradeDirection.LONG else -1.0 for t in rows])
+    entry = np.array([t.entry_price for t in rows], dtype=np.float64)
+    exit_ = np.array([t.exit_price for t in rows], dtype=np.float64)
+    quantity = np.array([t.quantity for t in rows], dtype=np.float64)
+    return direction, entry, exit_, quantity
+
+
+class TradeReplayService:
+
+    @staticmethod
+    def what_if_exits(trades: List[Trade], stop_loss_percent: Optional[float] = None,
+                      take_profit_percent: Optional[float] = None, interval: str = "1h",
+                      store: CandleStore = candle_store) -> List[Dict]:
+        """
+        Re-run each trade with a fixed stop and/or target measured from its entry.
+        Within the original holding window the first bar touching either level
+        closes the trade at that level (the stop wins when one bar touches both);
+        otherwise the original exit stands. Fees are carried over from the actual
+        P&L. Returns one row per input trade, in input order.
+        """
+        rows = [{"exit_reason": "no_data", "what_if_exit_price": t.exit_price, "what_if_pnl": t.pnl}
+                for t in trades]
+        for group in load_trade_windows(trades, interval, store):
+            direction, entry, actual_exit, quantity = _trade_arrays(trades, group.trade_index)
+            flat, offsets, local = flatten_windows(group.starts, group.lengths)
+            seg_direction = np.repeat(direction, group.lengths)
+            high, low = group.candles["high"][flat], group.candles["low"][flat]
+            # Price moving against the trade is the low for longs and the high for shorts
+            adverse = np.where(seg_direction > 0, low, high)
+            favorable = np.where(seg_direction > 0, high, low)
+
+            first_stop = np.full(len(entry), NO_HIT)
+            first_target = np.full(len(entry), NO_HIT)
+            stop_price = target_price = np.full(len(entry), np.nan)
+            if stop_loss_percent:
+                stop_price = entry * (1 - direction * stop_loss_percent / 100)
+                touched = (adverse - np.repeat(stop_price, group.lengths)) * seg_direction <= 0
+                first_stop = np.minimum.reduceat(np.where(touched, local, NO_HIT), offsets)
+            if take_profit_percent:
+                target_price = entry * (1 + direction * take_profit_percent / 100)
+                touched = (favorable - np.repeat(target_price, group.lengths)) * seg_direction >= 0
+                first_target = np.minimum.reduceat(np.where(touched, local, NO_HIT), offsets)
+
+            stopped = (first_stop != NO_HIT) & (first_stop <= first_target)
+            targeted = (first_target != NO_HIT) & ~stopped
+            new_exit = np.where(stopped, stop_price, np.where(targeted, target_price, actual_exit))
+            exit_bar = group.starts + np.where(stopped, first_stop, np.where(targeted, first_target, group.lengths - 1))
+            exit_time = group.candles["open_time"][exit_bar]
+
+            for i, trade_i in enumerate(group.trade_index.tolist()):
+                trade = trades[trade_i]
+                delta = (new_exit[i] - actual_exit[i]) * quantity[i] * direction[i]
+                rows[trade_i] = {
+                    "exit_reason": "stop_loss" if stopped[i] else "take_profit" if targeted[i] else "original",
+                    "what_if_exit_price": round(float(new_exit[i]), 8),
+                    "what_if_exit_time": int(exit_time[i]) if (stopped[i] or targeted[i]) else None,
+                    "what_if_pnl": (trade.pnl or 0) + float(delta),
+                }
+        return rows
+
+    @staticmethod
+    def excursions(trades: List[Trade], interval: str = EXCURSION_INTERVAL,
+                   store: CandleStore = candle_store) -> Dict[int, Tuple[float, float]]:
+        """
+        Max adverse and max favorable excursion of each trade over its holding
+        window, in quote currency (MAE <= 0 <= MFE), keyed by position in `trades`.
+        The entry and the actual exit are included, so the realized move always
+        lies between the two. Trades without candles are absent from the result.
+        """
+        out = {}
+        for group in load_trade_windows(trades, interval, store):
+            direction, entry, exit_, quantity = _trade_arrays(trades, group.trade_index)
+            flat, offsets, _ = flatten_windows(group.starts, group.lengths)
+            highest = np.maximum.reduceat(group.candles["high"][flat], offsets)
+            lowest = np.minimum.reduceat(group.candles["low"][flat], offsets)
+            best = np.where(direction > 0, highest, lowest)
+            worst = np.where(direction > 0, lowest, highest)
+            realized = (exit_ - entry) * direction
+            mfe = np.maximum((best - entry) * direction, np.maximum(realized, 0)) * quantity
+            mae = np.minimum((worst - entry) * direction, np.minimum(realized, 0)) * quantity
+            for i, trade_i in enumerate(group.trade_index.tolist()):
+                out[trade_i] = (float(mae[i]), float(mfe[i]))
+        return out
@@ -2,8 +2,13 @@
 from sqlalchemy.orm import Session
 from app.models.trade import Trade, TradeStatus
 from app.schemas.trade import TradeCreate, TradeUpdate
+from app.services.report_service import ReportService
+from app.services.sketch_service import SketchService, sketch_values
 from typing import List, Optional
 
+# Fields that move a trade's holding window or sizing, and so its MAE/MFE
+EXCURSION_FIELDS = {"symbol", "direction", "entry_date", "entry_price", "exit_date", "exit_price", "quantity"}
+
 class TradeService:
     
     @staticmethod
@@ -17,7 +22,7 @@ class TradeService:
         else:  # SHORT
             pnl = (trade.entry_price - trade.exit_price) * trade.quantity
         
-        pnl = pnl - trade.commission - trade.fees
+        pnl = pnl - (trade.commission or 0)
         
         cost_basis = trade.entry_price * trade.quantity
         pnl_percent = (pnl / cost_basis) * 100 if cost_basis > 0 else 0
@@ -28,6 +33,8 @@ class TradeService:
     def create_trade(db: Session, trade_data: TradeCreate, user_id: int) -> Trade:
         trade = Trade(**trade_data.dict(), user_id=user_id)
         db.add(trade)
+        SketchService.apply(db, user_id, added=[sketch_values(trade)])
+        ReportService.invalidate(db, user_id, [trade.entry_date])
         db.commit()
         db.refresh(trade)
         return trade
@@ -52,6 +59,11 @@ class TradeService:
             return None
         
         update_data = trade_update.dict(exclude_unset=True)
+        previous_entry_date = trade.entry_date
+        previous_values = sketch_values(trade)
+        if any(key in EXCURSION_FIELDS and getattr(trade, key) != value for key, value in update_data.items()):
+            trade.mae = trade.mfe = trade.excursion_computed_at = trade.excursion_attempted_at = None
+            trade.excursion_attempts = 0
         for key, value in update_data.items():
             setattr(trade, key, value)
         
@@ -62,6 +74,8 @@ class TradeService:
             trade.pnl_percent = pnl_percent
             trade.status = TradeStatus.CLOSED
         
+        SketchService.apply(db, user_id, added=[sketch_values(trade)], removed=[previous_values])
+        ReportService.invalidate(db, user_id, [previous_entry_date, trade.entry_date])
         db.commit()
         db.refresh(trade)
         return trade
@@ -72,5 +86,7 @@ class TradeService:
         if not trade:
             return False
         db.delete(trade)
+        SketchService.apply(db, user_id, removed=[sketch_values(trade)])
+        ReportService.invalidate(db, user_id, [trade.entry_date])
         db.commit()
         return True
@@ -0,0 +1,162 @@
+# wallet ledger service
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.models.wallet import Wallet
+from app.models.wallet_ledger import WalletLedgerEntry, WalletSnapshot
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+
+# A snapshot is written every SNAPSHOT_INTERVAL entries per wallet, so rebuilding
+# any historical balance never reads more than this many ledger rows.
+SNAPSHOT_INTERVAL = 50
+# Longest balance history served in one request (about a year of hourly buckets)
+MAX_HISTORY_BUCKETS = 9000
+# A wallet that predates the ledger gets an opening entry dated just before its first delta
+OPENING_OFFSET = timedelta(microseconds=1)
+
+class WalletLedgerService:
+
+    @staticmethod
+    def record(db: Session, wallet: Wallet, delta_balance: float = 0.0, delta_locked: float = 0.0,
+               reason: str = "adjustment", ref_type: Optional[str] = None, ref_id: Optional[int] = None) -> WalletLedgerEntry:
+        """Apply a balance change to the wallet and append it to the ledger"""
+
+        now = datetime.utcnow()
+        if wallet.entries_since_snapshot is None:
+            # Wallet predates the ledger: record its current balance as an opening entry before the first delta
+            db.add(WalletLedgerEntry(user_id=wallet.user_id, asset=wallet.asset, delta_balance=wallet.balance or 0.0,
+                                     delta_locked=wallet.locked_balance or 0.0, reason="opening_balance",
+                                     created_at=now - OPENING_OFFSET))
+            wallet.entries_since_snapshot = 1
+
+        wallet.balance = (wallet.balance or 0.0) + delta_balance
+        wallet.locked_balance = (wallet.locked_balance or 0.0) + delta_locked
+
+        entry = WalletLedgerEntry(user_id=wallet.user_id, asset=wallet.asset, delta_balance=delta_balance,
+                                  delta_locked=delta_locked, reason=reason, ref_type=ref_type, ref_id=ref_id,
+                                  created_at=now)
+        db.add(entry)
+
+        wallet.entries_since_snapshot += 1
+        if wallet.entries_since_snapshot >= SNAPSHOT_INTERVAL:
+            db.flush()
+            WalletLedgerService._write_snapshot(db, wallet, last_entry_id=entry.id, created_at=entry.created_at)
+            wallet.entries_since_snapshot = 0
+        return entry
+
+    @staticmethod
+    def set_balance(db: Session, wallet: Wallet, balance: float, locked_balance: float, reason: str) -> Optional[WalletLedgerEntry]:
+        """Move the wallet to an absolute balance, recording the difference"""
+        delta_balance = balance - (wallet.balance or 0.0)
+        delta_locked = locked_balance - (wallet.locked_balance or 0.0)
+        if delta_balance == 0 and delta_locked == 0:
+            return None
+        return WalletLedgerService.record(db, wallet, delta_balance, delta_locked, reason)
+
+    @staticmethod
+    def backfill_opening_entries(db: Session) -> int:
+        """
+        Replace the balance pins written for pre-ledger wallets by earlier versions
+        (snapshots with last_entry_id 0) with opening ledger entries, so history
+        before a wallet's first delta no longer starts from zero
+        """
+        pins = db.query(WalletSnapshot).filter(WalletSnapshot.last_entry_id == 0).all()
+        for pin in pins:
+            db.add(WalletLedgerEntry(user_id=pin.user_id, asset=pin.asset, delta_balance=pin.balance,
+                                     delta_locked=pin.locked_balance, reason="opening_balance",
+                                     created_at=pin.created_at - OPENING_OFFSET))
+            db.delete(pin)
+        db.commit()
+        return len(pins)
+
+    @staticmethod
+    def _write_snapshot(db: Session, wallet: Wallet, last_entry_id: int, created_at: datetime) -> None:
+        db.add(WalletSnapshot(user_id=wallet.user_id, asset=wallet.asset, balance=wallet.balance or 0.0,
+                              locked_balance=wallet.locked_balance or 0.0, last_entry_id=last_entry_id,
+                              created_at=created_at))
+
+    @staticmethod
+    def balance_at(db: Session, user_id: int, asset: str, at: datetime) -> Dict:
+        """Rebuild a wallet balance at a point in time from one snapshot plus its ledger tail"""
+
+        snapshot = db.query(WalletSnapshot).filter(
+            WalletSnapshot.user_id == user_id,
+            WalletSnapshot.asset == asset,
+            WalletSnapshot.created_at <= at
+        ).order_by(WalletSnapshot.created_at.desc(), WalletSnapshot.id.desc()).first()
+
+        tail = db.query(
+            func.coalesce(func.sum(WalletLedgerEntry.delta_balance), 0.0),
+            func.coalesce(func.sum(WalletLedgerEntry.delta_locked), 0.0)
+        ).filter(
+            WalletLedgerEntry.user_id == user_id,
+            WalletLedgerEntry.asset == asset,
+            WalletLedgerEntry.created_at <= at
+        )
+        if snapshot:
+            tail = tail.filter(WalletLedgerEntry.created_at >= snapshot.created_at,
+                               WalletLedgerEntry.id > snapshot.last_entry_id)
+        delta_balance, delta_locked = tail.one()
+
+        return {
+            "balance": (snapshot.balance if snapshot else 0.0) + delta_balance,
+            "locked_balance": (snapshot.locked_balance if snapshot else 0.0) + delta_locked
+        }
+
+    @staticmethod
+    def balance_history(db: Session, user_id: int, asset: str = "USDT", start_date: datetime = None,
+                        end_date: datetime = None, interval: str = "day") -> List[Dict]:
+        """
+        Closing balance per day (or hour) between start_date and end_date.
+        Raises ValueError when the range spans more than MAX_HISTORY_BUCKETS buckets.
+        """
+
+        step = timedelta(hours=1) if interval == "hour" else timedelta(days=1)
+        end_date = end_date or datetime.utcnow()
+
+        if start_date is None:
+            first = db.query(func.min(WalletLedgerEntry.created_at)).filter(
+                WalletLedgerEntry.user_id == user_id,
+                WalletLedgerEntry.asset == asset
+            ).scalar()
+            if first is None:
+                return []
+            start_date = first
+
+        if interval == "hour":
+            bucket_start = start_date.replace(minute=0, second=0, microsecond=0)
+        else:
+            bucket_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if (end_date - bucket_start) // step >= MAX_HISTORY_BUCKETS:
+            raise ValueError(f"Range too long for {interval} interval (at most {MAX_HISTORY_BUCKETS} buckets)")
+
+        opening = WalletLedgerService.balance_at(db, user_id, asset, bucket_start)
+        balance, locked = opening["balance"], opening["locked_balance"]
+
+        entries = db.query(
+            WalletLedgerEntry.created_at,
+            WalletLedgerEntry.delta_balance,
+            WalletLedgerEntry.delta_locked
+        ).filter(
+            WalletLedgerEntry.user_id == user_id,
+            WalletLedgerEntry.asset == asset,
+            WalletLedgerEntry.created_at > bucket_start,
+            WalletLedgerEntry.created_at <= end_date
+        ).order_by(WalletLedgerEntry.created_at, WalletLedgerEntry.id).all()
+
+        result = []
+        i = 0
+        while bucket_start <= end_date:
+            bucket_end = bucket_start + step
+            while i < len(entries) and entries[i].created_at < bucket_end:
+                balance += entries[i].delta_balance or 0.0
+                locked += entries[i].delta_locked or 0.0
+                i += 1
+            result.append({
+                "date": bucket_start.isoformat(),
+                "balance": round(balance, 2),
+                "locked_balance": round(locked, 2)
+            })
+            bucket_start = bucket_end
+
+        return result
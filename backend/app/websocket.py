@@ -1 +1,243 @@
-# websocket
+"""
+Live position stream
+One shared PriceFeed polls prices for every symbol somebody is watching and fans
+each tick out per symbol. Each connection only keeps the latest unsent mark per
+symbol, so a slow client receives coalesced updates instead of a growing backlog.
+Position reloads are coalesced the same way: only the refresh loop touches the
+database, and refresh requests that arrive while it is busy fold into one rerun.
+"""
+import asyncio
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.models.sim_position import SimPosition
+from app.services.price_service import fetch_ticker_prices
+
+PRICE_POLL_SECONDS = 1.0
+POSITION_REFRESH_SECONDS = 10.0
+SEND_TIMEOUT_SECONDS = 10.0
+
+
+def mark_position(position: Dict, mark_price: float) -> Dict:
+    """Mark-to-market P&L, margin ratio and distance to liquidation for one open position"""
+    direction = 1 if position["side"] == "LONG" else -1
+    pnl = (mark_price - position["entry_price"]) * position["quantity"] * direction
+    margin = position["margin_used"]
+    liq_price = position["liquidation_price"]
+
+    distance_to_liq = None
+    if liq_price:
+        distance_to_liq = round((mark_price - liq_price) / mark_price * 100 * direction, 4)
+
+    return {
+        "position_id": position["id"],
+        "symbol": position["symbol"],
+        "mark_price": mark_price,
+        "unrealized_pnl": round(pnl, 4),
+        "pnl_percent": round(pnl / margin * 100, 4) if margin else 0,
+        # Share of the posted margin already lost; the position is liquidated at 1.0
+        "margin_ratio": round(max(-pnl, 0) / margin, 4) if margin else 0,
+        "liquidation_price": liq_price,
+        "distance_to_liquidation_percent": distance_to_liq,
+    }
+
+
+def _authenticate(token: str) -> Optional[int]:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        return user.id if user else None
+    finally:
+        db.close()
+
+
+def _load_open_positions(user_id: int) -> List[Dict]:
+    db = SessionLocal()
+    try:
+        rows = db.query(SimPosition).filter(SimPosition.user_id == user_id, SimPosition.status == "OPEN").all()
+        return [{"id": p.id, "symbol": p.symbol, "side": p.side, "quantity": p.quantity,
+                 "entry_price": p.entry_price, "margin_used": p.margin_used,
+                 "liquidation_price": p.liquidation_price} for p in rows]
+    finally:
+        db.close()
+
+
+class PriceFeed:
+    """Single polling loop shared by every connection, started on first subscription"""
+
+    def __init__(self, poll_interval: float = PRICE_POLL_SECONDS):
+        self.poll_interval = poll_interval
+        self.prices: Dict[str, float] = {}
+        self._subscribers: Dict[str, Set["PositionStream"]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, symbol: str, stream: "PositionStream") -> None:
+        self._subscribers[symbol].add(stream)
+        if symbol in self.prices:
+            stream.push(symbol, self.prices[symbol])
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, symbol: str, stream: "PositionStream") -> None:
+        subscribers = self._subscribers.get(symbol)
+        if subscribers is None:
+            return
+        subscribers.discard(stream)
+        if not subscribers:
+            del self._subscribers[symbol]
+            self.prices.pop(symbol, None)
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            symbols = list(self._subscribers)
+            try:
+                prices = await asyncio.to_thread(fetch_ticker_prices, symbols)
+            except Exception as e:
+                print(f"Price feed error: {e}")
+                prices = {}
+            for symbol, price in prices.items():
+                if self.prices.get(symbol) == price:
+                    continue
+                self.prices[symbol] = price
+                for stream in list(self._subscribers.get(symbol, ())):
+                    stream.push(symbol, price)
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+price_feed = PriceFeed()
+
+
+class PositionStream:
+    """One client connection: its open positions and a coalescing outbox of marks"""
+
+    def __init__(self, websocket: WebSocket, user_id: int, feed: PriceFeed = price_feed):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.feed = feed
+        self.positions: Dict[str, List[Dict]] = {}
+        self.coalesced = 0
+        self._pending: Dict[str, float] = {}
+        self._announce: Optional[List[int]] = None
+        self._wakeup = asyncio.Event()
+        self._refresh_wanted = asyncio.Event()
+
+    def push(self, symbol: str, price: float) -> None:
+        # Overwrite rather than queue: only the newest mark per symbol is worth sending
+        if symbol in self._pending:
+            self.coalesced += 1
+        self._pending[symbol] = price
+        self._wakeup.set()
+
+    async def refresh(self) -> None:
+        positions = await asyncio.to_thread(_load_open_positions, self.user_id)
+        by_symbol: Dict[str, List[Dict]] = defaultdict(list)
+        for p in positions:
+            by_symbol[p["symbol"]].append(p)
+
+        for symbol in set(self.positions) - set(by_symbol):
+            self.feed.unsubscribe(symbol, self)
+        previous = self.positions
+        self.positions = dict(by_symbol)
+        for symbol in set(by_symbol) - set(previous):
+            self.feed.subscribe(symbol, self)
+
+        # Only the send loop writes to the socket; queue the new position list for it
+        self._announce = [p["id"] for p in positions]
+        self._wakeup.set()
+        for symbol in by_symbol:
+            if symbol in self.feed.prices:
+                self.push(symbol, self.feed.prices[symbol])
+
+    async def _send(self, message: Dict) -> None:
+        await asyncio.wait_for(self.websocket.send_json(message), SEND_TIMEOUT_SECONDS)
+
+    async def _send_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._announce is not None:
+                announce, self._announce = self._announce, None
+                await self._send({"type": "positions", "position_ids": announce})
+            pending, self._pending = self._pending, {}
+            marks = [mark_position(p, price) for symbol, price in pending.items()
+                     for p in self.positions.get(symbol, [])]
+            if marks:
+                await self._send({"type": "marks", "positions": marks})
+
+    async def _refresh_loop(self) -> None:
+        # The only caller of refresh() once serving, so at most one reload per connection is in flight
+        while True:
+            try:
+                await asyncio.wait_for(self._refresh_wanted.wait(), POSITION_REFRESH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._refresh_wanted.clear()
+            await self.refresh()
+
+    async def _receive_loop(self) -> None:
+        while True:
+            text = await self.websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("action") == "refresh":
+                self._refresh_wanted.set()
+
+    async def serve(self) -> None:
+        await self.refresh()
+        tasks = [asyncio.create_task(self._send_loop()),
+                 asyncio.create_task(self._refresh_loop()),
+                 asyncio.create_task(self._receive_loop())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                exc = task.exception()
+                if exc and not isinstance(exc, (WebSocketDisconnect, asyncio.TimeoutError)):
+                    raise exc
+        finally:
+            for task in tasks:
+                task.cancel()
+            for symbol in list(self.positions):
+                self.feed.unsubscribe(symbol, self)
+
+
+async def stream_positions(websocket: WebSocket, token: str) -> None:
+    """Authenticate the socket and push live marks for the user's open positions until it closes"""
+    user_id = await asyncio.to_thread(_authenticate, token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    try:
+        await PositionStream(websocket, user_id).serve()
+    except WebSocketDisconnect:
+        return
+    # The client stalled past SEND_TIMEOUT_SECONDS; drop it rather than buffer for it
+    try:
+        await websocket.close()
+    except Exception:
+        pass
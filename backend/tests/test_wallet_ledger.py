@@ -0,0 +1,92 @@
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import User, Wallet, WalletLedgerEntry, WalletSnapshot
+from app.services.wallet_ledger_service import MAX_HISTORY_BUCKETS, WalletLedgerService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    user = User(email="ledger@example.com", username="ledger", hashed_password="x")
+    session.add(user)
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _legacy_wallet(db, balance):
+    """A wallet created before the ledger existed: it has a balance but no entries"""
+    user = db.query(User).one()
+    wallet = Wallet(user_id=user.id, asset="USDT", balance=balance, locked_balance=0.0)
+    db.add(wallet)
+    db.flush()
+    # The column was added by a migration, so rows that existed then hold NULL
+    db.query(Wallet).filter(Wallet.id == wallet.id).update({Wallet.entries_since_snapshot: None})
+    db.commit()
+    db.refresh(wallet)
+    return wallet
+
+
+def test_migrated_wallet_history_starts_from_its_balance(db):
+    wallet = _legacy_wallet(db, 100000.0)
+    WalletLedgerService.record(db, wallet, delta_balance=-100.0, reason="spot_buy", ref_type="trade")
+    db.commit()
+
+    history = WalletLedgerService.balance_history(db, wallet.user_id, "USDT")
+    assert history[-1]["balance"] == 99900.0
+    assert wallet.balance == 99900.0
+
+    entries = db.query(WalletLedgerEntry).order_by(WalletLedgerEntry.created_at).all()
+    assert [e.reason for e in entries] == ["opening_balance", "spot_buy"]
+    assert entries[0].created_at < entries[1].created_at
+
+
+def test_migrated_wallet_balance_between_opening_and_first_delta(db):
+    wallet = _legacy_wallet(db, 100000.0)
+    WalletLedgerService.record(db, wallet, delta_balance=-100.0, reason="spot_buy")
+    db.commit()
+    opening, first = db.query(WalletLedgerEntry).order_by(WalletLedgerEntry.created_at).all()
+
+    assert WalletLedgerService.balance_at(db, wallet.user_id, "USDT", opening.created_at)["balance"] == 100000.0
+    assert WalletLedgerService.balance_at(db, wallet.user_id, "USDT", first.created_at)["balance"] == 99900.0
+
+
+def test_backfill_replaces_legacy_balance_pins(db):
+    wallet = _legacy_wallet(db, 100000.0)
+    pinned_at = datetime.utcnow() - timedelta(days=3)
+    db.add(WalletSnapshot(user_id=wallet.user_id, asset="USDT", balance=100000.0, locked_balance=0.0,
+                          last_entry_id=0, created_at=pinned_at))
+    db.add(WalletLedgerEntry(user_id=wallet.user_id, asset="USDT", delta_balance=-100.0, reason="spot_buy",
+                             created_at=pinned_at))
+    wallet.balance, wallet.entries_since_snapshot = 99900.0, 1
+    db.commit()
+
+    assert WalletLedgerService.balance_history(db, wallet.user_id, "USDT")[0]["balance"] == -100.0
+    assert WalletLedgerService.backfill_opening_entries(db) == 1
+    assert WalletLedgerService.backfill_opening_entries(db) == 0
+    assert db.query(WalletSnapshot).count() == 0
+
+    history = WalletLedgerService.balance_history(db, wallet.user_id, "USDT")
+    assert {bucket["balance"] for bucket in history} == {99900.0}
+
+
+def test_hourly_history_is_capped(db):
+    wallet = _legacy_wallet(db, 0.0)
+    end = datetime(2026, 1, 1)
+    with pytest.raises(ValueError):
+        WalletLedgerService.balance_history(db, wallet.user_id, "USDT", end - timedelta(hours=MAX_HISTORY_BUCKETS), end,
+                                            interval="hour")
+    history = WalletLedgerService.balance_history(db, wallet.user_id, "USDT", end - timedelta(hours=MAX_HISTORY_BUCKETS - 1),
+                                                  end, interval="hour")
+    assert len(history) == MAX_HISTORY_BUCKETS
@@ -20,6 +20,41 @@ export interface PerformanceMetrics {
   largest_loss: number;
 }
 
+// Per-day aggregates as parallel arrays: index i of every array is dates[i]
+export interface CalendarRange {
+  start_date: string;
+  end_date: string;
+  total_pnl: number;
+  total_trades: number;
+  trading_days: number;
+  dates: string[];
+  pnl: number[];
+  trades: number[];
+  wins: number[];
+  losses: number[];
+}
+
+export interface TimeBucket {
+  trades: number;
+  pnl: number;
+  wins: number;
+  win_rate: number;
+  avg_pnl: number;
+}
+
+export interface TimePerformance {
+  timezone: string;
+  by_hour: (TimeBucket & { hour: number })[];
+  by_weekday: (TimeBucket & { weekday: string })[];
+  heatmap: {
+    weekdays: string[];
+    hours: number[];
+    pnl: number[][];
+    trades: number[][];
+    win_rate: number[][];
+  };
+}
+
 export const analyticsAPI = {
   getPerformance: async (): Promise<PerformanceMetrics> => {
     const response = await axios.get(`${API_BASE_URL}/metrics/performance`, {
@@ -28,9 +63,11 @@ export const analyticsAPI = {
     return response.data;
   },
 
-  getCumulativePnL: async (): Promise<any[]> => {
+  // maxPoints: server-side LTTB downsampling, keeps chart payloads bounded on long histories
+  getCumulativePnL: async (maxPoints?: number): Promise<any[]> => {
     const response = await axios.get(`${API_BASE_URL}/metrics/cumulative-pnl`, {
       headers: getAuthHeaders(),
+      params: maxPoints ? { max_points: maxPoints } : undefined,
     });
     return response.data;
   },
@@ -47,5 +84,28 @@ export const analyticsAPI = {
       headers: getAuthHeaders(),
     });
     return response.data;
+  },
+
+  getCalendarYear: async (year: number): Promise<CalendarRange> => {
+    const response = await axios.get(`${API_BASE_URL}/metrics/calendar/${year}`, {
+      headers: getAuthHeaders(),
+    });
+    return response.data;
+  },
+
+  getCalendarRange: async (startDate: string, endDate: string): Promise<CalendarRange> => {
+    const response = await axios.get(`${API_BASE_URL}/metrics/calendar`, {
+      headers: getAuthHeaders(),
+      params: { start_date: startDate, end_date: endDate },
+    });
+    return response.data;
+  },
+
+  getTimePerformance: async (timezone: string): Promise<TimePerformance> => {
+    const response = await axios.get(`${API_BASE_URL}/metrics/time-performance`, {
+      headers: getAuthHeaders(),
+      params: { tz: timezone },
+    });
+    return response.data;
   }
 };
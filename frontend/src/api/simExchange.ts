@@ -14,16 +14,36 @@ export interface SimPosition {
     side: string; quantity: number; entry_price: number; leverage: number;
     margin_used: number; liquidation_price?: number; take_profit?: number;
     stop_loss?: number; status: string; journal_trade_id?: number; created_at: string;
+    exit_price?: number; realized_pnl?: number; closed_at?: string;
 }
+export interface PositionHistoryPage { items: SimPosition[]; next_cursor: string | null; }
+export interface PositionHistoryParams {
+    cursor?: string; limit?: number; symbol?: string; side?: string; trade_type?: string;
+    start_date?: string; end_date?: string;
+}
+export interface PositionMark {
+    position_id: number; symbol: string; mark_price: number; unrealized_pnl: number; pnl_percent: number;
+    margin_ratio: number; liquidation_price?: number; distance_to_liquidation_percent?: number;
+}
+export interface WalletHistoryPoint { date: string; balance: number; locked_balance: number; }
 export interface SpotOrderRequest { symbol: string; side: 'BUY' | 'SELL'; quantity: number; }
 export interface FuturesOrderRequest { symbol: string; side: 'LONG' | 'SHORT'; quantity: number; leverage: number; take_profit?: number; stop_loss?: number; }
+export type BatchOrder = ({ type: 'spot' } & SpotOrderRequest) | ({ type: 'futures' } & FuturesOrderRequest);
 
 export const simExchangeAPI = {
     getWallets: () => api.get<WalletBalance[]>('/wallet').then(r => r.data),
     resetWallet: () => api.post('/wallet/reset').then(r => r.data),
+    getWalletHistory: (params: { asset?: string; start_date?: string; end_date?: string; interval?: 'day' | 'hour' } = {}) =>
+        api.get<WalletHistoryPoint[]>('/wallet/history', { params }).then(r => r.data),
     placeSpotOrder: (order: SpotOrderRequest) => api.post('/order/spot', order).then(r => r.data),
     placeFuturesOrder: (order: FuturesOrderRequest) => api.post('/order/futures', order).then(r => r.data),
+    placeBatchOrders: (orders: BatchOrder[], atomic = true) => api.post('/orders/batch', { orders, atomic }).then(r => r.data),
     closePosition: (position_id: number) => api.post('/position/close', { position_id }).then(r => r.data),
     getOpenPositions: () => api.get<SimPosition[]>('/positions').then(r => r.data),
-    getPositionHistory: () => api.get<SimPosition[]>('/positions/history').then(r => r.data),
+    getPositionHistory: (params: PositionHistoryParams = {}) =>
+        api.get<PositionHistoryPage>('/positions/history', { params }).then(r => r.data),
 };
+
+// Live marks for open positions; the server sends {type: 'positions'} and {type: 'marks'} messages
+export const positionsStreamUrl = () =>
+    `${API_BASE_URL.replace(/^http/, 'ws')}/sim_exchange/ws/positions?token=${encodeURIComponent(localStorage.getItem('token') || '')}`;
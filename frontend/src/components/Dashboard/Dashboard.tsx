@@ -50,6 +50,7 @@ const Dashboard: React.FC<DashboardProps> = ({ showLibrary = false, setShowLibra
   const [metrics, setMetrics] = useState<PerformanceMetrics | null>(null);
   const [trades, setTrades] = useState<Trade[]>([]);
   const [onboarding, setOnboarding] = useState<any>(null);
+  const [risk, setRisk] = useState<any>(null);
   const [exchangeBalance, setExchangeBalance] = useState<number | null>(null);
   const [exchangePositions, setExchangePositions] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
@@ -83,10 +84,11 @@ const Dashboard: React.FC<DashboardProps> = ({ showLibrary = false, setShowLibra
       const token = localStorage.getItem('token');
       const headers: HeadersInit = token ? { Authorization: `Bearer ${token}` } : {};
 
-      const [metricsRes, tradesRes, onboardingRes] = await Promise.all([
+      const [metricsRes, tradesRes, onboardingRes, riskRes] = await Promise.all([
         fetch(`${API_BASE_URL}/metrics/performance`, { headers }),
         fetch(`${API_BASE_URL}/trades/`, { headers }),
-        fetch(`${API_BASE_URL}/users/me/onboarding`, { headers })
+        fetch(`${API_BASE_URL}/users/me/onboarding`, { headers }),
+        fetch(`${API_BASE_URL}/metrics/risk`, { headers })
       ]);
 
       if (metricsRes.ok && tradesRes.ok) {
@@ -100,6 +102,10 @@ const Dashboard: React.FC<DashboardProps> = ({ showLibrary = false, setShowLibra
           const onboardingData = await onboardingRes.json();
           setOnboarding(onboardingData);
         }
+
+        if (riskRes.ok) {
+          setRisk(await riskRes.json());
+        }
       } else {
         console.error('API error:', metricsRes.status, tradesRes.status);
         setEmptyDefaults();
@@ -282,12 +288,11 @@ const Dashboard: React.FC<DashboardProps> = ({ showLibrary = false, setShowLibra
   let currentTradeStreak = 0;
   // TODO: Implement real streak logic based on dates and consecutive wins
 
-  // Calculate drawdown (simplified)
-  const maxDrawdown = metrics.largest_loss; // Placeholder
-  const avgDrawdown = metrics.average_loss; // Placeholder
-
-  // Calculate expectancy
-  const expectancy = (metrics.win_rate / 100 * metrics.average_win) - ((1 - metrics.win_rate / 100) * Math.abs(metrics.average_loss));
+  // Drawdown, expectancy and score come from /metrics/risk
+  const maxDrawdown = risk?.drawdown?.max_drawdown ?? 0;
+  const avgDrawdown = risk?.drawdown?.average_drawdown ?? 0;
+  const expectancy = risk?.trade_stats?.expectancy ?? 0;
+  const score = risk?.score?.value ?? 0;
 
   return (
     <div className="space-y-6">
@@ -334,7 +339,7 @@ const Dashboard: React.FC<DashboardProps> = ({ showLibrary = false, setShowLibra
                 return (
                   <ZellaScoreWidget
                     key={widgetId}
-                    score={85}
+                    score={score}
                     onRemove={() => handleRemoveWidget(widgetId)}
                   />
                 );
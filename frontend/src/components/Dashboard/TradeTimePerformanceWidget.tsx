@@ -1,17 +1,50 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
+import { analyticsAPI, TimePerformance } from '../../api/analytics';
 
-const TradeTimePerformanceWidget: React.FC = () => (
-  <div className="bg-white rounded-xl shadow p-6 flex flex-col items-center justify-center h-64">
-    <div className="text-lg font-bold mb-4 text-gray-700">Trade time performance</div>
-    <div className="flex flex-col justify-center items-center h-full">
-      <div className="flex gap-2 items-end mb-4">
-        <div className="w-8 h-12 bg-gray-200 rounded"></div>
-        <div className="w-8 h-20 bg-gray-200 rounded"></div>
-        <div className="w-8 h-16 bg-gray-200 rounded"></div>
-      </div>
-      <div className="text-gray-400 text-sm text-center">Not enough performance data yet</div>
+const TradeTimePerformanceWidget: React.FC = () => {
+  const [data, setData] = useState<TimePerformance | null>(null);
+
+  useEffect(() => {
+    const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone || 'UTC';
+    analyticsAPI.getTimePerformance(timezone)
+      .then(setData)
+      .catch((err) => console.error('Failed to load time performance', err));
+  }, []);
+
+  const hours = data ? data.by_hour.filter((h) => h.trades > 0) : [];
+  const maxAbs = Math.max(1, ...hours.map((h) => Math.abs(h.pnl)));
+
+  return (
+    <div className="bg-white rounded-xl shadow p-6 flex flex-col items-center justify-center h-64">
+      <div className="text-lg font-bold mb-4 text-gray-700">Trade time performance</div>
+      {hours.length === 0 ? (
+        <div className="flex flex-col justify-center items-center h-full">
+          <div className="flex gap-2 items-end mb-4">
+            <div className="w-8 h-12 bg-gray-200 rounded"></div>
+            <div className="w-8 h-20 bg-gray-200 rounded"></div>
+            <div className="w-8 h-16 bg-gray-200 rounded"></div>
+          </div>
+          <div className="text-gray-400 text-sm text-center">Not enough performance data yet</div>
+        </div>
+      ) : (
+        <div className="flex gap-1 items-end h-full w-full">
+          {data!.by_hour.map((h) => (
+            <div
+              key={h.hour}
+              className="flex-1 flex flex-col items-center justify-end h-full"
+              title={`${h.hour}:00 · ${h.trades} trades · P&L ${h.pnl} · win rate ${h.win_rate}%`}
+            >
+              <div
+                className={`w-full rounded ${h.pnl >= 0 ? 'bg-green-400' : 'bg-red-400'}`}
+                style={{ height: `${h.trades > 0 ? Math.max(4, (Math.abs(h.pnl) / maxAbs) * 100) : 0}%` }}
+              ></div>
+              <div className="text-[10px] text-gray-400 mt-1">{h.hour % 6 === 0 ? h.hour : ''}</div>
+            </div>
+          ))}
+        </div>
+      )}
     </div>
-  </div>
-);
+  );
+};
 
 export default TradeTimePerformanceWidget;
@@ -1,5 +1,6 @@
 import React, { useEffect, useRef, useState } from 'react';
 import { createChart, IChartApi, ISeriesApi, CandlestickData, Time, CandlestickSeries } from 'lightweight-charts';
+import { API_BASE_URL } from '../../config/api';
 
 interface CandleChartProps {
     symbol: string;
@@ -76,8 +77,11 @@ const CandleChart: React.FC<CandleChartProps> = ({ symbol, interval: externalInt
         const fetchKlines = async () => {
             setIsLoading(true);
             try {
+                // Served from the backend candle store; only missing ranges go upstream
+                const token = localStorage.getItem('token');
                 const res = await fetch(
-                    `https://api.binance.com/api/v3/klines?symbol=${symbol}&interval=${interval}&limit=1000`
+                    `${API_BASE_URL}/market/klines?symbol=${symbol}&interval=${interval}&limit=1000`,
+                    { headers: token ? { Authorization: `Bearer ${token}` } : {} }
                 );
                 const data = await res.json();
 
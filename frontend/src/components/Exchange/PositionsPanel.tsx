@@ -1,5 +1,5 @@
-import React, { useState, useEffect, useCallback } from 'react';
-import { simExchangeAPI, SimPosition } from '../../api/simExchange';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
+import { simExchangeAPI, SimPosition, PositionMark, positionsStreamUrl } from '../../api/simExchange';
 import { X, TrendingUp, RefreshCw } from 'lucide-react';
 
 interface PositionsPanelProps {
@@ -8,7 +8,8 @@ interface PositionsPanelProps {
 
 const PositionsPanel: React.FC<PositionsPanelProps> = ({ refreshTrigger }) => {
     const [positions, setPositions] = useState<SimPosition[]>([]);
-    const [livePrices, setLivePrices] = useState<Record<string, number>>({});
+    const [marks, setMarks] = useState<Record<number, PositionMark>>({});
+    const streamRef = useRef<WebSocket | null>(null);
     const [closing, setClosing] = useState<number | null>(null);
     const [activeTab, setActiveTab] = useState<'open' | 'history'>('open');
     const [history, setHistory] = useState<SimPosition[]>([]);
@@ -26,32 +27,33 @@ const PositionsPanel: React.FC<PositionsPanelProps> = ({ refreshTrigger }) => {
                 simExchangeAPI.getPositionHistory()
             ]);
             setPositions(open);
-            setHistory(hist);
+            setHistory(hist.items);
         } catch { }
     }, []);
 
     useEffect(() => { fetchPositions(); }, [fetchPositions, refreshTrigger]);
 
-    // Live price polling for open positions
+    // Live marks pushed by the server for open positions
     useEffect(() => {
-        if (positions.length === 0) return;
-        const symbols = Array.from(new Set(positions.map(p => p.symbol)));
-
-        const fetchPrices = async () => {
-            const prices: Record<string, number> = {};
-            await Promise.all(symbols.map(async sym => {
-                try {
-                    const res = await fetch(`https://api.binance.com/api/v3/ticker/price?symbol=${sym}`);
-                    const data = await res.json();
-                    prices[sym] = parseFloat(data.price);
-                } catch { }
-            }));
-            setLivePrices(prices);
+        const ws = new WebSocket(positionsStreamUrl());
+        streamRef.current = ws;
+        ws.onmessage = event => {
+            const msg = JSON.parse(event.data);
+            if (msg.type === 'marks') {
+                setMarks(prev => {
+                    const next = { ...prev };
+                    msg.positions.forEach((m: PositionMark) => { next[m.position_id] = m; });
+                    return next;
+                });
+            }
         };
+        return () => { streamRef.current = null; ws.close(); };
+    }, []);
 
-        fetchPrices();
-        const interval = setInterval(fetchPrices, 3000);
-        return () => clearInterval(interval);
+    // Ask the stream to pick up positions opened or closed since it connected
+    useEffect(() => {
+        const ws = streamRef.current;
+        if (ws && ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ action: 'refresh' }));
     }, [positions]);
 
     const handleClose = async (positionId: number) => {
@@ -69,12 +71,9 @@ const PositionsPanel: React.FC<PositionsPanelProps> = ({ refreshTrigger }) => {
     };
 
     const calcPnL = (pos: SimPosition) => {
-        const livePrice = livePrices[pos.symbol];
-        if (!livePrice) return null;
-        const raw = pos.side === 'LONG'
-            ? (livePrice - pos.entry_price) * pos.quantity
-            : (pos.entry_price - livePrice) * pos.quantity;
-        return { pnl: raw, pct: (raw / pos.margin_used) * 100, livePrice };
+        const mark = marks[pos.id];
+        if (!mark) return null;
+        return { pnl: mark.unrealized_pnl, pct: mark.pnl_percent, livePrice: mark.mark_price };
     };
 
     return (
@@ -164,6 +163,7 @@ const PositionsPanel: React.FC<PositionsPanelProps> = ({ refreshTrigger }) => {
                                     <th className="py-2 px-3 text-right">Entry</th>
                                     <th className="py-2 px-3 text-right">Size</th>
                                     <th className="py-2 px-3 text-right">Lev.</th>
+                                    <th className="py-2 px-3 text-right">PnL</th>
                                 </tr>
                             </thead>
                             <tbody>
@@ -176,6 +176,9 @@ const PositionsPanel: React.FC<PositionsPanelProps> = ({ refreshTrigger }) => {
                                         <td className="py-2 px-3 text-right font-mono text-gray-300">${pos.entry_price.toLocaleString('en-US', { maximumFractionDigits: 2 })}</td>
                                         <td className="py-2 px-3 text-right font-mono text-gray-300">{pos.quantity}</td>
                                         <td className="py-2 px-3 text-right font-mono text-blue-400">{pos.leverage}x</td>
+                                        <td className={`py-2 px-3 text-right font-mono ${(pos.realized_pnl ?? 0) >= 0 ? 'text-emerald-400' : 'text-red-400'}`}>
+                                            {pos.realized_pnl != null ? `${pos.realized_pnl >= 0 ? '+' : ''}$${pos.realized_pnl.toFixed(2)}` : '–'}
+                                        </td>
                                     </tr>
                                 ))}
                             </tbody>
@@ -43,7 +43,7 @@ const PortfolioDashboard: React.FC = () => {
             const [sum, w, pnl] = await Promise.all([
                 portfolioAPI.getSummary(),
                 simExchangeAPI.getWallets(),
-                analyticsAPI.getCumulativePnL()
+                analyticsAPI.getCumulativePnL(1000)
             ]);
             setSummary(sum);
             setWallets(w);
@@ -14,7 +14,7 @@ const ReportsDashboard: React.FC = () => {
         const fetchData = async () => {
             try {
                 const [pnl, dist, asset] = await Promise.all([
-                    analyticsAPI.getCumulativePnL(),
+                    analyticsAPI.getCumulativePnL(1000),
                     analyticsAPI.getTradeDistribution(),
                     analyticsAPI.getAssetPerformance()
                 ]);